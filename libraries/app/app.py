@@ -91,6 +91,8 @@ class App(object):
     auto_setup_db = True
     manifest_table_name = 'manifests'
     job_table_name = 'jobs'
+    completion_table_name = 'completions'
+    project_commit_table_name = 'project_commits'
     db_echo = False  # Whether or not to echo DB queries to the debug log. Useful for debugging. Set before setup_db()
     echo = False
 
@@ -237,7 +239,12 @@ class App(object):
             TxJob.__table__.name = cls.job_table_name
             from libraries.models.module import TxModule
             TxModule.__table__.name = cls.module_table_name
-            cls.db_create_tables([TxManifest.__table__, TxJob.__table__, TxModule.__table__])
+            from libraries.models.completion import TxCompletion
+            TxCompletion.__table__.name = cls.completion_table_name
+            from libraries.models.project_commit import TxProjectCommit
+            TxProjectCommit.__table__.name = cls.project_commit_table_name
+            cls.db_create_tables([TxManifest.__table__, TxJob.__table__, TxModule.__table__, TxCompletion.__table__,
+                                  TxProjectCommit.__table__])
         return cls._db_session
 
     @classmethod
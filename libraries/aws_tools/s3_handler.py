@@ -1,19 +1,32 @@
 from __future__ import unicode_literals, print_function
 import os
 import json
+import hashlib
+import threading
+import zipfile
+import Queue
 import boto3
 import botocore
 from boto3.session import Session
+from libraries.general_tools.data_utils import json_serial
 from libraries.general_tools.file_utils import get_mime_type
 
 
 class S3Handler(object):
+    CHUNK_SIZE = 1024 * 1024  # bytes read or written at a time when streaming an object
+    MAX_DELETE_KEYS = 1000  # most keys S3 deletes in one request
+
     def __init__(self, bucket_name=None, aws_access_key_id=None, aws_secret_access_key=None,
-                 aws_region_name='us-west-2'):
+                 aws_region_name='us-west-2', part_size=None):
+        """
+        :param int part_size: files bigger than this are uploaded in parts of this many bytes
+        """
         self.bucket_name = bucket_name
         self.aws_access_key_id = aws_access_key_id
         self.aws_secret_access_key = aws_secret_access_key
         self.aws_region_name = aws_region_name
+        self.part_size = part_size or S3UploadStream.PART_SIZE
+        self.cache = None
         self.bucket = None
         self.client = None
         self.resource = None
@@ -41,6 +54,30 @@ class S3Handler(object):
         if self.bucket_name:
             self.bucket = self.resource.Bucket(self.bucket_name)
 
+    def start_cache(self):
+        """
+        Starts remembering the objects that this handler writes, so that reading them back doesn't go back to S3.
+            Objects read from S3 are not remembered, since other lambdas may write them at any time.  This is meant
+            for the length of one invocation, in which nothing else writes the objects that this handler writes.
+        """
+        self.cache = S3ObjectCache()
+
+    def stop_cache(self):
+        """
+        :return S3ObjectCache: the cache that was stopped, e.g. for its hits and misses, or None if there wasn't one
+        """
+        cache = self.cache
+        self.cache = None
+        return cache
+
+    def forget(self, key):
+        """
+        Drops the cached copy of an object, e.g. when it is written in a way that doesn't keep its contents
+        :param string key:
+        """
+        if self.cache is not None:
+            self.cache.forget(key)
+
     def download_file(self, key, local_file):
         """
         Download file from S3 bucket. Similar to s3.download_file except that does
@@ -48,45 +85,182 @@ class S3Handler(object):
         :param string key: object to download
         :param string local_file: file to download to
         """
-        body = self.resource.Object(bucket_name=self.bucket_name, key=key).get()['Body']
+        body = self.client.get_object(Bucket=self.bucket_name, Key=key)['Body']
         with open(local_file, 'wb') as f:
-            for chunk in iter(lambda: body.read(1024), b''):
+            for chunk in iter(lambda: body.read(self.CHUNK_SIZE), b''):
                 f.write(chunk)
 
-    # Downloads all the files in S3 that have a prefix of `key_prefix` from `bucket` to the `local` directory
-    def download_dir(self, key_prefix, local):
+    def download_dir(self, key_prefix, local, parallel=1):
+        """
+        Downloads all the files in S3 that have a prefix of `key_prefix` to the same keys under the `local` directory
+        :param string key_prefix:
+        :param string local:
+        :param int parallel: number of files to download at a time
+        """
+        downloads = []
+        paginator = self.client.get_paginator('list_objects')
+        for result in paginator.paginate(Bucket=self.bucket_name, Prefix=key_prefix):
+            for s3_object in result.get('Contents') or []:
+                local_file = os.path.join(local, s3_object.get('Key'))
+                if local_file.endswith('/'):
+                    continue
+                if not os.path.exists(os.path.dirname(local_file)):
+                    os.makedirs(os.path.dirname(local_file))
+                downloads.append((s3_object.get('Key'), local_file))
+        map_in_threads(lambda download: self.download_file(*download), downloads, parallel)
+
+    def upload_dir(self, local, key_prefix, parallel=1, cache_time=600):
+        """
+        Uploads all the files under the `local` directory to keys under `key_prefix`
+        :param string local:
+        :param string key_prefix: e.g. u/<user>/<repo>/<commit>
+        :param int parallel: number of files to upload at a time
+        :param int cache_time:
+        :return list: keys of the uploaded files
+        """
+        uploads = get_dir_uploads(local, key_prefix)
+        map_in_threads(lambda upload: self.upload_file(*upload, cache_time=cache_time), uploads, parallel)
+        return [key for path, key in uploads]
+
+    def sync_dir(self, local, key_prefix, parallel=1, cache_time=600, delete=False):
+        """
+        Like upload_dir(), but only uploads the files whose contents differ from the objects already under
+            `key_prefix`, by comparing the MD5 of each file with the ETag from a single listing of the prefix
+        :param string local:
+        :param string key_prefix: e.g. u/<user>/<repo>/<commit>
+        :param int parallel: number of files to upload at a time
+        :param int cache_time:
+        :param bool delete: also delete the objects under `key_prefix` that are not in `local`
+        :return tuple: keys that were uploaded, and keys that were deleted
+        """
+        etags = self.get_etags(key_prefix.rstrip('/') + '/')
+        uploads = [(path, key) for path, key in get_dir_uploads(local, key_prefix)
+                   if etags.get(key) != get_file_etag(path)]
+        map_in_threads(lambda upload: self.upload_file(*upload, cache_time=cache_time), uploads, parallel)
+        deleted = []
+        if delete:
+            local_keys = set(key for path, key in get_dir_uploads(local, key_prefix))
+            deleted = [key for key in sorted(etags) if key not in local_keys]
+            failed = self.delete_keys(deleted)
+            deleted = [key for key in deleted if key not in failed]
+        return [key for path, key in uploads], deleted
+
+    def sync_zip(self, zip_file, key_prefix, parallel=1, cache_time=600):
+        """
+        Like sync_dir(), but uploads the files in a zip file straight from the zip, without extracting them to disk
+        :param string zip_file:
+        :param string key_prefix: e.g. u/<user>/<repo>/<commit>
+        :param int parallel: number of files to upload at a time
+        :param int cache_time:
+        :return list: keys that were uploaded
+        """
+        etags = self.get_etags(key_prefix.rstrip('/') + '/')
+        with zipfile.ZipFile(zip_file) as zf:
+            members = [(member, key_prefix.rstrip('/') + '/' + member.filename.lstrip('/'))
+                       for member in zf.infolist() if not member.filename.endswith('/')]
+
+            def upload(member_key):
+                member, key = member_key
+                return self.sync_zip_member(zf, member, key, etags.get(key), cache_time)
+
+            # a ZipFile opened from a file name opens the file again for each member, so members can be read at once
+            uploaded = map_in_threads(upload, members, parallel)
+        return [key for (member, key), upload in zip(members, uploaded) if upload]
+
+    def sync_zip_member(self, zf, member, key, etag, cache_time=600):
+        """
+        :return bool: True if the member was uploaded, False if the object already had the same contents
+        """
+        if member.file_size > self.part_size:
+            md5 = hashlib.md5()
+            with zf.open(member) as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    md5.update(chunk)
+            if md5.hexdigest() == etag:
+                return False
+            with zf.open(member) as f:
+                with self.open_upload_stream(key, cache_time=cache_time) as stream:
+                    for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                        stream.write(chunk)
+            return True
+        body = zf.read(member)
+        if hashlib.md5(body).hexdigest() == etag:
+            return False
+        self.put_bytes(key, body, cache_time=cache_time)
+        return True
+
+    def sync_prefix(self, from_prefix, to_prefix, parallel=1):
+        """
+        Like sync_dir(), but copies the objects under `from_prefix` in the same bucket, so S3 copies the contents and
+            they are never downloaded
+        :param string from_prefix:
+        :param string to_prefix: e.g. u/<user>/<repo>/<commit>
+        :param int parallel: number of objects to copy at a time
+        :return list: keys that were copied to
+        """
+        from_prefix = from_prefix.rstrip('/') + '/'
+        to_prefix = to_prefix.rstrip('/') + '/'
+        etags = self.get_etags(to_prefix)
+        copies = []
+        for key, etag in sorted(self.get_etags(from_prefix).items()):
+            to_key = to_prefix + key[len(from_prefix):]
+            if etags.get(to_key) != etag:
+                copies.append((key, to_key))
+        map_in_threads(lambda copy: self.copy(copy[0], to_key=copy[1], catch_exception=False), copies, parallel)
+        return [to_key for key, to_key in copies]
+
+    def get_etags(self, prefix):
+        """
+        :param string prefix:
+        :return dict: ETag of each object under the prefix, without the quotes
+        """
+        etags = {}
         paginator = self.client.get_paginator('list_objects')
-        for result in paginator.paginate(Bucket=self.bucket_name, Delimiter='/', Prefix=key_prefix):
-            if result.get('CommonPrefixes') is not None:
-                for subdir in result.get('CommonPrefixes'):
-                    self.download_dir(subdir.get('Prefix'), local)
-            if result.get('Contents') is not None:
-                for file in result.get('Contents'):
-                    local_file = os.path.join(local, file.get('Key'))
-                    if local_file.endswith('/'):
-                        pass
-                    else:
-                        if not os.path.exists(os.path.dirname(local_file)):
-                            os.makedirs(os.path.dirname(local_file))
-                        self.download_file(file.get('Key'), local_file)
+        for result in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for s3_object in result.get('Contents') or []:
+                etags[s3_object['Key']] = s3_object['ETag'].strip('"')
+        return etags
 
     def key_exists(self, key, bucket_name=None):
+        cache = self.cache if not bucket_name else None
+        if cache is not None and cache.lookup(key, need_contents=False)[0]:
+            return True
+
         if not bucket_name:
             bucket = self.bucket
         else:
             bucket = self.resource.Bucket(bucket_name)
 
         try:
-            bucket.Object(key=key).load()
+            s3_object = bucket.Object(key=key)
+            s3_object.load()
         except botocore.exceptions.ClientError as e:
             if e.response['Error']['Code'] == "404":
-                exists = False
+                return False
             else:
                 raise
-        else:
-            exists = True
+        return True
 
-        return exists
+    def list_keys_under(self, prefix):
+        """
+        Lists the keys under the prefix, with a request for each 1000 keys instead of one for each key
+        :param string prefix:
+        :return set:
+        """
+        return set(self.get_etags(prefix))
+
+    def keys_exist(self, keys):
+        """
+        Finds out whether each of the keys exists from one listing of the prefix they have in common, e.g. for the
+            flag files of all the parts of a project
+        :param list keys:
+        :return dict: whether each key exists
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        listed = self.list_keys_under(os.path.commonprefix(keys))
+        return dict((key, key in listed) for key in keys)
 
     def key_modified_time(self, key, bucket_name=None):
         """
@@ -116,6 +290,7 @@ class S3Handler(object):
         if not from_bucket:
             from_bucket = self.bucket_name
 
+        self.forget(to_key)
         if catch_exception:
             try:
                 return self.resource.Object(bucket_name=self.bucket_name, key=to_key).copy_from(
@@ -127,6 +302,7 @@ class S3Handler(object):
                 CopySource='{0}/{1}'.format(from_bucket, from_key))
 
     def replace(self, key, catch_exception=True):
+        self.forget(key)
         if catch_exception:
             try:
                 return self.resource.Object(bucket_name=self.bucket_name, key=key).copy_from(
@@ -140,35 +316,66 @@ class S3Handler(object):
     def upload_file(self, path, key, cache_time=600, content_type=None):
         """
         Upload file to S3 storage. Similar to the s3.upload_file, however, that
-        does not work nicely with moto, whereas this function does.
+        does not work nicely with moto, whereas this function does.  Files bigger than part_size are uploaded in parts,
+        so they are never read into memory all at once.
         :param string path: file to upload
         :param string key: name of the object in the bucket
         """
-        with open(path, 'rb') as f:
-            binary = f.read()
         if content_type is None:
             content_type = get_mime_type(path)
-        self.bucket.put_object(
+        self.forget(key)
+        if os.path.getsize(path) > self.part_size:
+            with open(path, 'rb') as f:
+                with self.open_upload_stream(key, cache_time=cache_time, content_type=content_type) as stream:
+                    for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                        stream.write(chunk)
+            return
+        with open(path, 'rb') as f:
+            binary = f.read()
+        self.client.put_object(
+            Bucket=self.bucket_name,
             Key=key,
             Body=binary,
             ContentType=content_type,
             CacheControl='max-age={0}'.format(cache_time)
         )
 
+    def open_upload_stream(self, key, cache_time=600, content_type=None, part_size=None):
+        """
+        Opens a stream that uploads to S3 as it is written, a part at a time, so that large files don't have to be
+        written to disk or held in memory first
+        :param string key: name of the object in the bucket
+        :param int cache_time:
+        :param string content_type:
+        :param int part_size: bytes in each part of the upload, at least the S3 minimum of 5MB
+        :return S3UploadStream:
+        """
+        self.forget(key)
+        return S3UploadStream(self, key, cache_time=cache_time, content_type=content_type,
+                              part_size=part_size or self.part_size)
+
     def get_object(self, key):
         return self.resource.Object(bucket_name=self.bucket_name, key=key)
 
     def redirect(self, key, location):
+        self.forget(key)
         self.bucket.put_object(Key=key, WebsiteRedirectLocation=location, CacheControl='max-age=0')
 
     def get_file_contents(self, key, catch_exception=True):
+        if self.cache is not None:
+            cached, contents = self.cache.lookup(key)
+            if cached:
+                return contents
         if catch_exception:
             try:
-                return self.get_object(key).get()['Body'].read()
+                return self.read_object(key)
             except:
                 return None
         else:
-            return self.get_object(key).get()['Body'].read()
+            return self.read_object(key)
+
+    def read_object(self, key):
+        return self.get_object(key).get()['Body'].read()
 
     def get_json(self, key, catch_exception = True):
         if catch_exception:
@@ -180,18 +387,20 @@ class S3Handler(object):
             return json.loads(self.get_file_contents(key, catch_exception))
 
     def get_objects(self, prefix=None, suffix=None):
-        filtered = []
-        objects = self.bucket.objects.filter(Prefix=prefix)
-        if objects:
-            if suffix:
-                for obj in objects:
-                    if obj.key.endswith(suffix):
-                        filtered.append(obj)
-            else:
-                filtered = objects
-        return filtered
+        """
+        Lists the objects under the prefix lazily, fetching a page of up to 1000 at a time as they are iterated over.
+        S3 can only filter by prefix, so the suffix is checked as each page arrives.
+        :param string prefix:
+        :param string suffix:
+        :return generator: ObjectSummary of each object
+        """
+        objects = self.bucket.objects.filter(Prefix=prefix) if prefix else self.bucket.objects.all()
+        for obj in objects:
+            if not suffix or obj.key.endswith(suffix):
+                yield obj
 
     def put_contents(self, key, body, catch_exception=True):
+        self.forget(key)
         if catch_exception:
             try:
                 return self.get_object(key).put(Body=body)
@@ -200,7 +409,39 @@ class S3Handler(object):
         else:
             return self.get_object(key).put(Body=body)
 
+    def put_bytes(self, key, body, cache_time=600, content_type=None):
+        """
+        Uploads contents that are already in memory, without writing them to a file first
+        :param string key: name of the object in the bucket
+        :param bytes body: a unicode string is encoded as UTF-8
+        :param int cache_time:
+        :param string content_type: guessed from the key if not given
+        """
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        self.forget(key)
+        response = self.client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType=content_type or get_mime_type(key),
+            CacheControl='max-age={0}'.format(cache_time)
+        )
+        if self.cache is not None:
+            self.cache.set(key, response.get('ETag'), body)
+
+    def put_json(self, key, obj, cache_time=600):
+        """
+        Uploads an object serialized as JSON, the same way write_file() serializes it
+        :param string key: name of the object in the bucket
+        :param obj: e.g. a dict
+        :param int cache_time:
+        """
+        self.put_bytes(key, json.dumps(obj, sort_keys=True, default=json_serial), cache_time=cache_time,
+                       content_type='application/json')
+
     def delete_file(self, key, catch_exception=True):
+        self.forget(key)
         if catch_exception:
             try:
                 return self.resource.Object(bucket_name=self.bucket_name, key=key).delete()
@@ -209,6 +450,47 @@ class S3Handler(object):
         else:
             return self.resource.Object(bucket_name=self.bucket_name, key=key).delete()
 
+    def delete_keys(self, keys, catch_exception=True):
+        """
+        Deletes objects with one request for each batch of up to 1000 keys
+        :param keys: iterable of keys, which can be a generator
+        :param bool catch_exception:
+        :return list: keys that could not be deleted
+        """
+        failed = []
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == self.MAX_DELETE_KEYS:
+                failed += self.delete_batch(batch, catch_exception)
+                batch = []
+        if batch:
+            failed += self.delete_batch(batch, catch_exception)
+        return failed
+
+    def delete_prefix(self, prefix, catch_exception=True):
+        """
+        Deletes all the objects under the prefix, a page of keys at a time as they are listed
+        :param string prefix: e.g. u/<user>/<repo>/<commit>/
+        :param bool catch_exception:
+        :return list: keys that could not be deleted
+        """
+        return self.delete_keys((obj.key for obj in self.get_objects(prefix=prefix)), catch_exception)
+
+    def delete_batch(self, keys, catch_exception=True):
+        for key in keys:
+            self.forget(key)
+        try:
+            response = self.client.delete_objects(Bucket=self.bucket_name, Delete={
+                'Objects': [{'Key': key} for key in keys],
+                'Quiet': True
+            })
+        except Exception:
+            if not catch_exception:
+                raise
+            return list(keys)
+        return [error['Key'] for error in response.get('Errors', [])]
+
     def create_bucket(self, bucket_name=None, catch_exception=True):
         if not bucket_name:
             bucket_name = self.bucket_name
@@ -219,3 +501,215 @@ class S3Handler(object):
                 return None
         else:
             return self.resource.create_bucket(Bucket=bucket_name)
+
+
+class S3UploadStream(object):
+    """
+    A file-like object that uploads what is written to it to S3.  Files smaller than a part are uploaded with a single
+        put, and larger ones with a multipart upload as each part fills up.  Only write(), tell(), flush() and close()
+        are supported, which is enough for zipfile.ZipFile.writestr().
+    """
+    MIN_PART_SIZE = 5 * 1024 * 1024  # smallest part but the last that S3 allows
+    PART_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, s3_handler, key, cache_time=600, content_type=None, part_size=PART_SIZE):
+        """
+        :param S3Handler s3_handler:
+        :param string key: name of the object in the bucket
+        :param int cache_time:
+        :param string content_type:
+        :param int part_size:
+        """
+        self.s3_handler = s3_handler
+        self.key = key
+        self.cache_time = cache_time
+        self.content_type = content_type or get_mime_type(key)
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.buffer = []
+        self.buffer_size = 0
+        self.position = 0
+        self.upload_id = None
+        self.parts = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('Write to closed upload stream for {0}'.format(self.key))
+        self.buffer.append(data)
+        self.buffer_size += len(data)
+        self.position += len(data)
+        if self.buffer_size >= self.part_size:
+            self.upload_part()
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass  # parts are uploaded once they are big enough
+
+    def close(self):
+        """
+        Uploads what is left and finishes the upload
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.upload_id is None:
+            self.s3_handler.client.put_object(
+                Bucket=self.s3_handler.bucket_name,
+                Key=self.key,
+                Body=b''.join(self.buffer),
+                ContentType=self.content_type,
+                CacheControl='max-age={0}'.format(self.cache_time)
+            )
+        else:
+            try:
+                if self.buffer_size or not self.parts:
+                    self.upload_part()
+                self.s3_handler.client.complete_multipart_upload(Bucket=self.s3_handler.bucket_name, Key=self.key,
+                                                                 UploadId=self.upload_id,
+                                                                 MultipartUpload={'Parts': self.parts})
+            except Exception:
+                self.abort()
+                raise
+        self.buffer = []
+        self.buffer_size = 0
+
+    def abort(self):
+        """
+        Stops the upload without creating the object, e.g. when writing what is uploaded fails
+        """
+        self.closed = True
+        self.buffer = []
+        self.buffer_size = 0
+        if self.upload_id is not None:
+            upload_id = self.upload_id
+            self.upload_id = None
+            try:
+                self.s3_handler.client.abort_multipart_upload(Bucket=self.s3_handler.bucket_name, Key=self.key,
+                                                              UploadId=upload_id)
+            except Exception:
+                pass  # S3 will have to clean up the parts, e.g. with a lifecycle rule
+
+    def upload_part(self):
+        client = self.s3_handler.client
+        if self.upload_id is None:
+            self.upload_id = client.create_multipart_upload(Bucket=self.s3_handler.bucket_name, Key=self.key,
+                                                            ContentType=self.content_type,
+                                                            CacheControl='max-age={0}'.format(self.cache_time)
+                                                            )['UploadId']
+        part_number = len(self.parts) + 1
+        response = client.upload_part(Bucket=self.s3_handler.bucket_name, Key=self.key, UploadId=self.upload_id,
+                                      PartNumber=part_number, Body=b''.join(self.buffer))
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self.buffer = []
+        self.buffer_size = 0
+
+
+class S3ObjectCache(object):
+    """
+    Objects that have been written to a bucket, with counts of how often they were read back and how often a read had
+        to go to S3
+    """
+
+    def __init__(self):
+        self.objects = {}  # the ETag and contents of each object
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, need_contents=True):
+        """
+        :param string key:
+        :param bool need_contents: False if it is enough to know whether the object exists
+        :return tuple: whether the key is cached, and its contents
+        """
+        if key in self.objects:
+            self.hits += 1
+            return True, self.objects[key][1] if need_contents else b''
+        self.misses += 1
+        return False, None
+
+    def set(self, key, etag, contents):
+        self.objects[key] = (etag, contents)
+
+    def forget(self, key):
+        self.objects.pop(key, None)
+
+
+def get_dir_uploads(local, key_prefix):
+    """
+    :param string local: directory of files to upload
+    :param string key_prefix:
+    :return list: (file, key) of each file under the directory
+    """
+    local = local.rstrip(os.path.sep)
+    uploads = []
+    for root, dirs, files in os.walk(local):
+        for f in sorted(files):
+            path = os.path.join(root, f)
+            key = key_prefix.rstrip('/') + path[len(local):].replace(os.path.sep, '/')
+            uploads.append((path, key))
+    return uploads
+
+
+def get_file_etag(path, block_size=1024 * 1024):
+    """
+    :return string: the ETag S3 gives an object with the same contents when it is uploaded in a single put, which is
+        the MD5 of the file.  Objects uploaded in parts have a different kind of ETag, so they always look changed.
+    """
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def map_in_threads(function, items, threads=1):
+    """
+    Calls function with each item, in up to `threads` threads at a time, e.g. for transfers that spend most of their
+        time waiting on S3.  An exception in any of the calls is raised once they are all done.
+    :param function function:
+    :param list items:
+    :param int threads:
+    :return list: what function returned for each item, in the same order
+    """
+    results = [None] * len(items)
+    if not threads or threads <= 1 or len(items) <= 1:
+        for i, item in enumerate(items):
+            results[i] = function(item)
+        return results
+
+    queue = Queue.Queue()
+    for i, item in enumerate(items):
+        queue.put((i, item))
+    errors = []
+
+    def worker():
+        while True:
+            try:
+                i, item = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[i] = function(item)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(min(threads, len(items)))]
+    for thread in workers:
+        thread.daemon = True
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
@@ -5,12 +5,15 @@ import tempfile
 from datetime import datetime
 from libraries.app.app import App
 from libraries.client.client_linter_callback import ClientLinterCallback
-from libraries.general_tools.file_utils import unzip, write_file, remove_tree, remove
+from libraries.converters.converter import Converter, get_output_files_key, get_output_finished_key, \
+    get_source_hashes_key
+from libraries.general_tools.file_utils import remove_tree, remove
 from libraries.general_tools.url_utils import download_file
 from libraries.models.job import TxJob
 
 
 class ClientConverterCallback(object):
+    UPLOAD_THREADS = 8  # converted files uploaded or copied at a time
 
     def __init__(self, identifier, success, info, warnings, errors):
         """
@@ -96,32 +99,33 @@ class ClientConverterCallback(object):
 
         App.logger.debug('Callback for commit {0}...'.format(s3_commit_key))
 
-        # Download the ZIP file of the converted files
-        converted_zip_url = self.job.output
-        converted_zip_file = os.path.join(self.temp_dir, converted_zip_url.rpartition('/')[2])
-        remove(converted_zip_file)  # make sure old file not present
-        download_success = True
-        App.logger.debug('Downloading converted zip file from {0}...'.format(converted_zip_url))
-        try:
-            download_file(converted_zip_url, converted_zip_file)
-        except:
-            download_success = False  # if multiple project we note fail and move on
-            if not multiple_project:
-                remove_tree(self.temp_dir)  # cleanup
-            if self.job.errors is None:
-                self.job.errors = []
-            self.job.errors.append("Missing converted file: " + converted_zip_url)
-        finally:
-            App.logger.debug('download finished, success={0}'.format(str(download_success)))
-
-        self.job.update()
-
-        if download_success:
-            # Unzip the archive
-            unzip_dir = self.unzip_converted_files(converted_zip_file)
-
-            # Upload all files to the cdn_bucket with the key of <user>/<repo_name>/<commit> of the repo
-            self.upload_converted_files(upload_key, unzip_dir)
+        self.keep_source_hashes(upload_key, s3_commit_key)
+        if self.copy_converted_files(upload_key):
+            self.job.update()
+        else:  # converters that don't publish their files, or a callback that is run again
+            # Download the ZIP file of the converted files
+            converted_zip_url = self.job.output
+            converted_zip_file = os.path.join(self.temp_dir, converted_zip_url.rpartition('/')[2])
+            remove(converted_zip_file)  # make sure old file not present
+            download_success = True
+            App.logger.debug('Downloading converted zip file from {0}...'.format(converted_zip_url))
+            try:
+                download_file(converted_zip_url, converted_zip_file)
+            except:
+                download_success = False  # if multiple project we note fail and move on
+                if not multiple_project:
+                    remove_tree(self.temp_dir)  # cleanup
+                if self.job.errors is None:
+                    self.job.errors = []
+                self.job.errors.append("Missing converted file: " + converted_zip_url)
+            finally:
+                App.logger.debug('download finished, success={0}'.format(str(download_success)))
+
+            self.job.update()
+
+            if download_success:
+                # Upload all files to the cdn_bucket with the key of <user>/<repo_name>/<commit> of the repo
+                self.upload_converted_files(upload_key, converted_zip_file)
 
         if multiple_project:
             # Now download the existing build_log.json file, update it and upload it back to S3 as convert_log
@@ -136,7 +140,8 @@ class ClientConverterCallback(object):
 
             self.cdn_upload_contents({}, s3_commit_key + '/finished')  # flag finished
 
-        results = ClientLinterCallback.deploy_if_conversion_finished(s3_commit_key, self.identifier)
+        results = ClientLinterCallback.deploy_if_conversion_finished(s3_commit_key, self.identifier,
+                                                                     stage='converted')
         if results:
             self.all_parts_completed = True
             build_log_json = results
@@ -144,24 +149,53 @@ class ClientConverterCallback(object):
         remove_tree(self.temp_dir)  # cleanup
         return build_log_json
 
-    def unzip_converted_files(self, converted_zip_file):
-        unzip_dir = tempfile.mkdtemp(prefix='unzip_', dir=self.temp_dir)
-        try:
-            App.logger.debug('Unzipping {0}...'.format(converted_zip_file))
-            unzip(converted_zip_file, unzip_dir)
-        finally:
-            App.logger.debug('finished.')
-
-        return unzip_dir
+    def copy_converted_files(self, s3_commit_key):
+        """
+        Has S3 copy the files that the converter published next to its output zip into place, so they don't have to be
+            downloaded and uploaded again
+        :param string s3_commit_key:
+        :return bool: False if the converter hasn't published its files
+        """
+        cdn_file = self.job.cdn_file
+        if not cdn_file or not App.cdn_s3_handler().key_exists(get_output_finished_key(cdn_file)):
+            return False
+        files_key = get_output_files_key(cdn_file)
+        copied = App.cdn_s3_handler().sync_prefix(files_key, s3_commit_key, parallel=self.UPLOAD_THREADS)
+        for key in copied:
+            App.logger.debug('Copied {0}'.format(key))
+        # the zip stays, the published files are only needed until they are copied
+        App.cdn_s3_handler().delete_prefix(files_key + '/')
+        App.cdn_s3_handler().delete_file(get_output_finished_key(cdn_file))
+        return True
+
+    def keep_source_hashes(self, upload_key, s3_commit_key):
+        """
+        Moves the hashes of the source files that the converter published next to its output zip to the build, for the
+            next build to find which files it doesn't have to convert again.  They are kept apart from the converted
+            files, so they aren't deployed.
+        :param string upload_key: where the converted files are uploaded
+        :param string s3_commit_key: where the converted files end up, since the output of each part of a build in
+            parts is moved there when the part is deployed
+        """
+        cdn_file = self.job.cdn_file
+        if not cdn_file:
+            return
+        source_hashes = App.cdn_s3_handler().get_json(get_source_hashes_key(cdn_file))
+        if not source_hashes:
+            return
+        source_hashes['output_key'] = s3_commit_key
+        App.cdn_s3_handler().put_json('{0}/{1}'.format(upload_key, Converter.SOURCE_HASHES_FILE), source_hashes,
+                                      cache_time=0)
+        App.cdn_s3_handler().delete_file(get_source_hashes_key(cdn_file))
 
     @staticmethod
-    def upload_converted_files(s3_commit_key, unzip_dir):
-        for root, dirs, files in os.walk(unzip_dir):
-            for f in sorted(files):
-                path = os.path.join(root, f)
-                key = s3_commit_key + path.replace(unzip_dir, '')
-                App.logger.debug('Uploading {0} to {1}'.format(f, key))
-                App.cdn_s3_handler().upload_file(path, key, cache_time=0)
+    def upload_converted_files(s3_commit_key, converted_zip_file):
+        # the files are uploaded straight from the zip, and files that are already in the cdn bucket with the same
+        # contents are left as they are
+        uploaded = App.cdn_s3_handler().sync_zip(converted_zip_file, s3_commit_key,
+                                                 parallel=ClientConverterCallback.UPLOAD_THREADS, cache_time=0)
+        for key in uploaded:
+            App.logger.debug('Uploaded {0}'.format(key))
 
     def update_convert_log(self, s3_base_key, part=''):
         build_log_json = self.get_build_log(s3_base_key, part)
@@ -199,10 +233,8 @@ class ClientConverterCallback(object):
         return build_log_json
 
     def cdn_upload_contents(self, contents, key):
-        file_name = os.path.join(self.temp_dir, 'contents.json')
-        write_file(file_name, contents)
         App.logger.debug('Writing file to ' + key)
-        App.cdn_s3_handler().upload_file(file_name, key, cache_time=0)
+        App.cdn_s3_handler().put_json(key, contents, cache_time=0)
 
     def get_build_log(self, s3_base_key, part=''):
         build_log_key = self.get_build_log_key(s3_base_key, part)
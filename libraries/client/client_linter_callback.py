@@ -1,15 +1,18 @@
 from __future__ import print_function, unicode_literals
-import os
 import tempfile
-import time
 from datetime import datetime
 from libraries.app.app import App
+from libraries.aws_tools.s3_handler import map_in_threads
+from libraries.general_tools.data_utils import convert_string_to_date
 from libraries.general_tools import file_utils
-from libraries.general_tools.file_utils import unzip, write_file, remove_tree, remove
+from libraries.general_tools.file_utils import unzip, remove_tree, remove
+from libraries.client.project_file import save_project_commit
+from libraries.models.completion import TxCompletion
 from libraries.models.job import TxJob
 
 
 class ClientLinterCallback(object):
+    READ_THREADS = 8  # merged build logs of the parts read at a time
 
     def __init__(self, identifier, success, info, warnings, errors, s3_results_key):
         """
@@ -73,7 +76,8 @@ class ClientLinterCallback(object):
             'log': self.log,
             'warnings': self.warnings,
             'errors': self.errors,
-            's3_commit_key': self.s3_results_key
+            's3_commit_key': self.s3_results_key,
+            'ended_at': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
         }
 
         if not self.success:
@@ -94,7 +98,8 @@ class ClientLinterCallback(object):
 
         ClientLinterCallback.upload_build_log(build_log, 'lint_log.json', self.temp_dir, self.s3_results_key)
 
-        results = ClientLinterCallback.deploy_if_conversion_finished(s3__master_results_key, self.identifier)
+        results = ClientLinterCallback.deploy_if_conversion_finished(s3__master_results_key, self.identifier,
+                                                                     stage='linted')
         if results:
             self.all_parts_completed = True
             build_log = results
@@ -105,14 +110,12 @@ class ClientLinterCallback(object):
 
     @staticmethod
     def upload_build_log(build_log, file_name, output_dir, s3_results_key, cache_time=0):
-        build_log_file = os.path.join(output_dir, file_name)
-        write_file(build_log_file, build_log)
         upload_key = '{0}/{1}'.format(s3_results_key, file_name)
         App.logger.debug('Saving build log to ' + upload_key)
-        App.cdn_s3_handler().upload_file(build_log_file, upload_key, cache_time=cache_time)
+        App.cdn_s3_handler().put_json(upload_key, build_log, cache_time=cache_time)
 
     @staticmethod
-    def deploy_if_conversion_finished(s3_results_key, identifier):
+    def deploy_if_conversion_finished(s3_results_key, identifier, stage=None):
         """
         check if all parts are finished, and if so then save merged build_log as well as update jobs table
         :param s3_results_key: format - u/user/repo/commid_id
@@ -120,23 +123,55 @@ class ClientLinterCallback(object):
                     job_id/part_count/part_id/book if multi-part job
                         or
                     job_id if single job
+        :param string stage: 'converted' or 'linted' when called because that stage of the part has just finished.
+                    For builds in the completion tracker, nothing is read from S3 until the part is finished.
         :return:
         """
-        output_dir = tempfile.mkdtemp(suffix="", prefix="client_callback_deploy_")
         build_log = None
         id_parts = identifier.split('/')
         multiple_project = len(id_parts) > 3
         all_parts_completed = True
+        part_id = id_parts[2] if multiple_project else '0'
+
+        part_finished = None
+        if stage:
+            part_finished = TxCompletion.finish_stage(s3_results_key, part_id, stage)
+            if part_finished is False:
+                App.logger.debug('Part {0} of {1} is still being converted or linted'.format(part_id, s3_results_key))
+                return None
+
+        output_dir = tempfile.mkdtemp(suffix="", prefix="client_callback_deploy_")
+        if part_finished and multiple_project:
+            # merge this part, and then all of them if it was the last one to finish
+            part_key = "{0}/{1}".format(s3_results_key, part_id)
+            ClientLinterCallback.merge_build_status_for_part(None, part_key, output_dir, convert_finished=True)
+            if not TxCompletion.count_merged_part(s3_results_key):
+                App.logger.debug('Merged part {0}, waiting for the rest'.format(part_key))
+                file_utils.remove_tree(output_dir)
+                return None
 
         if not multiple_project:
             App.logger.debug('Single job: checking if convert and lint have completed.')
-            build_log = ClientLinterCallback.merge_build_status_for_part(build_log, s3_results_key, output_dir)
+            build_log = ClientLinterCallback.merge_build_status_for_part(build_log, s3_results_key, output_dir,
+                                                                         convert_finished=part_finished)
         else:
             App.logger.debug('Multiple parts: Checking if all parts completed.')
             job_id, part_count, part_id, book = id_parts[:4]
-            for i in range(0, int(part_count)):
-                part_key = "{0}/{1}".format(s3_results_key, i)
-                build_log = ClientLinterCallback.merge_build_status_for_part(build_log, part_key, output_dir)
+            part_keys = ["{0}/{1}".format(s3_results_key, i) for i in range(0, int(part_count))]
+            if part_finished:
+                finished = dict((part_key + '/finished', True) for part_key in part_keys)
+            else:
+                # check the finished flags of all the parts at once, or else one at a time
+                try:
+                    finished = App.cdn_s3_handler().keys_exist([part_key + '/finished' for part_key in part_keys])
+                except Exception as e:
+                    App.logger.debug('Could not list finished flags: {0}'.format(e))
+                    finished = {}
+            merged_logs = ClientLinterCallback.get_parts_results(part_keys, 'merged.json')
+            for part_key in part_keys:
+                build_log = ClientLinterCallback.merge_build_status_for_part(build_log, part_key, output_dir,
+                                                                             finished.get(part_key + '/finished'),
+                                                                             merged_logs[part_key])
                 if build_log is None:
                     App.logger.debug('Part {0} not complete'.format(part_key))
                     all_parts_completed = False
@@ -201,42 +236,45 @@ class ClientLinterCallback(object):
         return
 
     @staticmethod
-    def merge_build_status_for_part(build_log, s3_results_key, output_dir):
+    def merge_build_status_for_part(build_log, s3_results_key, output_dir, convert_finished=None, merged_log=None):
         """
         merges convert and linter status for this part of conversion into build_log.  Returns None if part not finished.
         :param output_dir:
         :param build_log:
         :param s3_results_key:
+        :param bool convert_finished: whether the conversion has finished, if already known
+        :param dict merged_log: the merged.json of the part, if already read
         :return:
         """
-        part_build_log = ClientLinterCallback.get_results(s3_results_key, "merged.json")  # see if already merged
+        part_build_log = merged_log
+        if part_build_log is None:
+            part_build_log = ClientLinterCallback.get_results(s3_results_key, "merged.json")  # see if already merged
         if not part_build_log:
-            convert_finished = ClientLinterCallback.is_convert_finished(s3_results_key)
+            if convert_finished is None:
+                convert_finished = ClientLinterCallback.is_convert_finished(s3_results_key)
             if not convert_finished:
                 App.logger.debug('Convert not finished for {0}'.format(s3_results_key))
                 return None
 
             part_build_log = ClientLinterCallback.get_results(s3_results_key, "convert_log.json")
             if part_build_log:
-                part_build_log_combined = ClientLinterCallback.merge_build_status_for_file(part_build_log,
-                                                                                           s3_results_key,
-                                                                                           "lint_log.json",
-                                                                                           linter_file=True)
-                if not part_build_log_combined:
-                    App.logger.debug('Lint_log.json not found yet for {0}, wait and retry'.format(s3_results_key))
-                    time.sleep(2)
-                    part_build_log_combined = ClientLinterCallback.merge_build_status_for_file(part_build_log,
-                                                                                               s3_results_key,
-                                                                                               "lint_log.json",
-                                                                                               linter_file=True)
-
-                if part_build_log_combined:
-                    build_log = ClientLinterCallback.merge_results_logs(build_log, part_build_log_combined,
-                                                                        linter_file=False)
-                    ClientLinterCallback.update_jobs_table(s3_results_key, part_build_log_combined, output_dir)
-                    return build_log
-                else:
-                    App.logger.debug('Lint_log.json not found for {0}'.format(s3_results_key))
+                lint_log = ClientLinterCallback.get_results(s3_results_key, "lint_log.json")
+                if not lint_log:
+                    # no need to wait, since the lint callback merges the part when it arrives
+                    App.logger.debug('Lint_log.json not found yet for {0}, leaving the merge to the lint callback'
+                                     .format(s3_results_key))
+                    return None
+                merge_wait = ClientLinterCallback.get_merge_wait(part_build_log, lint_log)
+                part_build_log_combined = ClientLinterCallback.merge_results_logs(part_build_log, lint_log,
+                                                                                  linter_file=True)
+                if merge_wait is not None:
+                    part_build_log_combined['merge_wait_seconds'] = merge_wait
+                    App.logger.debug('Merging {0}, {1} seconds after the first of convert and lint finished'
+                                     .format(s3_results_key, merge_wait))
+                build_log = ClientLinterCallback.merge_results_logs(build_log, part_build_log_combined,
+                                                                    linter_file=False)
+                ClientLinterCallback.update_jobs_table(s3_results_key, part_build_log_combined, output_dir)
+                return build_log
             else:
                 App.logger.debug('convert_log.json not found for {0}'.format(s3_results_key))
 
@@ -246,6 +284,20 @@ class ClientLinterCallback(object):
             build_log = ClientLinterCallback.merge_results_logs(build_log, part_build_log, linter_file=False)
             return build_log
 
+    @staticmethod
+    def get_merge_wait(convert_log, lint_log):
+        """
+        :param dict convert_log:
+        :param dict lint_log:
+        :return int: seconds between the conversion and the linting of a part finishing, or None if not known
+        """
+        try:
+            convert_ended = convert_string_to_date(convert_log['ended_at'])
+            lint_ended = convert_string_to_date(lint_log['ended_at'])
+            return int(abs((lint_ended - convert_ended).total_seconds()))
+        except Exception:
+            return None
+
     @staticmethod
     def is_convert_finished(s3_results_key):
         key = "{0}/{1}".format(s3_results_key, 'finished')
@@ -262,13 +314,16 @@ class ClientLinterCallback(object):
         return file_results
 
     @staticmethod
-    def merge_build_status_for_file(build_log, s3_results_key, file_name, linter_file=False):
-        key = "{0}/{1}".format(s3_results_key, file_name)
-        file_results = App.cdn_s3_handler().get_json(key)
-        if file_results:
-            build_log = ClientLinterCallback.merge_results_logs(build_log, file_results, linter_file)
-            return build_log
-        return None
+    def get_parts_results(part_keys, file_name):
+        """
+        Reads the same results file of each part at once, instead of one part after another
+        :param list part_keys:
+        :param string file_name:
+        :return dict: the results of each part, by part key
+        """
+        results = map_in_threads(lambda part_key: ClientLinterCallback.get_results(part_key, file_name), part_keys,
+                                 threads=ClientLinterCallback.READ_THREADS)
+        return dict(zip(part_keys, results))
 
     @staticmethod
     def merge_results_logs(build_log, file_results, linter_file):
@@ -297,11 +352,6 @@ class ClientLinterCallback(object):
         commit_id = build_log['commit_id']
         user_name = build_log['repo_owner']
         repo_name = build_log['repo_name']
-        project_json_key = 'u/{0}/{1}/project.json'.format(user_name, repo_name)
-        project_json = App.cdn_s3_handler().get_json(project_json_key)
-        project_json['user'] = user_name
-        project_json['repo'] = repo_name
-        project_json['repo_url'] = 'https://{0}/{1}/{2}'.format(App.gogs_url, user_name, repo_name)
         commit = {
             'id': commit_id,
             'created_at': build_log['created_at'],
@@ -314,15 +364,5 @@ class ClientLinterCallback(object):
             commit['started_at'] = build_log['started_at']
         if 'ended_at' in build_log:
             commit['ended_at'] = build_log['ended_at']
-        if 'commits' not in project_json:
-            project_json['commits'] = []
-        commits = []
-        for c in project_json['commits']:
-            if c['id'] != commit_id:
-                commits.append(c)
-        commits.append(commit)
-        project_json['commits'] = commits
-        project_file = os.path.join(output_dir, 'project.json')
-        write_file(project_file, project_json)
-        App.cdn_s3_handler().upload_file(project_file, project_json_key, cache_time=0)
-        return project_json
+        repo_url = 'https://{0}/{1}/{2}'.format(App.gogs_url, user_name, repo_name)
+        return save_project_commit(user_name, repo_name, repo_url, commit)
@@ -5,13 +5,15 @@ import tempfile
 import json
 import hashlib
 from datetime import datetime, timedelta
-from libraries.general_tools.file_utils import unzip, write_file, add_contents_to_zip, remove_tree
+from libraries.general_tools.file_utils import unzip, add_contents_to_zip, remove_tree
 from libraries.general_tools.url_utils import download_file
 from libraries.resource_container.ResourceContainer import RC
 from libraries.client.preprocessors import do_preprocess
+from libraries.client.project_file import save_project_commit
 from libraries.models.manifest import TxManifest
 from libraries.models.module import TxModule
 from libraries.app.app import App
+from libraries.models.completion import TxCompletion
 from libraries.models.job import TxJob
 
 
@@ -34,6 +36,7 @@ class ClientWebhook(object):
         except:
             pass
         self.converter_callback = '{0}/client/callback/converter'.format(App.api_url)
+        self.previous_build_key = None
         self.linter_callback = '{0}/client/callback/linter'.format(App.api_url)
 
     def process_webhook(self):
@@ -185,13 +188,21 @@ class ClientWebhook(object):
         # Upload an initial build_log
         self.upload_build_log_to_s3(build_log_json, s3_commit_key)
 
+        # Converters can reuse the output of files that haven't changed since the last successful build
+        self.previous_build_key = self.get_previous_build_key(commit_id, repo_name, user_name)
+
         # Update the project.json file
         self.update_project_json(commit_id, job, repo_name, user_name)
 
+        # Track the conversion and linting of each part, so the last callback can merge and deploy straight away
+        if converter and linter:
+            part_count = len(preprocessor.get_book_list()) if preprocessor.is_multiple_jobs() else 1
+            TxCompletion.start(s3_commit_key, part_count)
+
         # Convert and lint
         if converter:
             if not preprocessor.is_multiple_jobs():
-                self.send_request_to_converter(job, converter)
+                self.send_request_to_converter(job, converter, self.previous_build_key)
                 if linter:
                     extra_payload = {
                         's3_results_key': s3_commit_key
@@ -206,6 +217,7 @@ class ClientWebhook(object):
                 book_count = len(books)
                 build_log_json['multiple'] = True
                 build_log_json['build_logs'] = []
+                previous_part_keys = self.get_previous_part_keys(self.previous_build_key)
                 for i in range(0, len(books)):
                     book = books[i]
                     App.logger.debug('Adding job for {0}, part {1} of {2}'.format(book, i, book_count))
@@ -236,7 +248,7 @@ class ClientWebhook(object):
                         book_build_log['part'] = part
                     build_log_json['build_logs'].append(book_build_log)
                     self.upload_build_log_to_s3(book_build_log, s3_commit_key, str(i) + "/")
-                    self.send_request_to_converter(book_job, converter)
+                    self.send_request_to_converter(book_job, converter, previous_part_keys.get(book))
                     if linter:
                         extra_payload = {
                             'single_file': book,
@@ -254,9 +266,10 @@ class ClientWebhook(object):
 
     def clear_commit_directory_in_cdn(self, s3_commit_key):
         # clear out the commit directory in the cdn bucket for this project revision
-        for obj in App.cdn_s3_handler().get_objects(prefix=s3_commit_key):
-            App.logger.debug('Removing file: ' + obj.key)
-            App.cdn_s3_handler().delete_file(obj.key)
+        App.logger.debug('Removing files under: ' + s3_commit_key)
+        failed = App.cdn_s3_handler().delete_prefix(s3_commit_key)
+        if failed:
+            App.logger.warning('Could not remove files: {0}'.format(', '.join(failed)))
 
     def upload_build_log_to_s3(self, build_log, s3_commit_key, part=''):
         """
@@ -265,11 +278,9 @@ class ClientWebhook(object):
         :param string part:
         :return:
         """
-        build_log_file = os.path.join(self.base_temp_dir, 'build_log.json')
-        write_file(build_log_file, build_log)
         upload_key = '{0}/{1}build_log.json'.format(s3_commit_key, part)
         App.logger.debug('Saving build log to ' + upload_key)
-        App.cdn_s3_handler().upload_file(build_log_file, upload_key, cache_time=0)
+        App.cdn_s3_handler().put_json(upload_key, build_log, cache_time=0)
         # App.logger.debug('build log contains: ' + json.dumps(build_log_json))
 
     def create_build_log(self, commit_id, commit_message, commit_url, compare_url, job, pusher_username, repo_name,
@@ -304,11 +315,6 @@ class ClientWebhook(object):
         :param string repo_owner:
         :return:
         """
-        project_json_key = 'u/{0}/{1}/project.json'.format(repo_owner, repo_name)
-        project_json = App.cdn_s3_handler().get_json(project_json_key)
-        project_json['user'] = repo_owner
-        project_json['repo'] = repo_name
-        project_json['repo_url'] = 'https://git.door43.org/{0}/{1}'.format(repo_owner, repo_name)
         commit = {
             'id': commit_id,
             'created_at': job.created_at,
@@ -317,17 +323,38 @@ class ClientWebhook(object):
             'started_at': None,
             'ended_at': None
         }
-        if 'commits' not in project_json:
-            project_json['commits'] = []
-        commits = []
-        for c in project_json['commits']:
-            if c['id'] != commit_id:
-                commits.append(c)
-        commits.append(commit)
-        project_json['commits'] = commits
-        project_file = os.path.join(self.base_temp_dir, 'project.json')
-        write_file(project_file, project_json)
-        App.cdn_s3_handler().upload_file(project_file, project_json_key)
+        repo_url = 'https://git.door43.org/{0}/{1}'.format(repo_owner, repo_name)
+        save_project_commit(repo_owner, repo_name, repo_url, commit)
+
+    def get_previous_build_key(self, commit_id, repo_name, repo_owner):
+        """
+        :param string commit_id:
+        :param string repo_name:
+        :param string repo_owner:
+        :return string: CDN key of the latest successful build of another commit, or None if there isn't one
+        """
+        project_json_key = 'u/{0}/{1}/project.json'.format(repo_owner, repo_name)
+        project_json = App.cdn_s3_handler().get_json(project_json_key)
+        for c in reversed(project_json.get('commits', [])):
+            if c['id'] != commit_id and c.get('success') and c.get('status') in ['success', 'warnings']:
+                return 'u/{0}/{1}/{2}'.format(repo_owner, repo_name, c['id'])
+        return None
+
+    def get_previous_part_keys(self, previous_build_key):
+        """
+        The output of a build in parts is under a key for each part, e.g. u/<user>/<repo>/<commit>/<part>, and the parts
+            are numbered in the order of the books in that build
+        :param string previous_build_key: CDN key of the previous build, e.g. u/<user>/<repo>/<commit>
+        :return dict: CDN key of the output of each book in the previous build, empty if it wasn't built in parts
+        """
+        if not previous_build_key:
+            return {}
+        build_log = App.cdn_s3_handler().get_json('{0}/build_log.json'.format(previous_build_key))
+        part_keys = {}
+        for part_build_log in build_log.get('build_logs') or []:
+            if part_build_log.get('book') and 'part' in part_build_log:
+                part_keys[part_build_log['book']] = '{0}/{1}'.format(previous_build_key, part_build_log['part'])
+        return part_keys
 
     def upload_zip_file(self, commit_id, zip_filepath):
         file_key = 'preconvert/{0}.zip'.format(commit_id)
@@ -350,10 +377,11 @@ class ClientWebhook(object):
 
         return repo_dir
 
-    def send_request_to_converter(self, job, converter):
+    def send_request_to_converter(self, job, converter, previous_build_key=None):
         """
         :param TxJob job:
         :param TxModule converter:
+        :param string previous_build_key: CDN key of the output of the same job in the last successful build
         :return bool:
         """
         payload = {
@@ -365,6 +393,8 @@ class ClientWebhook(object):
             'options': job.options,
             'convert_callback': self.converter_callback
         }
+        if previous_build_key:
+            payload['previous_build_key'] = previous_build_key
         return self.send_payload_to_converter(payload, converter)
 
     def send_payload_to_converter(self, payload, converter):
@@ -0,0 +1,43 @@
+from __future__ import print_function, unicode_literals
+from libraries.app.app import App
+from libraries.models.project_commit import TxProjectCommit
+
+# times project.json is written in one update before giving up on catching up with other builds
+MAX_WRITES = 3
+
+
+def save_project_commit(repo_owner, repo_name, repo_url, commit):
+    """
+    Saves a commit of a project and writes its project.json from all of the saved commits.  Each commit is saved on
+        its own, so builds of the same project can update it at the same time.  Whichever build saves a commit last
+        makes sure the project.json written after it has that commit.
+    The whole project.json is still written from all of the saved commits, rather than just the commit that changed:
+        S3 can only replace an object as a whole, and the deployer and the door43 site read the full list of commits
+        from it.  Patching the file that was read from S3 would drop a commit saved by another build in between.
+        Anything else in the project.json is kept as it is.
+    :param string repo_owner:
+    :param string repo_name:
+    :param string repo_url:
+    :param dict commit: the commit as it appears in project.json
+    :return dict: the project.json that was written
+    """
+    project_key = 'u/{0}/{1}'.format(repo_owner, repo_name)
+    project_json_key = '{0}/project.json'.format(project_key)
+    project_json = App.cdn_s3_handler().get_json(project_json_key)
+    if not TxProjectCommit.is_tracked(project_key):
+        # take over the commits of a project.json that was written before the commits were saved
+        TxProjectCommit.start(project_key, project_json.get('commits', []))
+    TxProjectCommit.save(project_key, commit)
+
+    project_json['user'] = repo_owner
+    project_json['repo'] = repo_name
+    project_json['repo_url'] = repo_url
+    for _ in range(MAX_WRITES):
+        revision = TxProjectCommit.get_revision(project_key)
+        project_json['commits'] = TxProjectCommit.get_commits(project_key)
+        App.cdn_s3_handler().put_json(project_json_key, project_json, cache_time=0)
+        if TxProjectCommit.get_revision(project_key) == revision:
+            break
+        # another build saved a commit while this was being written, so write the file again to include it
+        App.logger.debug('{0} changed while it was written, writing it again'.format(project_json_key))
+    return project_json
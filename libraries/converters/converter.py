@@ -1,24 +1,78 @@
 from __future__ import print_function, unicode_literals
+import hashlib
 import json
 import os
 import tempfile
 import traceback
 import urlparse
+import zipfile
 import requests
 from libraries.general_tools.url_utils import download_file
-from libraries.general_tools.file_utils import unzip, add_contents_to_zip, remove_tree, remove
+from libraries.general_tools.file_utils import unzip, add_contents_to_zip_stream, remove_tree, remove, get_files, \
+    hash_file
 from libraries.app.app import App
-from shutil import copy
 from convert_logger import ConvertLogger
 from abc import ABCMeta, abstractmethod
 
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'templates')
+template_cache = {}  # compiled templates, kept for as long as the process runs
+
+
+def get_output_files_key(cdn_file):
+    """
+    :param string cdn_file: key of the output zip, e.g. tx/job/<job_id>.zip
+    :return string: prefix the output files are published under next to the zip, e.g. tx/job/<job_id>/files
+    """
+    return os.path.splitext(cdn_file)[0] + '/files'
+
+
+def get_output_finished_key(cdn_file):
+    """
+    :param string cdn_file: key of the output zip, e.g. tx/job/<job_id>.zip
+    :return string: key that is written once all of the output files have been published
+    """
+    return os.path.splitext(cdn_file)[0] + '/finished'
+
+
+def get_source_hashes_key(cdn_file):
+    """
+    :param string cdn_file: key of the output zip, e.g. tx/job/<job_id>.zip
+    :return string: key of the hashes of the source files next to the zip
+    """
+    return os.path.splitext(cdn_file)[0] + '/' + Converter.SOURCE_HASHES_FILE
+
+
+def get_template(compile_template=None, key=None, file_name='template.html'):
+    """
+    Gets a template from the templates folder, reading and compiling it only once per process
+    :param function compile_template: makes the compiled template from the template text, e.g. string.Template.
+        It is also given the key if there is one.  It must be a plain function, not a bound method
+    :param key: anything else the compiled template depends on, e.g. the title filled in when compiling
+    :param string file_name:
+    :return: the compiled template, or the template text if there is no compile_template
+    """
+    cache_key = (file_name, compile_template, key)
+    if cache_key not in template_cache:
+        text_key = (file_name, None, None)
+        if text_key not in template_cache:
+            with open(os.path.join(TEMPLATES_DIR, file_name)) as template_file:
+                template_cache[text_key] = template_file.read()
+        if compile_template:
+            template = template_cache[text_key]
+            template_cache[cache_key] = compile_template(template) if key is None else compile_template(template, key)
+    return template_cache[cache_key]
+
 
 class Converter(object):
     __metaclass__ = ABCMeta
 
     EXCLUDED_FILES = ["license.md", "package.json", "project.json", 'readme.md']
+    SOURCE_HASHES_FILE = 'source_hashes.json'
+    OUTPUT_VERSION = 1  # change this whenever converted output changes, so earlier output is not reused
+    UPLOAD_THREADS = 8  # output files uploaded at a time
 
-    def __init__(self, source, resource, cdn_file=None, options=None, convert_callback=None, identifier=None):
+    def __init__(self, source, resource, cdn_file=None, options=None, convert_callback=None, identifier=None,
+                 compression=zipfile.ZIP_STORED, part_size=None):
         """
         :param string source:
         :param string resource:
@@ -26,6 +80,8 @@ class Converter(object):
         :param dict options:
         :param string convert_callback:
         :param string identifier:
+        :param int compression: how the files in the output zip are compressed, zipfile.ZIP_STORED or ZIP_DEFLATED
+        :param int part_size: bytes in each part of the multipart upload of the output zip
         """
         self.options = {}
         self.source = source
@@ -38,20 +94,24 @@ class Converter(object):
         self.files_dir = tempfile.mkdtemp(prefix='files_')
         self.input_zip_file = None  # If set, won't download the repo archive. Used for testing
         self.output_dir = tempfile.mkdtemp(prefix='output_')
-        self.output_zip_file = tempfile.mktemp(prefix="{0}_".format(resource), suffix='.zip')
+        self.compression = compression
+        self.part_size = part_size
         self.callback = convert_callback
         self.callback_status = 0
         self.callback_results = None
         self.identifier = identifier
         if self.callback and not identifier:
             App.logger.error("Identity not given for callback")
+        self.source_hashes = None  # hashes of the source files and of how they are converted
+        self.previous_build_key = None
+        self.previous_output_key = None  # where the output of the previous build ended up
+        self.previous_hashes = None
 
     def close(self):
         """delete temp files"""
         remove_tree(self.download_dir)
         remove_tree(self.files_dir)
         remove_tree(self.output_dir)
-        remove(self.output_zip_file)
 
     def __del__(self):
         self.close()
@@ -66,9 +126,13 @@ class Converter(object):
         """
         raise NotImplementedError()
 
-    def run(self):
+    def run(self, previous_build_key=None):
         """
         Call the converters
+        :param string previous_build_key: CDN key of the last successful build of the same repo, e.g.
+            u/<user>/<repo>/<commit>, or u/<user>/<repo>/<commit>/<part> for a book of a build in parts.  The
+            output of source files that haven't changed since then is copied from that build instead of being
+            converted again.
         """
         success = False
         try:
@@ -78,18 +142,18 @@ class Converter(object):
             # unzip the input archive
             App.logger.debug("Unzipping {0} to {1}".format(self.input_zip_file, self.files_dir))
             unzip(self.input_zip_file, self.files_dir)
+            self.hash_source_files(previous_build_key)
             # convert method called
             App.logger.debug("Converting files...")
             if self.convert():
                 App.logger.debug("Was able to convert {0}".format(self.resource))
-                # zip the output dir to the output archive
-                App.logger.debug("Adding files in {0} to {1}".format(self.output_dir, self.output_zip_file))
-                add_contents_to_zip(self.output_zip_file, self.output_dir)
-                remove_tree(self.output_dir)
-                # upload the output archive either to cdn_bucket or to a file (no cdn_bucket)
-                App.logger.debug("Uploading archive to {0}/{1}".format(App.cdn_bucket, self.cdn_file))
+                # zip the output dir straight to the output archive in the cdn_bucket, or to a file (no cdn_bucket)
+                App.logger.debug("Uploading archive of {0} to {1}/{2}".format(self.output_dir, App.cdn_bucket,
+                                                                              self.cdn_file))
                 self.upload_archive()
-                remove(self.output_zip_file)
+                self.upload_source_hashes()
+                self.upload_output_files()
+                remove_tree(self.output_dir)
                 App.logger.debug("Uploaded")
                 success = True
             else:
@@ -113,6 +177,80 @@ class Converter(object):
         App.logger.debug(results)
         return results
 
+    def get_conversion_parts(self):
+        """
+        Gets everything besides the source files that the converted output depends on
+        :return list:
+        """
+        return [self.__class__.__name__, self.OUTPUT_VERSION, self.resource]
+
+    def hash_source_files(self, previous_build_key=None):
+        """
+        Hashes the source files, and loads the hashes of the previous build so that unchanged files can be found
+        :param string previous_build_key:
+        """
+        conversion = hashlib.sha256()
+        for part in self.get_conversion_parts():
+            conversion.update('{0}\0'.format(part).encode('utf-8'))
+        files = {}
+        for file_path in get_files(directory=self.files_dir, relative_paths=True):
+            files[file_path.replace(os.path.sep, '/')] = hash_file(os.path.join(self.files_dir, file_path))
+        self.source_hashes = {
+            'conversion': conversion.hexdigest(),
+            'files': files
+        }
+
+        self.previous_build_key = previous_build_key
+        self.previous_output_key = None
+        self.previous_hashes = None
+        if previous_build_key and App.cdn_s3_handler():
+            key = '{0}/{1}'.format(previous_build_key, self.SOURCE_HASHES_FILE)
+            previous_hashes = App.cdn_s3_handler().get_json(key)
+            if not previous_hashes:
+                App.logger.debug('Not reusing the output of {0}, there is no {1}'.format(previous_build_key,
+                                                                                        self.SOURCE_HASHES_FILE))
+            elif previous_hashes.get('conversion') == self.source_hashes['conversion']:
+                self.previous_hashes = previous_hashes
+                # the output of a part is moved next to the other parts' output when it is deployed
+                self.previous_output_key = previous_hashes.get('output_key') or previous_build_key
+            else:
+                App.logger.debug('Not reusing the output of {0}, it was converted differently'
+                                 .format(previous_build_key))
+
+    def is_unchanged(self, filename):
+        """
+        :param string filename: path of a source file in files_dir
+        :return bool: True if the file is the same as in the previous build and was converted the same way
+        """
+        if not self.previous_hashes:
+            return False
+        file_path = os.path.relpath(filename, self.files_dir).replace(os.path.sep, '/')
+        file_hash = self.source_hashes['files'].get(file_path)
+        return file_hash is not None and self.previous_hashes.get('files', {}).get(file_path) == file_hash
+
+    def reuse_previous_outputs(self, outputs):
+        """
+        Copies the output of unchanged source files from the previous build instead of converting them again
+        :param list outputs: (source file, output file) of each file to be converted
+        :return set: source files whose output was copied, the rest still need to be converted
+        """
+        reused = set()
+        for filename, output_file in outputs:
+            if not self.is_unchanged(filename):
+                continue
+            key = '{0}/{1}'.format(self.previous_output_key, os.path.basename(output_file))
+            try:
+                App.cdn_s3_handler().download_file(key, output_file)
+            except Exception as e:
+                App.logger.debug('Could not reuse {0}, converting it: {1}'.format(key, e))
+                remove(output_file)
+                continue
+            reused.add(filename)
+        if reused:
+            App.logger.debug('Reused the output of {0} unchanged files from {1}'.format(len(reused),
+                                                                                  self.previous_output_key))
+        return reused
+
     def download_archive(self):
         archive_url = self.source
         filename = self.source.rpartition('/')[2]
@@ -125,10 +263,36 @@ class Converter(object):
                     raise Exception("Failed to download {0}".format(archive_url))
 
     def upload_archive(self):
+        """
+        Zips the output files as they are uploaded, so the archive is never written to disk or read back into memory
+        """
         if self.cdn_file and os.path.isdir(os.path.dirname(self.cdn_file)):
-            copy(self.output_zip_file, self.cdn_file)
+            with open(self.cdn_file, 'wb') as zip_stream:
+                add_contents_to_zip_stream(zip_stream, self.output_dir, self.compression)
         elif App.cdn_s3_handler():
-            App.cdn_s3_handler().upload_file(self.output_zip_file, self.cdn_file, cache_time=0)
+            with App.cdn_s3_handler().open_upload_stream(self.cdn_file, cache_time=0, content_type='application/zip',
+                                                         part_size=self.part_size) as zip_stream:
+                add_contents_to_zip_stream(zip_stream, self.output_dir, self.compression)
+
+    def upload_source_hashes(self):
+        """
+        Publishes the source hashes next to the zip, for the callback to keep with the build.  They aren't part of the
+            output, so output that reuses the previous build is the same as output that is all converted again.
+        """
+        if not self.cdn_file or os.path.isdir(os.path.dirname(self.cdn_file)) or not App.cdn_s3_handler():
+            return
+        App.cdn_s3_handler().put_json(get_source_hashes_key(self.cdn_file), self.source_hashes, cache_time=0)
+
+    def upload_output_files(self):
+        """
+        Publishes the output files next to the zip as well, so the callback can have S3 copy them into place instead of
+            downloading the zip and uploading its files again
+        """
+        if not self.cdn_file or os.path.isdir(os.path.dirname(self.cdn_file)) or not App.cdn_s3_handler():
+            return
+        App.cdn_s3_handler().upload_dir(self.output_dir, get_output_files_key(self.cdn_file),
+                                        parallel=self.UPLOAD_THREADS, cache_time=0)
+        App.cdn_s3_handler().put_bytes(get_output_finished_key(self.cdn_file), '', cache_time=0)
 
     def do_callback(self, url, payload):
         if url.startswith('http'):
@@ -1,17 +1,48 @@
 from __future__ import print_function, unicode_literals
+import multiprocessing
 import os
+import re
 import string
+import zipfile
 import markdown
 import markdown2
 import codecs
 from shutil import copyfile
-from bs4 import BeautifulSoup
+from libraries.app.app import App
 from libraries.general_tools.file_utils import write_file, get_files
-from converter import Converter
+from converter import Converter, get_template
+
+# one configured Markdown instance of each kind, reused for every file converted in this process
+markdown_engines = {}
+
+# a header, with its tag name, attributes and contents
+header_re = re.compile(r'<(h[1-6])(\s[^>]*)?>(.*?)</\1\s*>', re.DOTALL | re.IGNORECASE)
+
+# a tag in the contents of a header
+tag_re = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:\s[^>]*?)?)(/?)>')
+
+# an attribute of a tag, e.g. id="verbs"
+attribute_re = re.compile(r'([^\s=/]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
 
 
 class Md2HtmlConverter(Converter):
 
+    def __init__(self, source, resource, cdn_file=None, options=None, convert_callback=None, identifier=None,
+                 compression=zipfile.ZIP_STORED, part_size=None, processes=1):
+        """
+        :param int processes: Number of worker processes to convert files in, None for one per CPU
+        """
+        self.processes = processes
+        super(Md2HtmlConverter, self).__init__(source, resource, cdn_file=cdn_file, options=options,
+                                               convert_callback=convert_callback, identifier=identifier,
+                                               compression=compression, part_size=part_size)
+
+    def get_conversion_parts(self):
+        parts = super(Md2HtmlConverter, self).get_conversion_parts()
+        if self.resource == "obs":
+            parts.append(self.source)  # the title of OBS pages
+        return parts
+
     def convert(self):
         if self.resource == "obs":
             self.convert_obs()
@@ -26,26 +57,17 @@ class Md2HtmlConverter(Converter):
         # find the first directory that has md files.
         files = get_files(directory=self.files_dir, exclude=self.EXCLUDED_FILES)
 
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
-            html_template = string.Template(template_file.read())
-
         found_chapters = {}
 
+        md_files = []
         for filename in files:
             if filename.endswith('.md'):
                 # Convert files that are markdown files
-                with codecs.open(filename, 'r', 'utf-8-sig') as md_file:
-                    md = md_file.read()
-                html = markdown.markdown(md)
-                html = html_template.safe_substitute(title=self.source.upper(), content=html)
                 base_name = os.path.splitext(os.path.basename(filename))[0]
                 found_chapters[base_name] = True
                 html_filename = base_name + ".html"
                 output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, html)
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename),
-                                                             os.path.basename(html_filename)))
+                md_files.append((filename, output_file, 'markdown', self.source.upper(), False))
             else:
                 # Directly copy over files that are not markdown files
                 try:
@@ -54,6 +76,7 @@ class Md2HtmlConverter(Converter):
                         copyfile(filename, output_file)
                 except:
                     pass
+        self.convert_files(md_files)
         self.log.info('Finished processing OBS Markdown files.')
 
     def convert_markdown(self):
@@ -63,12 +86,9 @@ class Md2HtmlConverter(Converter):
         files = get_files(directory=self.files_dir, exclude=self.EXCLUDED_FILES)
         convert_only_list = self.check_for_exclusive_convert()
 
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
-            html_template = string.Template(template_file.read())
-
         found_chapters = {}
 
+        md_files = []
         for filename in files:
             if filename.endswith('.md'):
                 base_name = os.path.basename(filename)
@@ -76,30 +96,12 @@ class Md2HtmlConverter(Converter):
                     continue
 
                 # Convert files that are markdown files
-                with codecs.open(filename, 'r', 'utf-8-sig') as md_file:
-                    md = md_file.read()
-                if self.resource in ['ta']:
-                    html = markdown2.markdown(md, extras=['markdown-in-html', 'tables'])
-                else:
-                    html = markdown.markdown(md)
-                html = html_template.safe_substitute(title=self.resource.upper(), content=html)
-
-                # Change headers like <h1><a id="verbs"/>Verbs</h1> to <h1 id="verbs">Verbs</h1>
-                soup = BeautifulSoup(html, 'html.parser')
-                for tag in soup.findAll('a', {'id': True}):
-                    if tag.parent and tag.parent.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                        tag.parent['id'] = tag['id']
-                        tag.parent['class'] = tag.parent.get('class', []) + ['section-header']
-                        tag.extract()
-                html = unicode(soup)
-
+                engine = 'markdown2' if self.resource in ['ta'] else 'markdown'
                 base_name = os.path.splitext(os.path.basename(filename))[0]
                 found_chapters[base_name] = True
                 html_filename = base_name + ".html"
                 output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, html)
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename),
-                                                             os.path.basename(html_filename)))
+                md_files.append((filename, output_file, engine, self.resource.upper(), True))
             else:
                 # Directly copy over files that are not markdown files
                 try:
@@ -108,4 +110,159 @@ class Md2HtmlConverter(Converter):
                         copyfile(filename, output_file)
                 except:
                     pass
+        self.convert_files(md_files)
         self.log.info('Finished processing Markdown files.')
+
+    def convert_files(self, md_files):
+        """
+        Converts the markdown files, in a pool of worker processes if there is more than one, and copies the output
+            of unchanged files from the previous build instead
+        :param list md_files: arguments for convert_markdown_file() for each file
+        """
+        reused = self.reuse_previous_outputs([md_file[:2] for md_file in md_files])
+        changed_files = [md_file for md_file in md_files if md_file[0] not in reused]
+        results = None
+        if self.processes != 1 and len(changed_files) > 1:
+            results = self.convert_files_in_pool(changed_files)
+        if results is None:
+            results = [convert_markdown_file(md_file) for md_file in changed_files]
+
+        results = iter(results)
+        for md_file in md_files:
+            if md_file[0] in reused:
+                self.add_file_logs([('info', get_converted_message(md_file[0], md_file[1]))])
+            else:
+                self.add_file_logs(next(results))
+
+    def convert_files_in_pool(self, md_files):
+        """
+        Converts the files in a pool of worker processes
+        :param list md_files: arguments for convert_markdown_file() for each file
+        :return list: the logs of each file, or None if a pool could not be started
+        """
+        try:
+            pool = multiprocessing.Pool(self.processes)
+        except OSError as e:  # e.g. there is no /dev/shm on AWS Lambda
+            App.logger.warning("Could not start worker processes, converting files one at a time: {0}".format(e))
+            return None
+
+        App.logger.debug("converting {0} files in {1} processes".format(len(md_files),
+                                                                       self.processes or multiprocessing.cpu_count()))
+        try:
+            # larger chunks, since there can be a thousand small files
+            return pool.map(convert_markdown_file, md_files, chunksize=max(1, len(md_files) // 64))
+        finally:
+            pool.close()
+            pool.join()
+
+    def add_file_logs(self, logs):
+        for log_type, msg in logs:
+            self.log.log(log_type, msg)
+
+
+def convert_markdown_file(args):
+    """
+    Converts one markdown file to an HTML page.  This is a module function so that it can be run in a worker process.
+    :param tuple args: file name of the markdown, file name of the page, markdown engine for render_markdown(), title
+        and whether to move anchors onto headers
+    :return list: (log type, message) of each message to log for the file
+    """
+    filename, output_file, engine, title, move_anchors = args
+    with codecs.open(filename, 'r', 'utf-8-sig') as md_file:
+        md = md_file.read()
+    html = render_markdown(md, engine)
+    html = get_template(string.Template).safe_substitute(title=title, content=html)
+    if move_anchors:
+        html = move_header_anchors(html)
+    write_file(output_file, html)
+    return [('info', get_converted_message(filename, output_file))]
+
+
+def get_converted_message(filename, output_file):
+    return 'Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(output_file))
+
+
+def render_markdown(md, engine='markdown'):
+    """
+    Converts markdown to HTML with a Markdown instance that is set up once per process and reset for each file
+    :param string md:
+    :param string engine: 'markdown' for Python-Markdown, or 'markdown2' for markdown2 with the extras used for tA
+    :return string:
+    """
+    if engine not in markdown_engines:
+        if engine == 'markdown2':
+            markdown_engines[engine] = markdown2.Markdown(extras=['markdown-in-html', 'tables'])
+        else:
+            markdown_engines[engine] = markdown.Markdown()
+    md_engine = markdown_engines[engine]
+    md_engine.reset()
+    return md_engine.convert(md)
+
+
+def move_header_anchors(html):
+    """
+    Changes headers like <h1><a id="verbs"/>Verbs</h1> to <h1 id="verbs" class="section-header">Verbs</h1>.  Only
+        anchors directly in a header are moved, and the rest of the HTML is left as it is.
+    :param string html:
+    :return string:
+    """
+    return header_re.sub(move_anchors_in_header, html)
+
+
+def move_anchors_in_header(header_match):
+    name, attributes, contents = header_match.groups()
+    ids = []
+    kept = []
+    depth = 0
+    pos = 0
+    skip_to_close = False  # inside an anchor that is being removed
+    for tag_match in tag_re.finditer(contents):
+        closing, tag_name, tag_attributes, self_closing = tag_match.groups()
+        tag_name = tag_name.lower()
+        if skip_to_close:
+            if closing and tag_name == 'a':
+                skip_to_close = False
+                pos = tag_match.end()
+            continue
+        if closing:
+            depth = max(depth - 1, 0)
+        elif depth == 0 and tag_name == 'a' and get_attribute(tag_attributes, 'id') is not None:
+            ids.append(get_attribute(tag_attributes, 'id'))
+            kept.append(contents[pos:tag_match.start()])
+            pos = tag_match.end()
+            skip_to_close = not self_closing
+        elif not self_closing:
+            depth += 1
+    if not ids:
+        return header_match.group(0)
+    if not skip_to_close:  # an anchor that is never closed takes the rest of the header with it
+        kept.append(contents[pos:])
+
+    attributes = attributes or ''
+    header_id = ids[-1]
+    classes = get_attribute(attributes, 'class')
+    classes = (classes.split() if classes else []) + ['section-header'] * len(ids)
+    attributes = set_attribute(attributes, 'id', header_id)
+    attributes = set_attribute(attributes, 'class', ' '.join(classes))
+    return '<{0}{1}>{2}</{0}>'.format(name, attributes, ''.join(kept))
+
+
+def get_attribute(attributes, name):
+    """
+    :return string: value of the attribute, '' if it has no value, or None if it is not there
+    """
+    for match in attribute_re.finditer(attributes or ''):
+        if match.group(1).lower() == name:
+            return next((value for value in match.groups()[1:] if value is not None), '')
+    return None
+
+
+def set_attribute(attributes, name, value):
+    """
+    :return string: the attributes with the value of the named one replaced, or with it added at the end
+    """
+    new_attribute = '{0}="{1}"'.format(name, value.replace('"', '&quot;'))
+    for match in attribute_re.finditer(attributes):
+        if match.group(1).lower() == name:
+            return attributes[:match.start()] + new_attribute + attributes[match.end():]
+    return attributes + ' ' + new_attribute
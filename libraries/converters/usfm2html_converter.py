@@ -1,18 +1,32 @@
 from __future__ import print_function, unicode_literals
-import urlparse
+import io
+import multiprocessing
 import os
-import tempfile
-import codecs
+import zipfile
 from bs4 import BeautifulSoup
+from bs4.element import NavigableString
 from shutil import copyfile
 from libraries.app.app import App
-from libraries.general_tools.file_utils import write_file, remove_tree, get_files
-from converter import Converter
-from usfm_tools.transform import UsfmTransform
+from libraries.general_tools.file_utils import write_file, get_files
+from converter import Converter, get_template
+from libraries.usfm_tools.singlehtmlRenderer import SingleHTMLRenderer
 
 
 class Usfm2HtmlConverter(Converter):
 
+    CONTENT_PLACEHOLDER = 'USFM2HTML_CONTENT_PLACEHOLDER'
+    NOT_CONVERTED = '<div class="error">ERROR! NOT CONVERTED!</div>'
+
+    def __init__(self, source, resource, cdn_file=None, options=None, convert_callback=None, identifier=None,
+                 compression=zipfile.ZIP_STORED, part_size=None, processes=1):
+        """
+        :param int processes: Number of worker processes to convert books in, None for one per CPU
+        """
+        self.processes = processes
+        super(Usfm2HtmlConverter, self).__init__(source, resource, cdn_file=cdn_file, options=options,
+                                                 convert_callback=convert_callback, identifier=identifier,
+                                                 compression=compression, part_size=part_size)
+
     def convert(self):
         App.logger.debug('Processing the Bible USFM files')
 
@@ -20,43 +34,17 @@ class Usfm2HtmlConverter(Converter):
         files = get_files(directory=self.files_dir, exclude=self.EXCLUDED_FILES)
         convert_only_list = self.check_for_exclusive_convert()
 
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
-            template_html = template_file.read()
+        template_start, template_end = get_template(Usfm2HtmlConverter.get_template_parts, key=self.resource.upper())
 
+        books = []
         for filename in files:
             if filename.endswith('.usfm'):
                 base_name = os.path.basename(filename)
                 if convert_only_list and (base_name not in convert_only_list):  # see if this is a file we are to convert
                     continue
 
-                msg = 'Converting Bible USFM file: {0}'.format(base_name)
-                self.log.info(msg)
-                App.logger.debug(msg)
-
-                # Covert the USFM file
-                scratch_dir = tempfile.mkdtemp(prefix='scratch_')
-                copyfile(filename, os.path.join(scratch_dir, os.path.basename(filename)))
                 filebase = os.path.splitext(os.path.basename(filename))[0]
-                UsfmTransform.buildSingleHtml(scratch_dir, scratch_dir, filebase)
-                html_filename = filebase+".html"
-                with codecs.open(os.path.join(scratch_dir, html_filename), 'r', 'utf-8-sig') as html_file:
-                    converted_html = html_file.read()
-                template_soup = BeautifulSoup(template_html, 'html.parser')
-                template_soup.head.title.string = self.resource.upper()
-                converted_soup = BeautifulSoup(converted_html, 'html.parser')
-                content_div = template_soup.find('div', id='content')
-                content_div.clear()
-                if converted_soup and converted_soup.body:
-                    content_div.append(converted_soup.body)
-                    content_div.body.unwrap()
-                else:
-                    content_div.append('<div class="error">ERROR! NOT CONVERTED!</div>')
-                output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, unicode(template_soup))
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename),
-                                                             os.path.basename(html_filename)))
-                remove_tree(scratch_dir)
+                books.append((filename, os.path.join(self.output_dir, filebase+".html"), template_start, template_end))
             else:
                 # Directly copy over files that are not USFM files
                 try:
@@ -65,5 +53,104 @@ class Usfm2HtmlConverter(Converter):
                         copyfile(filename, output_file)
                 except:
                     pass
+
+        # the output of books that haven't changed since the previous build is copied from there
+        reused = self.reuse_previous_outputs([book[:2] for book in books])
+        changed_books = [book for book in books if book[0] not in reused]
+        results = None
+        if self.processes != 1 and len(changed_books) > 1:
+            results = self.convert_books_in_pool(changed_books)
+        if results is None:
+            results = [convert_book(book) for book in changed_books]
+
+        results = iter(results)
+        for book in books:
+            if book[0] in reused:
+                self.add_book_logs(get_book_logs(book[0], book[1]))
+            else:
+                self.add_book_logs(next(results))
         self.log.info('Finished processing Bible USFM files.')
         return True
+
+    def convert_books_in_pool(self, books):
+        """
+        Converts the books in a pool of worker processes
+        :param list books: arguments for convert_book() for each book
+        :return list: the logs of each book, or None if a pool could not be started
+        """
+        try:
+            pool = multiprocessing.Pool(self.processes)
+        except OSError as e:  # e.g. there is no /dev/shm on AWS Lambda
+            App.logger.warning("Could not start worker processes, converting books one at a time: {0}".format(e))
+            return None
+
+        App.logger.debug("converting {0} books in {1} processes".format(len(books),
+                                                                       self.processes or multiprocessing.cpu_count()))
+        try:
+            return pool.map(convert_book, books)
+        finally:
+            pool.close()
+            pool.join()
+
+    def add_book_logs(self, logs):
+        for log_type, msg in logs:
+            self.log.log(log_type, msg)
+
+    @staticmethod
+    def get_template_parts(template_html, title):
+        """
+        Fills in the parts of the template that are the same for every book, so the template is only parsed once
+        :param string template_html:
+        :param string title:
+        :return tuple: the HTML that goes before and after the content of each book
+        """
+        template_soup = BeautifulSoup(template_html, 'html.parser')
+        template_soup.head.title.string = title
+        content_div = template_soup.find('div', id='content')
+        content_div.clear()
+        content_div.append(Usfm2HtmlConverter.CONTENT_PLACEHOLDER)
+        template_start, template_end = unicode(template_soup).split(Usfm2HtmlConverter.CONTENT_PLACEHOLDER)
+        return template_start, template_end
+
+
+def convert_book(args):
+    """
+    Converts one USFM book to an HTML page.  This is a module function so that it can be run in a worker process.
+    :param tuple args: file name of the book, file name of the page, and the template HTML before and after the content
+    :return list: (log type, message) of each message to log for the book
+    """
+    filename, output_file, template_start, template_end = args
+    App.logger.debug('Converting Bible USFM file: {0}'.format(os.path.basename(filename)))
+
+    # Covert the USFM file
+    converted_soup = BeautifulSoup(render_usfm_file(filename), 'html.parser')
+    if converted_soup and converted_soup.body:
+        content = converted_soup.body.decode_contents()
+    else:
+        content = NavigableString(Usfm2HtmlConverter.NOT_CONVERTED).output_ready()
+    write_file(output_file, template_start + content + template_end)
+    return get_book_logs(filename, output_file)
+
+
+def get_book_logs(filename, output_file):
+    """
+    :return list: (log type, message) of each message logged for a converted book
+    """
+    return [('info', 'Converting Bible USFM file: {0}'.format(os.path.basename(filename))),
+            ('info', 'Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(output_file)))]
+
+
+def render_usfm_file(file_path):
+    """
+    Renders a USFM file to HTML the same way as UsfmTransform.buildSingleHtml(), but without a scratch directory
+    :param string file_path:
+    :return string: the HTML, which has no body if the file is not a USFM book
+    """
+    try:
+        with io.open(file_path, encoding='utf-8-sig') as usfm_file:  # newlines are translated as with 'U'
+            usfm = usfm_file.read().lstrip()
+    except (IOError, UnicodeDecodeError):
+        usfm = ''
+    html = io.StringIO()
+    SingleHTMLRenderer(None, None, usfm=usfm).render(html)
+    return html.getvalue()
@@ -11,6 +11,7 @@ from libraries.general_tools.file_utils import write_file, remove_tree
 from libraries.door43_tools.templaters import init_template
 from datetime import datetime, timedelta
 from libraries.app.app import App
+from libraries.converters.converter import Converter
 
 
 class ProjectDeployer(object):
@@ -20,6 +21,7 @@ class ProjectDeployer(object):
     Read from the project's user dir in the cdn.door43.org bucket
     by applying the door43.org template to the raw html files
     """
+    TRANSFER_THREADS = 8  # files downloaded or uploaded at a time
 
     def __init__(self):
         self.temp_dir = tempfile.mkdtemp(suffix="", prefix="deployer_")
@@ -76,7 +78,7 @@ class ProjectDeployer(object):
             if App.cdn_s3_handler().key_exists(key_deployed_):
                 App.logger.debug("Exiting, Already merged parts: {0}".format(download_key))
                 return False
-            self.write_data_to_file(self.temp_dir, key_deployed_, 'final_deployed', ' ')  # flag that deploy has begun
+            self.write_data_to_file(None, key_deployed_, 'final_deployed', ' ')  # flag that deploy has begun
             App.logger.debug("Continuing with merge: {0}".format(download_key))
 
         elif 'part' in build_log:
@@ -126,6 +128,8 @@ class ProjectDeployer(object):
 
         # Copy all other files over that don't already exist in output_dir, like css files
         for filename in sorted(glob(os.path.join(source_dir, '*'))):
+            if os.path.basename(filename) == Converter.SOURCE_HASHES_FILE:
+                continue  # only for the next build, and it stays with the part it belongs to
             output_file = os.path.join(output_dir, os.path.basename(filename))
             if not os.path.exists(output_file) and not os.path.isdir(filename):
                 copyfile(filename, output_file)
@@ -141,15 +145,12 @@ class ProjectDeployer(object):
         file_utils.write_file(os.path.join(output_dir, 'build_log.json'), build_log)
         App.logger.debug("Final build_log.json:\n" + json.dumps(build_log)[:256])
 
-        # Upload all files to the door43.org bucket
-        for root, dirs, files in os.walk(output_dir):
-            for f in sorted(files):
-                path = os.path.join(root, f)
-                if os.path.isdir(path):
-                    continue
-                key = s3_commit_key + path.replace(output_dir, '').replace(os.path.sep, '/')
-                App.logger.debug("Uploading {0} to {1}".format(path, key))
-                App.door43_s3_handler().upload_file(path, key, cache_time=0)
+        # Upload all files to the door43.org bucket, except those that haven't changed since the last deploy.  Keys
+        # that aren't in output_dir are kept, since each part of a multipart project deploys to the same place.
+        App.logger.debug("Uploading {0} to {1}".format(output_dir, s3_commit_key))
+        uploaded, deleted = App.door43_s3_handler().sync_dir(output_dir, s3_commit_key,
+                                                            parallel=self.TRANSFER_THREADS, cache_time=0)
+        App.logger.debug("Uploaded {0} changed files".format(len(uploaded)))
 
         if not do_part_template_only:
             # Now we place json files and redirect index.html for the whole repo to this index.html file
@@ -159,12 +160,12 @@ class ProjectDeployer(object):
                                              to_key='{0}/manifest.json'.format(s3_repo_key))
                 App.door43_s3_handler().redirect(s3_repo_key, '/' + s3_commit_key)
                 App.door43_s3_handler().redirect(s3_repo_key + '/index.html', '/' + s3_commit_key)
-                self.write_data_to_file(output_dir, s3_commit_key, 'deployed', ' ')  # flag that deploy has finished
+                self.write_data_to_file(None, s3_commit_key, 'deployed', ' ')  # flag that deploy has finished
             except:
                 pass
 
         else:  # if processing part of multi-part merge
-            self.write_data_to_file(output_dir, download_key, 'deployed', ' ')  # flag that deploy has finished
+            self.write_data_to_file(None, download_key, 'deployed', ' ')  # flag that deploy has finished
             if App.cdn_s3_handler().key_exists(s3_commit_key + '/final_build_log.json'):
                 App.logger.debug("final build detected")
                 App.logger.debug("conversions all finished, trigger final merge")
@@ -180,7 +181,8 @@ class ProjectDeployer(object):
     def multipart_master_merge(self, s3_commit_key, resource_type, download_key, output_dir, source_dir, start,
                                template_file):
         prefix = download_key + '/'
-        App.door43_s3_handler().download_dir(prefix, source_dir)  # get previous templated files
+        # get previous templated files
+        App.door43_s3_handler().download_dir(prefix, source_dir, parallel=self.TRANSFER_THREADS)
         source_dir = os.path.join(source_dir, download_key)
         files = sorted(glob(os.path.join(source_dir, '*.*')))
         for f in files:
@@ -210,21 +212,24 @@ class ProjectDeployer(object):
 
     def get_undeployed_parts(self, prefix):
         unfinished = []
-        for o in App.cdn_s3_handler().get_objects(prefix=prefix, suffix='/build_log.json'):
-            parts = o.key.split(prefix)
+        keys = App.cdn_s3_handler().list_keys_under(prefix)  # the build logs and deployed flags of all the parts
+        for key in sorted(keys):
+            if not key.endswith('/build_log.json'):
+                continue
+            parts = key.split(prefix)
             if len(parts) == 2:
                 parts = parts[1].split('/')
                 if len(parts) > 1:
                     part_num = parts[0]
                     deployed_key = prefix + part_num + '/deployed'
-                    if not App.cdn_s3_handler().key_exists(deployed_key):
+                    if deployed_key not in keys:
                         App.logger.debug("Part {0} unfinished".format(part_num))
                         unfinished.append(part_num)
         return unfinished
 
     def template_converted_files(self, build_log, download_key, output_dir, repo_name, resource_type, s3_commit_key,
                                  source_dir, start, template_file):
-        App.cdn_s3_handler().download_dir(download_key + '/', source_dir)
+        App.cdn_s3_handler().download_dir(download_key + '/', source_dir, parallel=self.TRANSFER_THREADS)
         source_dir = os.path.join(source_dir, download_key.replace('/', os.path.sep))
         elapsed_seconds = int(time.time() - start)
         App.logger.debug("deploy download completed in " + str(elapsed_seconds) + " seconds")
@@ -281,11 +286,22 @@ class ProjectDeployer(object):
         return source_dir, success
 
     def write_data_to_file(self, output_dir, s3_commit_key, fname, data):
-        out_file = os.path.join(output_dir, fname)
-        write_file(out_file, data)
+        """
+        Uploads the data to the cdn bucket straight from memory, and also writes it to output_dir if one is given so
+            that it is deployed with the rest of the files there
+        :param string output_dir:
+        :param string s3_commit_key:
+        :param string fname:
+        :param string|dict data: a string is uploaded as it is, anything else as JSON
+        """
+        if output_dir:
+            write_file(os.path.join(output_dir, fname), data)
         key = s3_commit_key + '/' + fname
         App.logger.debug("Writing {0} to {1}': ".format(fname, key))
-        App.cdn_s3_handler().upload_file(out_file, key, cache_time=0)
+        if isinstance(data, basestring):
+            App.cdn_s3_handler().put_bytes(key, data, cache_time=0)
+        else:
+            App.cdn_s3_handler().put_json(key, data, cache_time=0)
 
     def run_templater(self, templater):  # for test purposes
         templater.run()
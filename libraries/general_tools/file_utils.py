@@ -1,10 +1,12 @@
 from __future__ import unicode_literals, print_function
 import codecs
+import hashlib
 import json
 import os
 import zipfile
 import sys
 import shutil
+import time
 import yaml
 from mimetypes import MimeTypes
 from libraries.general_tools.data_utils import json_serial
@@ -50,6 +52,29 @@ def add_contents_to_zip(zip_file, path, include_root=False):
                 zf.write(file_path, file_path[path_start_index:])
 
 
+def add_contents_to_zip_stream(stream, path, compress_type=zipfile.ZIP_STORED):
+    """
+    Zip the contents of <path> into a new zip file written to <stream>.  Each file is added with a single write, so
+    the stream doesn't need to be seekable and can e.g. be uploaded as it is written.
+
+    :param stream: file-like object with write() and tell()
+    :param str|unicode path: Full path of the directory to zip up
+    :param int compress_type: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED
+    """
+    path = path.rstrip(os.path.sep)
+    path_start_index = len(path)+1
+    with zipfile.ZipFile(stream, 'w', compress_type, allowZip64=True) as zf:
+        for root, dirs, files in os.walk(path):
+            for f in files:
+                file_path = os.path.join(root, f)
+                st = os.stat(file_path)
+                zinfo = zipfile.ZipInfo(file_path[path_start_index:], time.localtime(st.st_mtime)[0:6])
+                zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+                zinfo.compress_type = compress_type
+                with open(file_path, 'rb') as in_file:
+                    zf.writestr(zinfo, in_file.read())
+
+
 def add_file_to_zip(zip_file, file_name, arc_name=None, compress_type=None):
     """
     Zip <file_name> into <zip_file> as <arc_name>.
@@ -147,6 +172,17 @@ def get_mime_type(path):
     return mime_type
 
 
+def hash_file(file_path, block_size=65536):
+    """
+    :return string: sha256 of the file, read a block at a time
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
 def get_files(directory, relative_paths=False, include_directories=False, topdown=False, extensions=None, exclude=None):
     file_list = []
     for root, dirs, files in os.walk(directory, topdown=topdown):
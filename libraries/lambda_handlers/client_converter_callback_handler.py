@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, print_function
+from libraries.app.app import App
 from libraries.lambda_handlers.handler import Handler
 from libraries.client.client_converter_callback import ClientConverterCallback
 
@@ -18,5 +19,10 @@ class ClientConverterCallbackHandler(Handler):
         warnings = self.retrieve(self.data, 'warnings', 'Payload', required=False, default=[])
         errors = self.retrieve(self.data, 'errors', 'Payload', required=False, default=[])
 
-        # Execute
-        return ClientConverterCallback(identifier, success, info, warnings, errors).process_callback()
+        # Execute, reading back what is written to the cdn bucket from memory
+        App.cdn_s3_handler().start_cache()
+        try:
+            return ClientConverterCallback(identifier, success, info, warnings, errors).process_callback()
+        finally:
+            cache = App.cdn_s3_handler().stop_cache()
+            App.logger.info('CDN reads: {0} cached, {1} from S3'.format(cache.hits, cache.misses))
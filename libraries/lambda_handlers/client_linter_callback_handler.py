@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, print_function
+from libraries.app.app import App
 from libraries.client.client_linter_callback import ClientLinterCallback
 from libraries.lambda_handlers.handler import Handler
 
@@ -19,5 +20,10 @@ class ClientLinterCallbackHandler(Handler):
         errors = self.retrieve(self.data, 'errors', 'Payload', required=False, default=[])
         s3_results_key = self.retrieve(self.data, 's3_results_key', 'Payload')
 
-        # Execute
-        return ClientLinterCallback(identifier, success, info, warnings, errors, s3_results_key).process_callback()
+        # Execute, reading back what is written to the cdn bucket from memory
+        App.cdn_s3_handler().start_cache()
+        try:
+            return ClientLinterCallback(identifier, success, info, warnings, errors, s3_results_key).process_callback()
+        finally:
+            cache = App.cdn_s3_handler().stop_cache()
+            App.logger.info('CDN reads: {0} cached, {1} from S3'.format(cache.hits, cache.misses))
@@ -30,10 +30,11 @@ class ConvertHandler(Handler):
         cdn_file = self.retrieve(self.data, 'cdn_file', 'Payload')
         options = self.retrieve(self.data, 'options', 'Payload', required=False, default={})
         convert_callback = self.retrieve(self.data, 'convert_callback', 'Payload', required=False)
+        previous_build_key = self.retrieve(self.data, 'previous_build_key', 'Payload', required=False, default=None)
 
         # Execute
         converter = self.converter_class(source=source, resource=resource, cdn_file=cdn_file, options=options,
                                          convert_callback=convert_callback, identifier=identifier)
-        results = converter.run()
+        results = converter.run(previous_build_key=previous_build_key)
         converter.close()  # do cleanup after run
         return results
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals, print_function
+from libraries.app.app import App
 from libraries.lambda_handlers.handler import Handler
+from libraries.linters.lint_cache import S3LintCache
 
 
 class LintHandler(Handler):
@@ -28,11 +30,14 @@ class LintHandler(Handler):
         lint_callback = self.retrieve(self.data, 'lint_callback', 'Payload', required=False, default=None)
         cdn_file = self.retrieve(self.data, 'cdn_file', 'Payload', required=False, default=None)
         s3_results_key = self.retrieve(self.data, 's3_results_key', 'payload', required=False, default=None)
+        # results are only cached when the payload gives a prefix for them, since nothing expires the cached results
+        lint_cache_prefix = self.retrieve(self.data, 'lint_cache_prefix', 'Payload', required=False, default=None)
+        cache = S3LintCache(App.cdn_s3_handler(), lint_cache_prefix) if lint_cache_prefix else None
 
         # Execute
         linter = self.linter_class(source_url=source_url, commit_data=commit_data, resource_id=resource_id,
                                    single_file=single_file, lint_callback=lint_callback, identifier=identifier,
-                                   cdn_file=cdn_file, s3_results_key=s3_results_key)
+                                   cdn_file=cdn_file, s3_results_key=s3_results_key, cache=cache)
         results = linter.run()
         linter.close()  # do cleanup after run
         return results
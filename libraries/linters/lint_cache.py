@@ -0,0 +1,91 @@
+from __future__ import print_function, unicode_literals
+import hashlib
+import json
+import os
+from abc import ABCMeta, abstractmethod
+from libraries.general_tools.file_utils import load_json_object, write_file
+
+
+class LintCache(object):
+    """
+    Lint results of files that have been checked before.  The key is a hash of everything the results depend on, so an
+        unchanged file can skip the checks.
+    """
+    __metaclass__ = ABCMeta
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        :param list parts: strings the cached results depend on, e.g. a hash of the file, language code and version
+        :return string:
+        """
+        sha = hashlib.sha256()
+        for part in parts:
+            sha.update('{0}'.format(part).encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def get(self, key):
+        """
+        :param string key:
+        :return dict: the cached results, or None if there are none
+        """
+        try:
+            results = self.load(key)
+        except Exception:  # a cache that can't be read is the same as an empty one
+            results = None
+        return results or None
+
+    def put(self, key, results):
+        """
+        :param string key:
+        :param dict results: must be serializable to JSON
+        """
+        try:
+            self.save(key, results)
+        except Exception:  # results just won't be cached
+            pass
+
+    @abstractmethod
+    def load(self, key):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def save(self, key, results):
+        raise NotImplementedError()
+
+
+class LocalLintCache(LintCache):
+    """
+    Keeps the lint results in a local directory, one JSON file per key
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def load(self, key):
+        return load_json_object(os.path.join(self.directory, key + '.json'))
+
+    def save(self, key, results):
+        write_file(os.path.join(self.directory, key + '.json'), results)
+
+
+class S3LintCache(LintCache):
+    """
+    Keeps the lint results in S3, one JSON object per key under the prefix
+    """
+    PREFIX = 'lint_cache/'
+
+    def __init__(self, s3_handler, prefix=PREFIX):
+        """
+        :param S3Handler s3_handler: handler for the bucket to keep the results in
+        :param string prefix:
+        """
+        self.s3_handler = s3_handler
+        self.prefix = prefix
+
+    def load(self, key):
+        return self.s3_handler.get_json(self.prefix + key + '.json')
+
+    def save(self, key, results):
+        self.s3_handler.put_contents(self.prefix + key + '.json', json.dumps(results), catch_exception=False)
@@ -5,7 +5,16 @@ from libraries.app.app import App
 class LintLogger(object):
     def __init__(self):
         self.warnings = []
+        self.infos = []
 
     def warning(self, msg):
         self.warnings.append(msg)
         App.logger.debug("LINT ISSUE: {}".format(msg))
+
+    def info(self, msg):
+        """
+        Notes about the linting itself, e.g. how many books were in the lint cache.  They are sent back as info, which
+            ends up in the log of the lint_log.json, not as warnings.
+        """
+        self.infos.append(msg)
+        App.logger.info("LINT INFO: {}".format(msg))
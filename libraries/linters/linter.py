@@ -105,6 +105,7 @@ class Linter(object):
         results = {
             'identifier': self.identifier,
             'success': success,
+            'info': self.log.infos,
             'warnings': warnings,
             's3_results_key': self.s3_results_key
         }
@@ -1,6 +1,10 @@
 from __future__ import print_function, unicode_literals
+import io
 import os
+import multiprocessing
 from libraries.linters.linter import Linter
+from libraries.general_tools.file_utils import hash_file
+from libraries.linters.lint_cache import LintCache
 from libraries.door43_tools.page_metrics import PageMetrics
 from libraries.usfm_tools import verifyUSFM
 from libraries.app.app import App
@@ -8,8 +12,17 @@ from libraries.app.app import App
 
 class UsfmLinter(Linter):
 
-    def __init__(self, single_file=None, *args, **kwargs):
+    def __init__(self, single_file=None, processes=1, streaming=False, cache=None, *args, **kwargs):
+        """
+        :param string single_file: If set, only this file is linted
+        :param int processes: Number of worker processes to verify books in, None for one per CPU
+        :param bool streaming: If set, books are read and verified a chapter at a time to use less memory
+        :param LintCache cache: If set, books that have not changed since their results were cached are not checked
+        """
         self.single_file = single_file
+        self.processes = processes
+        self.streaming = streaming
+        self.cache = cache
         self.found_books = []
         super(UsfmLinter, self).__init__(*args, **kwargs)
 
@@ -27,37 +40,116 @@ class UsfmLinter(Linter):
         if not valid_lang_code:
             self.log.warning("Invalid language code: " + lang_code)
 
+        books = []
         for root, dirs, files in os.walk(self.source_dir):
-            for f in files:
+            dirs.sort()  # so books are always checked in the same order
+            for f in sorted(files):
                 if os.path.splitext(f)[1].lower() != '.usfm':  # only usfm files
                     continue
 
                 if self.single_file and (f != self.single_file):
                     continue
 
-                App.logger.debug("linting: " + f)
                 file_path = os.path.join(root, f)
                 sub_path = '.' + file_path[len(self.source_dir):]
-                self.parse_file(file_path, sub_path, f)
+                books.append((file_path, sub_path, f))
+
+        cache_keys = {}
+        cached = {}
+        if self.cache:
+            for file_path, sub_path, f in books:
+                cache_keys[file_path] = self.get_cache_key(file_path, f, lang_code)
+                results = self.cache.get(cache_keys[file_path]) if cache_keys[file_path] else None
+                if results:
+                    cached[file_path] = results
+            self.log.info("USFM lint cache: {0} hits, {1} misses".format(len(cached), len(books) - len(cached)))
+
+        unchecked = len(books) - len(cached)
+        if self.processes == 1 or unchecked < 2 or not self.parse_files_in_pool(books, lang_code, cache_keys, cached):
+            for file_path, sub_path, f in books:
+                if file_path in cached:
+                    self.add_cached_results(sub_path, f, cached[file_path])
+                    continue
+                App.logger.debug("linting: " + f)
+                self.parse_file(file_path, sub_path, f, cache_keys.get(file_path))
 
         if not len(self.found_books):
             self.log.warning("No translations found")
 
         return True
 
-    def parse_file(self, file_path, sub_path, file_name):
+    def parse_files_in_pool(self, books, lang_code, cache_keys=None, cached=None):
+        """
+        Verifies the books in a pool of worker processes and then adds their results in book order
+        :param list books: (file_path, sub_path, file_name) of each book
+        :param string lang_code:
+        :param dict cache_keys: cache key of each file path, for storing the results
+        :param dict cached: results already in the cache, by file path.  These books are not checked again
+        :return bool: False if a pool could not be started
+        """
+        cache_keys = cache_keys or {}
+        cached = cached or {}
+        unchecked = [(file_path, sub_path, f) for file_path, sub_path, f in books if file_path not in cached]
+        try:
+            pool = multiprocessing.Pool(self.processes)
+        except OSError as e:  # e.g. there is no /dev/shm on AWS Lambda
+            App.logger.warning("Could not start worker processes, linting books one at a time: {0}".format(e))
+            return False
 
+        App.logger.debug("linting {0} books in {1} processes".format(len(unchecked),
+                                                                    self.processes or multiprocessing.cpu_count()))
+        try:
+            results = pool.map(verify_book_file, [(file_path, f, lang_code, self.streaming)
+                                                  for file_path, sub_path, f in unchecked])
+        finally:
+            pool.close()
+            pool.join()
+
+        results = dict(zip([file_path for file_path, sub_path, f in unchecked], results))
+        for file_path, sub_path, f in books:
+            if file_path in cached:
+                self.add_cached_results(sub_path, f, cached[file_path])
+                continue
+            errors, found_book_code, failure = results[file_path]
+            if failure:
+                self.log.warning(failure)
+            else:
+                book_code, book_full_name = self.get_book_ids(f)
+                self.add_book_results(sub_path, book_code, errors, found_book_code)
+                self.cache_results(cache_keys.get(file_path), errors, found_book_code)
+        return True
+
+    def parse_file(self, file_path, sub_path, file_name, cache_key=None):
+        """
+        :param string cache_key: If set, the results are saved in the cache under this key
+        """
         book_code, book_full_name = self.get_book_ids(file_name)
 
         try:
-            f = open(file_path, 'U')  # U handles line endings
-            book_text = f.read().decode('utf-8-sig').lstrip()
+            if self.streaming:
+                with self.open_book(file_path) as book_file:
+                    results = self.parse_usfm_chapters(sub_path, file_name, verifyUSFM.split_chapters(book_file),
+                                                       book_full_name, book_code)
+            else:
+                book_text = self.read_book(file_path)
 
-            self.parse_usfm_text(sub_path, file_name, book_text, book_full_name, book_code)
+                results = self.parse_usfm_text(sub_path, file_name, book_text, book_full_name, book_code)
+
+            if results:
+                self.cache_results(cache_key, *results)
 
         except Exception as e:
             self.log.warning("Failed to open book '{0}', exception: {1}".format(file_name, str(e)))
 
+    @staticmethod
+    def read_book(file_path):
+        with open(file_path, 'U') as f:  # U handles line endings
+            return f.read().decode('utf-8-sig').lstrip()
+
+    @staticmethod
+    def open_book(file_path):
+        return io.open(file_path, encoding='utf-8-sig')  # newlines are translated as with 'U'
+
     @staticmethod
     def get_book_ids(file_name):
         file_name_parts = file_name.split('.')
@@ -72,19 +164,80 @@ class UsfmLinter(Linter):
         try:
             lang_code = self.rc.resource.language.identifier
             errors, found_book_code = verifyUSFM.verify_contents_quiet(book_text, book_full_name, book_code, lang_code)
+            self.add_book_results(sub_path, book_code, errors, found_book_code)
+            return errors, found_book_code
 
-            if found_book_code:
-                book_code = found_book_code
-
-            if book_code:
-                if book_code in self.found_books:
-                    self.log.warning("File '{0}' has same code '{1}' as previous file".format(sub_path, book_code))
-                self.found_books.append(book_code)
+        except Exception as e:
+            # for debugging
+            self.log.warning("Failed to verify book '{0}', exception: {1}".format(file_name, str(e)))
 
-            if len(errors):
-                for error in errors:
-                    self.log.warning(error)
+    def parse_usfm_chapters(self, sub_path, file_name, chapters, book_full_name, book_code):
+        try:
+            lang_code = self.rc.resource.language.identifier
+            errors, found_book_code = verifyUSFM.verify_chapters_quiet(chapters, book_full_name, book_code, lang_code)
+            self.add_book_results(sub_path, book_code, errors, found_book_code)
+            return errors, found_book_code
 
         except Exception as e:
-            # for debugging
             self.log.warning("Failed to verify book '{0}', exception: {1}".format(file_name, str(e)))
+
+    def add_book_results(self, sub_path, book_code, errors, found_book_code):
+        if found_book_code:
+            book_code = found_book_code
+
+        if book_code:
+            if book_code in self.found_books:
+                self.log.warning("File '{0}' has same code '{1}' as previous file".format(sub_path, book_code))
+            self.found_books.append(book_code)
+
+        if len(errors):
+            for error in errors:
+                self.log.warning(error)
+
+    def get_cache_key(self, file_path, file_name, lang_code):
+        """
+        :return string: key for the lint results of the book, or None if the file could not be read
+        """
+        try:
+            file_hash = hash_file(file_path)
+        except Exception:
+            return None
+        return LintCache.make_key('usfm', file_hash, file_name, lang_code, verifyUSFM.VERIFIER_VERSION,
+                                  self.streaming)
+
+    def add_cached_results(self, sub_path, file_name, results):
+        book_code, book_full_name = self.get_book_ids(file_name)
+        self.add_book_results(sub_path, book_code, results['errors'], results['book_code'])
+
+    def cache_results(self, cache_key, errors, found_book_code):
+        if self.cache and cache_key:
+            self.cache.put(cache_key, {'errors': errors, 'book_code': found_book_code})
+
+
+def verify_book_file(args):
+    """
+    Reads and verifies one book.  This is a module function so that it can be run in a worker process.
+    :param tuple args: file_path, file_name, lang_code, streaming
+    :return tuple: errors, book code found in the book, and the warning to log instead if the book failed
+    """
+    file_path, file_name, lang_code, streaming = args
+    book_code, book_full_name = UsfmLinter.get_book_ids(file_name)
+    try:
+        if streaming:
+            book_file = UsfmLinter.open_book(file_path)
+        else:
+            book_text = UsfmLinter.read_book(file_path)
+    except Exception as e:
+        return None, None, "Failed to open book '{0}', exception: {1}".format(file_name, str(e))
+
+    try:
+        if streaming:
+            with book_file:
+                errors, found_book_code = verifyUSFM.verify_chapters_quiet(verifyUSFM.split_chapters(book_file),
+                                                                           book_full_name, book_code, lang_code)
+        else:
+            errors, found_book_code = verifyUSFM.verify_contents_quiet(book_text, book_full_name, book_code,
+                                                                       lang_code)
+    except Exception as e:
+        return None, None, "Failed to verify book '{0}', exception: {1}".format(file_name, str(e))
+    return errors, found_book_code, None
@@ -0,0 +1,90 @@
+from __future__ import unicode_literals, print_function
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, and_
+from libraries.models.tx_model import TxModel
+from libraries.app.app import App
+
+
+class TxCompletion(App.Base, TxModel):
+    """
+    Tracks which parts of a build have been converted and linted, so that the callback that finishes a part, and the
+        one that finishes the whole build, know it straight away.  Every change is a conditional update, so when
+        callbacks arrive at the same time exactly one of them sees each part, and the build, finish.
+    """
+    __tablename__ = App.completion_table_name
+    build_key = Column(String(255), primary_key=True)  # u/<user>/<repo>/<commit>
+    part = Column(String(32), primary_key=True)  # part number, or 0 for a build that isn't split into parts
+    part_count = Column(Integer, nullable=False)
+    converted = Column(Boolean, default=False, nullable=False)
+    linted = Column(Boolean, default=False, nullable=False)
+    merged = Column(Boolean, default=False, nullable=False)
+    parts_merged = Column(Integer, default=0, nullable=False)  # only counted in the row of the first part
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    STAGES = ['converted', 'linted']
+
+    def __init__(self, **kwargs):
+        # Init attributes
+        self.converted = False
+        self.linted = False
+        self.merged = False
+        self.parts_merged = 0
+        super(TxCompletion, self).__init__(**kwargs)
+
+    @classmethod
+    def start(cls, build_key, part_count):
+        """
+        Starts tracking a build, replacing what was tracked for an earlier build of the same commit
+        :param string build_key:
+        :param int part_count:
+        """
+        db = App.db()
+        db.query(cls).filter_by(build_key=build_key).delete()
+        for i in range(0, part_count):
+            db.add(cls(build_key=build_key, part=str(i), part_count=part_count))
+        db.commit()
+        db.close()
+
+    @classmethod
+    def finish_stage(cls, build_key, part, stage):
+        """
+        Records that a stage of a part has finished
+        :param string build_key:
+        :param string part:
+        :param string stage: 'converted' or 'linted'
+        :return bool: True if this finished the part, False if not, or None if the build isn't tracked
+        """
+        if stage not in cls.STAGES:
+            raise ValueError('Unknown stage: {0}'.format(stage))
+        db = App.db()
+        table = cls.__table__
+        this_part = and_(table.c.build_key == build_key, table.c.part == part)
+        try:
+            tracked = db.execute(table.update().where(this_part).values({stage: True})).rowcount
+            if not tracked:
+                return None
+            finished = db.execute(table.update().where(and_(this_part, table.c.merged == False,
+                                                            *[table.c[s] == True for s in cls.STAGES]))
+                                  .values(merged=True)).rowcount
+            db.commit()
+        finally:
+            db.close()
+        return finished == 1
+
+    @classmethod
+    def count_merged_part(cls, build_key):
+        """
+        Counts a part whose build log has been merged.  Called once for each part, after its merged build log is saved.
+        :param string build_key:
+        :return bool: True if this was the last part of the build
+        """
+        db = App.db()
+        table = cls.__table__
+        first_part = and_(table.c.build_key == build_key, table.c.part == '0')
+        try:
+            db.execute(table.update().where(first_part).values(parts_merged=table.c.parts_merged + 1))
+            row = db.execute(table.select().where(first_part)).first()
+            db.commit()
+        finally:
+            db.close()
+        return row is not None and row.parts_merged == row.part_count
@@ -0,0 +1,121 @@
+from __future__ import unicode_literals, print_function
+from datetime import datetime, date
+from sqlalchemy import Column, String, Integer, Boolean, UniqueConstraint, func
+from sqlalchemy.exc import IntegrityError
+from libraries.general_tools.data_utils import json_serial
+from libraries.models.tx_model import TxModel
+from libraries.app.app import App
+
+
+class TxProjectCommit(App.Base, TxModel):
+    """
+    The commits listed in the project.json of a project, one row per commit.  Saving a commit only touches its own
+        row, so builds of a project that finish at the same time don't lose each other's updates.
+    """
+    __tablename__ = App.project_commit_table_name
+    __table_args__ = (UniqueConstraint('project_key', 'commit_id'),
+                      {'sqlite_autoincrement': True})  # ids are never reused, so the highest id marks a change
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)  # order of the commits in project.json
+    project_key = Column(String(255), nullable=False, index=True)  # u/<user>/<repo>
+    commit_id = Column(String(255), nullable=False)
+    created_at = Column(String(64), nullable=True)  # the dates are kept as they appear in project.json
+    status = Column(String(255), nullable=True)
+    success = Column(Boolean, nullable=True)
+    started_at = Column(String(64), nullable=True)
+    ended_at = Column(String(64), nullable=True)
+
+    FIELDS = ['created_at', 'status', 'success', 'started_at', 'ended_at']
+
+    @classmethod
+    def from_commit(cls, project_key, commit):
+        """
+        :param string project_key:
+        :param dict commit: a commit as it appears in project.json
+        :return TxProjectCommit:
+        """
+        values = {}
+        for field in cls.FIELDS:
+            value = commit.get(field)
+            if isinstance(value, (datetime, date)):
+                value = json_serial(value)  # as put_json would write it
+            values[field] = value
+        return cls(project_key=project_key, commit_id=commit['id'], **values)
+
+    def to_commit(self):
+        """
+        :return dict: the commit as it appears in project.json
+        """
+        commit = {'id': self.commit_id}
+        for field in self.FIELDS:
+            commit[field] = getattr(self, field)
+        return commit
+
+    @classmethod
+    def is_tracked(cls, project_key):
+        """
+        :param string project_key:
+        :return bool: True if the commits of the project are kept here
+        """
+        tracked = cls.query(project_key=project_key).first() is not None
+        App.db().close()
+        return tracked
+
+    @classmethod
+    def start(cls, project_key, commits):
+        """
+        Starts keeping the commits of a project here, with the commits already listed in its project.json.  Does
+            nothing if another build has just started it.
+        :param string project_key:
+        :param list commits: commits as they appear in project.json, in order
+        """
+        db = App.db()
+        try:
+            for commit in commits:
+                db.add(cls.from_commit(project_key, commit))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+
+    @classmethod
+    def save(cls, project_key, commit):
+        """
+        Adds a commit to the end of the project's commits, replacing the commit if it is there already
+        :param string project_key:
+        :param dict commit: a commit as it appears in project.json
+        """
+        db = App.db()
+        try:
+            for attempt in range(2):
+                try:
+                    db.query(cls).filter_by(project_key=project_key, commit_id=commit['id']).delete()
+                    db.add(cls.from_commit(project_key, commit))
+                    db.commit()
+                    return
+                except IntegrityError:  # another build saved the same commit at the same time
+                    db.rollback()
+                    if attempt:
+                        raise
+        finally:
+            db.close()
+
+    @classmethod
+    def get_commits(cls, project_key):
+        """
+        :param string project_key:
+        :return list: the commits of the project as they appear in project.json, in order
+        """
+        commits = [row.to_commit() for row in cls.query(project_key=project_key).order_by(cls.id)]
+        App.db().close()
+        return commits
+
+    @classmethod
+    def get_revision(cls, project_key):
+        """
+        :param string project_key:
+        :return int: a number that changes every time a commit of the project is saved
+        """
+        revision = App.db().query(func.max(cls.id)).filter(cls.project_key == project_key).scalar()
+        App.db().close()
+        return revision
@@ -2,12 +2,27 @@
 #
 
 from __future__ import print_function, unicode_literals
+import re
 import sys
 from pyparsing import Word, OneOrMore, nums, Literal, White, Group, Suppress, NoMatch, Optional, \
-    CharsNotIn, MatchFirst
+    CharsNotIn, MatchFirst, ParseException
+
+# engines that parse_string() can use
+ENGINE_TOKENIZER = 'tokenizer'
+ENGINE_PYPARSING = 'pyparsing'
+default_engine = ENGINE_TOKENIZER
+
+# kinds of markers, filled in by the grammar helpers below so the tokenizer stays in sync with the grammar
+MARKER_TOKEN = 'token'    # \key followed by white space
+MARKER_END = 'end'        # \key*
+MARKER_VALUE = 'value'    # \key followed by white space and an optional phrase
+MARKER_PLUS = 'plus'      # \key followed by white space and an optional '+'
+MARKER_NUMBER = 'number'  # \key followed by white space, a number and white space
+marker_kinds = {}
 
 
 def usfmToken(key):
+    marker_kinds[key] = MARKER_TOKEN
     return Group(Suppress(backslash) + Literal(key) + Suppress(White()))
 
 
@@ -16,14 +31,17 @@ def usfmBackslashToken(key):
 
 
 def usfmEndToken(key):
+    marker_kinds[key + "*"] = MARKER_END
     return Group(Suppress(backslash) + Literal(key + "*"))
 
 
 def usfmTokenValue(key, value):
+    marker_kinds[key] = MARKER_PLUS if value is plus else MARKER_VALUE
     return Group(Suppress(backslash) + Literal(key) + Suppress(White()) + Optional(value))
 
 
 def usfmTokenNumber(key):
+    marker_kinds[key] = MARKER_NUMBER
     return Group(Suppress(backslash) + Literal(key) + Suppress(White()) + Word(nums + '-()') + Suppress(White()))
 
 
@@ -352,16 +370,98 @@ usfm    = OneOrMore(element)
 #         sys.exit()
 #     return [createToken(t) for t in tokens]
 
-def parse_string(unicodeString):
+def parse_string(unicodeString, engine=None):
     """
     version of parseString for use in libraries
     :param unicodeString:
+    :param engine: ENGINE_TOKENIZER or ENGINE_PYPARSING, if not given then default_engine is used
     :return:
     """
     cleaned = clean(unicodeString)
-    tokens = usfm.parseString(cleaned, parseAll=True)
+    if (engine or default_engine) == ENGINE_PYPARSING:
+        tokens = usfm.parseString(cleaned, parseAll=True)
+    else:
+        tokens = tokenize(cleaned)
     return [createToken(t) for t in tokens]
 
+# regular expressions used by tokenize(), these mirror the pyparsing elements of the grammar
+white_re = re.compile(r'[ \t\r\n]+')          # White() and the default white space skipped between elements
+phrase_re = re.compile(r'[^\n\\]+')            # phrase
+marker_re = re.compile(r'[^ \t\r\n\\]*')       # marker name following a backslash
+number_re = re.compile(r'[0-9()-]+')           # Word(nums + '-()')
+unknown_re = re.compile(r'[^ \n\t\\]+')        # CharsNotIn(' \n\t\\') of unknown
+
+def tokenize(cleaned):
+    """
+    single pass replacement for usfm.parseString() - produces the same token lists without trying every
+        grammar element at every position.
+    :param cleaned: string that has been through clean()
+    :return: list of token lists, such as ['v', '1'] or ['text', 'In the beginning'], to pass to createToken()
+    """
+    text = cleaned.expandtabs()  # pyparsing does this before parsing
+    length = len(text)
+    tokens = []
+    pos = skip_white(text, 0)
+    while pos < length:
+        if text[pos] != '\\':
+            match = phrase_re.match(text, pos)
+            tokens.append(['text', match.group()])
+            pos = match.end()
+        elif text.startswith('\\', pos + 1):
+            tokens.append(['\\\\'])
+            pos += 2
+        else:
+            token, pos = take_marker(text, pos + 1)
+            tokens.append(token)
+        pos = skip_white(text, pos)
+
+    if not tokens:
+        raise ParseException(text, pos, "Expected USFM")
+    return tokens
+
+def skip_white(text, pos):
+    match = white_re.match(text, pos)
+    return match.end() if match else pos
+
+def take_marker(text, start):
+    """
+    parse the marker that follows a backslash at start
+    :return: token list and position after token
+    """
+    name_end = marker_re.match(text, start).end()
+    name = text[start:name_end]
+    star = name.find('*')
+    if star >= 0:
+        key = name[:star + 1]
+        if marker_kinds.get(key) == MARKER_END:
+            return [key], start + len(key)
+    else:
+        kind = marker_kinds.get(name)
+        white = white_re.match(text, name_end) if kind else None
+        if white:
+            pos = white.end()
+            if kind == MARKER_TOKEN:
+                return [name], pos
+            elif kind == MARKER_VALUE:
+                value = phrase_re.match(text, pos)
+                if value:
+                    return [name, value.group()], value.end()
+                return [name], pos
+            elif kind == MARKER_PLUS:
+                if text.startswith('+', pos):
+                    return [name, '+'], pos + 1
+                return [name], pos
+            else:  # MARKER_NUMBER
+                number = number_re.match(text, pos)
+                white = white_re.match(text, number.end()) if number else None
+                if white:
+                    return [name, number.group()], white.end()
+
+    unknown = unknown_re.match(text, start)
+    if not unknown:
+        raise ParseException(text, start, "Expected marker")
+    return ['unknown', unknown.group()], unknown.end()
+
 def clean(unicodeString):
     # We need to clean the input a bit. For a start, until
     # we work out what to do, non breaking spaces will be ignored
@@ -383,165 +483,29 @@ def clean(unicodeString):
     return ret_value
 
 def createToken(t):
-    options = {
-        'id':   IDToken,
-        'ide':  IDEToken,
-        'h':    HToken,
-        'mt':   MTToken,
-        'mt1':  MTToken,
-        'mt2':  MT2Token,
-        'mt3':  MT3Token,
-        'ms':   MSToken,
-        'ms1':  MSToken,
-        'ms2':  MS2Token,
-        'mr':   MRToken,
-        'p':    PToken,
-        'pc':   PCToken,
-        'pi':   PIToken,
-        'pi2': PI2Token,
-        'b':    BToken,
-        's':    SToken,
-        's1':   SToken,
-        's2':   S2Token,
-        's3':   S3Token,
-        's4':   S4Token,
-        's5':   S5Token,
-        'sr':   SRToken,
-        'sts':  STSToken,
-        'mi':   MIToken,
-        'r':    RToken,
-        'c':    CToken,
-        'ca':   CASToken,
-        'ca*':  CAEToken,
-        'cl':   CLToken,
-        'v':    VToken,
-        'wj':   WJSToken,
-        'wj*':  WJEToken,
-        'q':    QToken,
-        'q1':   Q1Token,
-        'q2':   Q2Token,
-        'q3':   Q3Token,
-        'q4':   Q4Token,
-        'qa':   QAToken,
-        'qac':  QACToken,
-        'qc':   QCToken,
-        'qm':   QMToken,
-        'qm1':  QM1Token,
-        'qm2':  QM2Token,
-        'qm3':  QM3Token,
-        'qr':   QRToken,
-        'qs':   QSSToken,
-        'qs*':  QSEToken,
-        'qt':   QTSToken,
-        'qt*':  QTEToken,
-        'nb':   NBToken,
-        'f':    FSToken,
-        'fe':   FESToken,  # Footnote intended as an end note
-        'fr':   FRToken,
-        'fr*':  FREToken,
-        'fk':   FKToken,
-        'ft':   FTToken,
-        'fq':   FQToken,
-        'fq*':  FQEToken,
-        'fqa':  FQAToken,
-        'fqa*': FQAEToken,
-        'fqb':  FQAEToken,
-        'f*':   FEToken,
-        'fe*':  FEEToken,
-        'fv':   FVSToken,
-        'fv*':  FVEToken,
-        'fdc':  FDCSToken,
-        'fdc*': FDCEToken,
-        'fp':   FPToken,
-        'x':    XSToken,
-        'xdc':  XDCSToken,
-        'xdc*': XDCEToken,
-        'xo':   XOToken,
-        'xt':   XTToken,
-        'x*':   XEToken,
-        'it':   ISToken,
-        'it*':  IEToken,
-        'bd':   BDSToken,
-        'bd*':  BDEToken,
-        'bdit': BDITSToken,
-        'bdit*':BDITEToken,
-        'li':   LIToken,
-        'li1':  LI1Token,
-        'li2':  LI2Token,
-        'li3':  LI3Token,
-        'li4':  LI4Token,
-        'd':    DToken,
-        'sp':   SPToken,
-        'i*':   IEToken,
-        'add':  ADDSToken,
-        'add*': ADDEToken,
-        'nd':   NDSToken,
-        'nd*':  NDEToken,
-        'sc':   SCSToken,
-        'sc*':  SCEToken,
-        'm':    MToken,
-        'tl':   TLSToken,
-        'tl*':  TLEToken,
-        '\\\\': EscapedToken,
-        'rem':  REMToken,
-        'tr':   TRToken,
-        'th1':  TH1Token,
-        'th2':  TH2Token,
-        'th3':  TH3Token,
-        'th4':  TH4Token,
-        'th5':  TH5Token,
-        'th6':  TH6Token,
-        'thr1': THR1Token,
-        'thr2': THR2Token,
-        'thr3': THR3Token,
-        'thr4': THR4Token,
-        'thr5': THR5Token,
-        'thr6': THR6Token,
-        'tc1':  TC1Token,
-        'tc2':  TC2Token,
-        'tc3':  TC3Token,
-        'tc4':  TC4Token,
-        'tc5':  TC5Token,
-        'tc6':  TC6Token,
-        'tcr1': TCR1Token,
-        'tcr2': TCR2Token,
-        'tcr3': TCR3Token,
-        'tcr4': TCR4Token,
-        'tcr5': TCR5Token,
-        'tcr6': TCR6Token,
-        'toc1': TOC1Token,
-        'toc2': TOC2Token,
-        'toc3': TOC3Token,
-        'is':   IS1_Token,
-        'is1':  IS1_Token,
-        'imt':  IMT1_Token,
-        'imt1': IMT1_Token,
-        'imt2': IMT2_Token,
-        'imt3': IMT3_Token,
-        'ip':   IP_Token,
-        'iot':  IOT_Token,
-        'io':   IO1_Token,
-        'io1':  IO1_Token,
-        'io2':  IO2_Token,
-        'ior':  IOR_S_Token,
-        'ior*': IOR_E_Token,
-        'bk':   BK_S_Token,
-        'bk*':  BK_E_Token,
-        'text': TEXTToken,
-        'unknown': UnknownToken
-    }
-    for k, v in options.iteritems():
-        if t[0] == k:
-            if len(t) == 1:
-                token = v()
-            else:
-                token = v(t[1])
-            token.type = k
-            return token
-    raise Exception(t[0])
+    token_class = token_classes.get(t[0])
+    if token_class is None:
+        raise Exception(t[0])
+    if len(t) == 1:
+        token = token_class()
+    else:
+        token = token_class(t[1])
+    token.type = t[0]
+    return token
+
+class UsfmTokenType(type):
+    """
+    gives every token class empty __slots__ unless it defines its own, so tokens only carry value and type
+    """
+    def __new__(mcs, name, bases, attributes):
+        attributes.setdefault('__slots__', ())
+        return super(UsfmTokenType, mcs).__new__(mcs, name, bases, attributes)
 
 # noinspection PyMethodMayBeStatic
 class UsfmToken(object):
+    __metaclass__ = UsfmTokenType
+    __slots__ = ('value', 'type')
+
     def __init__(self, value=""):
         self.value = value
         self.type = None
@@ -1264,3 +1228,151 @@ class BK_E_Token(UsfmToken):
     def renderOn(self, printer):  return printer.render_bk_e(self)
     def is_bk_e(self):            return True
 
+# maps marker (or 'text' and 'unknown') to the class of token that createToken() makes for it
+token_classes = {
+    'id':   IDToken,
+    'ide':  IDEToken,
+    'h':    HToken,
+    'mt':   MTToken,
+    'mt1':  MTToken,
+    'mt2':  MT2Token,
+    'mt3':  MT3Token,
+    'ms':   MSToken,
+    'ms1':  MSToken,
+    'ms2':  MS2Token,
+    'mr':   MRToken,
+    'p':    PToken,
+    'pc':   PCToken,
+    'pi':   PIToken,
+    'pi2': PI2Token,
+    'b':    BToken,
+    's':    SToken,
+    's1':   SToken,
+    's2':   S2Token,
+    's3':   S3Token,
+    's4':   S4Token,
+    's5':   S5Token,
+    'sr':   SRToken,
+    'sts':  STSToken,
+    'mi':   MIToken,
+    'r':    RToken,
+    'c':    CToken,
+    'ca':   CASToken,
+    'ca*':  CAEToken,
+    'cl':   CLToken,
+    'v':    VToken,
+    'wj':   WJSToken,
+    'wj*':  WJEToken,
+    'q':    QToken,
+    'q1':   Q1Token,
+    'q2':   Q2Token,
+    'q3':   Q3Token,
+    'q4':   Q4Token,
+    'qa':   QAToken,
+    'qac':  QACToken,
+    'qc':   QCToken,
+    'qm':   QMToken,
+    'qm1':  QM1Token,
+    'qm2':  QM2Token,
+    'qm3':  QM3Token,
+    'qr':   QRToken,
+    'qs':   QSSToken,
+    'qs*':  QSEToken,
+    'qt':   QTSToken,
+    'qt*':  QTEToken,
+    'nb':   NBToken,
+    'f':    FSToken,
+    'fe':   FESToken,  # Footnote intended as an end note
+    'fr':   FRToken,
+    'fr*':  FREToken,
+    'fk':   FKToken,
+    'ft':   FTToken,
+    'fq':   FQToken,
+    'fq*':  FQEToken,
+    'fqa':  FQAToken,
+    'fqa*': FQAEToken,
+    'fqb':  FQAEToken,
+    'f*':   FEToken,
+    'fe*':  FEEToken,
+    'fv':   FVSToken,
+    'fv*':  FVEToken,
+    'fdc':  FDCSToken,
+    'fdc*': FDCEToken,
+    'fp':   FPToken,
+    'x':    XSToken,
+    'xdc':  XDCSToken,
+    'xdc*': XDCEToken,
+    'xo':   XOToken,
+    'xt':   XTToken,
+    'x*':   XEToken,
+    'it':   ISToken,
+    'it*':  IEToken,
+    'bd':   BDSToken,
+    'bd*':  BDEToken,
+    'bdit': BDITSToken,
+    'bdit*':BDITEToken,
+    'li':   LIToken,
+    'li1':  LI1Token,
+    'li2':  LI2Token,
+    'li3':  LI3Token,
+    'li4':  LI4Token,
+    'd':    DToken,
+    'sp':   SPToken,
+    'i*':   IEToken,
+    'add':  ADDSToken,
+    'add*': ADDEToken,
+    'nd':   NDSToken,
+    'nd*':  NDEToken,
+    'sc':   SCSToken,
+    'sc*':  SCEToken,
+    'm':    MToken,
+    'tl':   TLSToken,
+    'tl*':  TLEToken,
+    '\\\\': EscapedToken,
+    'rem':  REMToken,
+    'tr':   TRToken,
+    'th1':  TH1Token,
+    'th2':  TH2Token,
+    'th3':  TH3Token,
+    'th4':  TH4Token,
+    'th5':  TH5Token,
+    'th6':  TH6Token,
+    'thr1': THR1Token,
+    'thr2': THR2Token,
+    'thr3': THR3Token,
+    'thr4': THR4Token,
+    'thr5': THR5Token,
+    'thr6': THR6Token,
+    'tc1':  TC1Token,
+    'tc2':  TC2Token,
+    'tc3':  TC3Token,
+    'tc4':  TC4Token,
+    'tc5':  TC5Token,
+    'tc6':  TC6Token,
+    'tcr1': TCR1Token,
+    'tcr2': TCR2Token,
+    'tcr3': TCR3Token,
+    'tcr4': TCR4Token,
+    'tcr5': TCR5Token,
+    'tcr6': TCR6Token,
+    'toc1': TOC1Token,
+    'toc2': TOC2Token,
+    'toc3': TOC3Token,
+    'is':   IS1_Token,
+    'is1':  IS1_Token,
+    'imt':  IMT1_Token,
+    'imt1': IMT1_Token,
+    'imt2': IMT2_Token,
+    'imt3': IMT3_Token,
+    'ip':   IP_Token,
+    'iot':  IOT_Token,
+    'io':   IO1_Token,
+    'io1':  IO1_Token,
+    'io2':  IO2_Token,
+    'ior':  IOR_S_Token,
+    'ior*': IOR_E_Token,
+    'bk':   BK_S_Token,
+    'bk*':  BK_E_Token,
+    'text': TEXTToken,
+    'unknown': UnknownToken
+}
@@ -19,9 +19,11 @@ from libraries.usfm_tools import parseUsfm, usfm_verses
 # sys.path.append(os.path.join(rootdiroftools,'support'))
 
 # Global variables
-lastToken = None
+
+# change this whenever the checks change, so that lint results cached for older versions are not used
+VERIFIER_VERSION = 1
+
 vv_re = re.compile(r'([0-9]+)-([0-9]+)')
-error_log = None
 
 # chapter marker
 chapter_marker_re = re.compile(r'\\c', re.UNICODE)
@@ -29,134 +31,127 @@ chapter_marker_re = re.compile(r'\\c', re.UNICODE)
 # verse marker
 verse_marker_re = re.compile(r'\\v', re.UNICODE)
 
+# digits of a chapter or verse number
+digits_re = re.compile(r'[0-9]*')
+
+# line that starts a chapter
+chapter_line_re = re.compile(r'\\c[ \u00A0]?[0-9]', re.UNICODE)
+
+# reference at start of an error message, e.g. 'PHP 1:12'
+error_reference_re = re.compile(r'([^ ]+ [0-9]+:)([0-9]+)')
+
 WHITE_SPACE = [' ', '\u00A0', '\r', '\n', '\t']
 SPACE = [' ', '\u00A0']
 
 
-class State:
-    IDs = []
-    ID = ""
-    IDE = ""
-    toc1 = ""
-    toc2 = ""
-    toc3 = ""
-    mt = ""
-    heading = ""
-    master_chapter_label = ""
-    chapter_label = ""
-    chapter = 0
-    nParagraphs = 0
-    nMargin = 0
-    nQuotes = 0
-    verse = 0
-    lastVerse = 0
-    needVerseText = False
-    textOkayHere = False
-    reference = ""
-    lastRef = ""
-    chapters = set()
-    verseCounts = {}
-    errorRefs = set()
-    englishWords = []
-    lang_code = None
-    book_code = None
+class State(object):
+    """
+    everything the verifier learns about the book it is checking. Each UsfmVerifier owns its own State.
+    """
+    verseCounts = usfm_verses.verses
+    englishWords = []  # shared cache, filled on first use
+
+    def __init__(self):
+        self.lang_code = None
+        self.reset_all()
 
     def reset_all(self):
         self.reset_book()
-        State.IDs = []
-        State.errorRefs = set()
+        self.IDs = []
+        self.errorRefs = set()
 
     def reset_book(self):
-        State.ID = ""
-        State.IDE = ""
-        State.toc1 = ""
-        State.toc2 = ""
-        State.toc3 = ""
-        State.mt = ""
-        State.heading = ""
-        State.master_chapter_label = ""
-        State.chapter_label = ""
-        State.chapter = 0
-        State.lastVerse = 0
-        State.verse = 0
-        State.needVerseText = False
-        State.textOkayHere = False
-        State.chapters = set()
-        State.nParagraphs = 0
-        State.nMargin = 0
-        State.nQuotes = 0
-        State.lastRef = ""
-        State.reference = ""
-        State.book_code = None
+        self.ID = ""
+        self.IDE = ""
+        self.toc1 = ""
+        self.toc2 = ""
+        self.toc3 = ""
+        self.mt = ""
+        self.heading = ""
+        self.master_chapter_label = ""
+        self.chapter_label = ""
+        self.chapter = 0
+        self.lastChapter = 0
+        self.lastVerse = 0
+        self.verse = 0
+        self.needVerseText = False
+        self.textOkayHere = False
+        self.chapters = set()
+        self.nParagraphs = 0
+        self.nMargin = 0
+        self.nQuotes = 0
+        self.lastRef = ""
+        self.reference = ""
+        self.book_code = None
 
     def set_book_code(self, book):
-        State.book_code = book
-        State.reference = book  # default
+        self.book_code = book
+        self.reference = book  # default
 
     def setLanguageCode(self, code):
-        State.lang_code = code
+        self.lang_code = code
 
     def addID(self, id):
         self.reset_book()
-        State.IDs.append(id)
-        State.ID = id
-        State.lastRef = State.reference
-        State.reference = id
+        self.IDs.append(id)
+        self.ID = id
+        self.lastRef = self.reference
+        self.reference = id
 
     def getIDs(self):
-        return State.IDs
+        return self.IDs
 
     def addHeading(self, heading):
-        State.heading = heading
+        self.heading = heading
 
     def addIDE(self, ide):
-        State.IDE = ide
+        self.IDE = ide
 
     def addTOC1(self, toc):
-        State.toc1 = toc
+        self.toc1 = toc
 
     def addTOC2(self, toc):
-        State.toc2 = toc
+        self.toc2 = toc
 
     def addTOC3(self, toc):
-        State.toc3 = toc
+        self.toc3 = toc
 
     def addMT(self, mt):
-        State.mt = mt
+        self.mt = mt
 
     def addChapterLabel(self, text):
-        if State.chapter == 0:
-            State.master_chapter_label = text
+        if self.chapter == 0:
+            self.master_chapter_label = text
         else:
-            State.chapter_label = text
+            self.chapter_label = text
 
     def addChapter(self, c):
-        State.lastChapter = State.chapter
-        State.chapter = int(c)
-        State.chapters.add(State.chapter)
-        State.lastVerse = 0
-        State.nParagraphs = 0
-        State.nMargin = 0
-        State.nQuotes = 0
-        State.verse = 0
-        State.needVerseText = False
-        State.textOkayHere = False
-        State.lastRef = State.reference
-        State.reference = self.get_id() + " " + str(State.chapter)
+        self.lastChapter = self.chapter
+        self.chapter = int(c)
+        self.chapters.add(self.chapter)
+        self.lastVerse = 0
+        self.nParagraphs = 0
+        self.nMargin = 0
+        self.nQuotes = 0
+        self.verse = 0
+        self.needVerseText = False
+        self.textOkayHere = False
+        self.lastRef = self.reference
+        self.reference = self.get_id() + " " + str(self.chapter)
 
     def get_id(self):
-        id = State.ID
-        if not State.ID:
-            id = State.book_code  # use book code if no ID given
+        id = self.ID
+        if not self.ID:
+            id = self.book_code  # use book code if no ID given
         return id
 
     def addParagraph(self):
-        State.nParagraphs += 1
-        State.textOkayHere = True
+        self.nParagraphs += 1
+        self.textOkayHere = True
 
     def addMargin(self):
-        State.nMargin += State.nMargin + 1
-        State.textOkayHere = True
+        self.nMargin += self.nMargin + 1
+        self.textOkayHere = True
 
     # supports a span of verses, e.g. 3-4, if needed. Passes the verse(s) on to addVerse()
     def addVerses(self, vv):
@@ -175,124 +170,435 @@ class State:
             self.addVerse(str(vn))
 
     def addVerse(self, v):
-        State.lastVerse = State.verse
-        State.verse = int(v)
-        State.needVerseText = True
-        State.textOkayHere = True
-        State.lastRef = State.reference
-        State.reference = self.get_id() + " " + str(State.chapter) + ":" + v
+        self.lastVerse = self.verse
+        self.verse = int(v)
+        self.needVerseText = True
+        self.textOkayHere = True
+        self.lastRef = self.reference
+        self.reference = self.get_id() + " " + str(self.chapter) + ":" + v
 
     def textOkay(self):
-        return State.textOkayHere
+        return self.textOkayHere
 
     def needText(self):
-        return State.needVerseText
+        return self.needVerseText
 
     def addText(self):
-        State.needVerseText = False
-        State.textOkayHere = True
+        self.needVerseText = False
+        self.textOkayHere = True
 
     def addQuote(self):
-        State.nQuotes += State.nQuotes + 1
-        State.textOkayHere = True
+        self.nQuotes += self.nQuotes + 1
+        self.textOkayHere = True
 
     # Adds the specified reference to the set of error references
     # Returns True if reference can be added
     # Returns False if reference was previously added
     def addError(self, ref):
         success = False
-        if ref not in State.errorRefs:
+        if ref not in self.errorRefs:
             self.errorRefs.add(ref)
             success = True
         return success
 
     def getEnglishWords(self):
         if len(State.englishWords) == 0:
+            english_words = []
             for book in usfm_verses.verses:
                 book_data = usfm_verses.verses[book]
                 english_name = book_data["en_name"].lower()
-                english_words = english_name.split(' ')
-                for word in english_words:
+                for word in english_name.split(' '):
                     if word and not isNumber(word):
-                        State.englishWords.append(word)
-            State.englishWords.sort()
+                        english_words.append(word)
+            english_words.sort()
+            State.englishWords = english_words  # replace in one step so other verifiers never see a partial list
         return State.englishWords
 
-    def loadVerseCounts(self):
-        if len(State.verseCounts) == 0:
-            State.verseCounts = usfm_verses.verses
-
-            # jsonPath = 'verses.json'
-            # if not os.access(jsonPath, os.F_OK):
-            #     jsonPath = os.path.dirname(os.path.abspath(__file__)) + "\\" + jsonPath
-            # if os.access(jsonPath, os.F_OK):
-            #     f = open(jsonPath, 'r')
-            #     State.verseCounts = json.load(f)
-            #     f.close()
-            # else:
-            #     report_error("File not found: verses.json\n")
-
     # Returns the number of chapters that the specified book should contain
     def nChapters(self, id):
-        n = 0
-        self.loadVerseCounts()
-        n = State.verseCounts[id]['chapters']
-        return n
+        return self.verseCounts[id]['chapters']
 
-        # Returns the number of verses that the specified chapter should contain
+    # Returns the number of verses that the specified chapter should contain
     def nVerses(self, id, chap):
-        n = 0
-        self.loadVerseCounts()
-        chaps = State.verseCounts[id]['verses']
-        n = chaps[chap-1]
-        return n
-
-def report_error(msg):
-    if error_log is None:  # if error logging is enabled then don't print
-        sys.stderr.write(msg)
-    else:
-        error_log.append(msg.rstrip(' \t\n\r'))
-
-def verifyVerseCount():
-    state = State()
-    if not state.ID:
-        return -1
-
-    if state.chapter > 0 and state.verse != state.nVerses(state.ID, state.chapter):
-        # Revelation 12 may have 17 or 18 verses
-        # 3 John may have 14 or 15 verses
-        if state.reference != 'REV 12:18' and state.reference != '3JN 1:15':
-            report_error(state.reference + " - Should have " + str(state.nVerses(state.ID, state.chapter)) + " verses" + '\n')
-
-def verifyNotEmpty(filename):
-    state = State()
-    if not state.ID or state.chapter == 0:
-        report_error(filename + " - File may be empty.\n")
-
-def verifyIdentification(book_code):
-    state = State()
-    if not state.ID:
-        report_error(book_code + " - Missing \\id tag")
-    elif (book_code is not None) and (book_code != state.ID):
-        report_error(state.ID + " - Found in \\id tag does not match code '" + book_code + "' found in file name")
-
-    if not state.IDE:
-        report_error(book_code + " - Missing \\ide tag")
-
-    if not state.heading:
-        report_error(book_code + " - Missing \\h tag")
-
-    if not state.toc1:
-        report_error(book_code + " - Missing \\toc1 tag")
-
-    if not state.toc2:
-        report_error(book_code + " - Missing \\toc2 tag")
-
-    if not state.toc3:
-        report_error(book_code + " - Missing \\toc3 tag")
-
-    if not state.mt:
-        report_error(book_code + " - Missing \\mt tag")
+        chaps = self.verseCounts[id]['verses']
+        return chaps[chap-1]
+
+
+class UsfmVerifier(object):
+    """
+    Verifies the USFM of one book at a time. All of the state of a check is kept in the verifier, so separate
+        verifiers can check books at the same time.
+    """
+
+    def __init__(self):
+        self.state = State()
+        self.error_log = None
+        self.reported_verses = set()  # verse references that error messages start with
+        self.last_token = None
+
+    def verify_contents_quiet(self, unicodestring, filename, book_code, lang_code):
+        self.start_book(book_code, lang_code)
+        self.verifyChapterAndVerseMarkers(unicodestring, book_code)
+        for token in parseUsfm.parse_string(unicodestring):
+            self.take(token)
+        return self.finish_book(filename, book_code)
+
+    def verify_chapters_quiet(self, chapters, filename, book_code, lang_code):
+        """
+        Does the same checks as verify_contents_quiet(), but is given the book a chapter at a time (see
+            split_chapters()) so only one chapter has to be in memory.  The warnings for each chapter are grouped
+            together instead of the chapter and verse marker warnings for the whole book coming first.
+        :param iterable chapters: USFM text of each chapter, each after the first starting with its chapter marker
+        :return tuple: errors, book code found in the book
+        """
+        self.start_book(book_code, lang_code)
+        last_ch = 1
+        empty = True
+        for chapter in chapters:
+            # the newline in front is the end of the previous chapter, needed to check the chapter marker
+            marker_text = chapter if empty else '\n' + chapter
+            last_ch = self.verifyChapterAndVerseMarkers(marker_text, book_code, last_ch)
+            for token in parseUsfm.parse_string(chapter):
+                self.take(token)
+            empty = False
+        if empty:
+            parseUsfm.parse_string('')  # fails the same way as verify_contents_quiet() does for an empty book
+        return self.finish_book(filename, book_code)
+
+    def start_book(self, book_code, lang_code):
+        self.error_log = []  # enable error logging
+        self.reported_verses = set()
+        self.last_token = None
+        state = self.state
+        state.reset_all()  # clear out previous values
+        state.set_book_code(book_code)
+        state.setLanguageCode(lang_code)
+
+    def finish_book(self, filename, book_code):
+        self.verifyNotEmpty(filename)
+        self.verifyIdentification(book_code)
+        self.verifyVerseCount()  # for last chapter
+        self.verifyChapterCount()
+        errors = self.error_log
+        self.error_log = None  # turn error logging back off
+        return errors, self.state.ID
+
+    def report_error(self, msg):
+        if self.error_log is None:  # if error logging is enabled then don't print
+            sys.stderr.write(msg)
+        else:
+            msg = msg.rstrip(' \t\n\r')
+            self.error_log.append(msg)
+            self.index_error(msg)
+
+    def index_error(self, msg):
+        """
+        remember the verse references that msg starts with, so takeV() can check for previous warnings without
+            searching the error log. 'PHP 1:12 - ...' starts with both 'PHP 1:1' and 'PHP 1:12'.
+        """
+        match = error_reference_re.match(msg)
+        if match:
+            chapter_ref, verse = match.groups()
+            for i in range(1, len(verse) + 1):
+                self.reported_verses.add(chapter_ref + verse[:i])
+
+    def verifyVerseCount(self):
+        state = self.state
+        if not state.ID:
+            return -1
+
+        if state.chapter > 0 and state.verse != state.nVerses(state.ID, state.chapter):
+            # Revelation 12 may have 17 or 18 verses
+            # 3 John may have 14 or 15 verses
+            if state.reference != 'REV 12:18' and state.reference != '3JN 1:15':
+                self.report_error(state.reference + " - Should have " + str(state.nVerses(state.ID, state.chapter)) +
+                                  " verses" + '\n')
+
+    def verifyNotEmpty(self, filename):
+        state = self.state
+        if not state.ID or state.chapter == 0:
+            self.report_error(filename + " - File may be empty.\n")
+
+    def verifyIdentification(self, book_code):
+        state = self.state
+        if not state.ID:
+            self.report_error(book_code + " - Missing \\id tag")
+        elif (book_code is not None) and (book_code != state.ID):
+            self.report_error(state.ID + " - Found in \\id tag does not match code '" + book_code +
+                              "' found in file name")
+
+        if not state.IDE:
+            self.report_error(book_code + " - Missing \\ide tag")
+
+        if not state.heading:
+            self.report_error(book_code + " - Missing \\h tag")
+
+        if not state.toc1:
+            self.report_error(book_code + " - Missing \\toc1 tag")
+
+        if not state.toc2:
+            self.report_error(book_code + " - Missing \\toc2 tag")
+
+        if not state.toc3:
+            self.report_error(book_code + " - Missing \\toc3 tag")
+
+        if not state.mt:
+            self.report_error(book_code + " - Missing \\mt tag")
+
+    def verifyChapterAndVerseMarkers(self, text, book, last_ch=1):
+        """
+        :param int last_ch: chapter that the start of text is in
+        :return int: chapter that the end of text is in
+        """
+        pos = 0
+        for chapter_current in chapter_marker_re.finditer(text):
+            start = chapter_current.start()
+            end = chapter_current.end()
+            char = text[end]
+            if (char >= 'a') and (char <= 'z'):
+                continue  #  skip non-chapter markers
+            has_space = char in SPACE
+            if has_space:
+                end += 1
+            char = text[start - 1]
+            newline_before = (char == '\n') or (char == '\r')
+            ch_num, has_space_after = get_chapter_number(text, end)
+            if ch_num >= 0:
+                if not has_space:
+                    self.add_error(text, book, "Missing space before chapter number: '{0}'", start, last_ch)
+                elif not has_space_after:
+                    self.add_error(text, book, "Missing new line after chapter number: '{0}'", start, last_ch)
+                elif not newline_before:
+                    self.add_error(text, book, "Missing new line before chapter marker: '{0}'", start-4, last_ch)
+                self.check_chapter(text, book, last_ch, pos, start)
+                last_ch = ch_num
+                pos = end
+            else:
+                self.add_error(text, book, "Invalid chapter number: '{0}'", start, last_ch)
+
+        self.check_chapter(text, book, last_ch, pos, len(text))  # check last chapter
+        return last_ch
+
+    def add_error(self, text, book, message, pos, chapter, verse=None):
+        length = 8
+        example = text[pos: pos + length]
+        self.report_error(get_reference(book, chapter, verse) + " - " + message.format(example))
+
+    def check_chapter(self, text, book, chapter_num, start, end):
+        last_vs_range = '1'
+        for verse_current in verse_marker_re.finditer(text, start, end):
+            start = verse_current.start()
+            end = verse_current.end()
+            char = text[end]
+            has_space = char in SPACE
+            if has_space:
+                end += 1
+            char = text[start - 1]
+            space_before = char in WHITE_SPACE
+            vs_range, has_space_after = get_verse_range(text, end)
+            if vs_range != '':
+                if not has_space:
+                    self.add_error(text, book, "Missing space before verse number: '{0}'", start, chapter_num,
+                                   vs_range)
+                elif not has_space_after:
+                    self.add_error(text, book, "Missing space after verse number: '{0}'", start, chapter_num,
+                                   vs_range)
+                elif not space_before:
+                    self.add_error(text, book, "Missing space before verse marker: '{0}'", start-1, chapter_num,
+                                   vs_range)
+                last_vs_range = vs_range
+            else:
+                self.add_error(text, book, "Invalid verse number: '{0}'", start, chapter_num, last_vs_range)
+
+    def verifyChapterCount(self):
+        state = self.state
+        if state.ID:
+            expected_chapters = state.nChapters(state.ID)
+            if len(state.chapters) != expected_chapters:
+                for i in range(1, expected_chapters + 1):
+                    if i not in state.chapters:
+                        self.report_error(state.ID + " " + str(i) + " - Missing chapter " + "\n")
+
+    def verifyTextTranslated(self, text, token):
+        found, word = self.needsTranslation(text)
+        if found:
+            self.report_error("Token '\\{0}' has untranslated word '{1}'".format(token, word))
+
+    def needsTranslation(self, text):
+        state = self.state
+        if state.lang_code and (state.lang_code[0:2] != 'en'):  # no need to translate english
+            english = state.getEnglishWords()
+            words = text.split(' ')
+            for word in words:
+                if word:
+                    found = binarySearch(english, word.lower())
+                    if found:
+                        return True, word
+        return False, None
+
+    def takeCL(self, text):
+        self.state.addChapterLabel(text)
+        self.verifyTextTranslated(text, 'cl')
+
+    def takeTOC1(self, text):
+        self.state.addTOC1(text)
+        self.verifyTextTranslated(text, 'toc1')
+
+    def takeTOC2(self, text):
+        self.state.addTOC2(text)
+        self.verifyTextTranslated(text, 'toc2')
+
+    def takeTOC3(self, text):
+        self.state.addTOC3(text)
+        # self.verifyTextTranslated(text, 'toc3') # toc3 commonly has 3-letter book code, not to be translated
+
+    def takeMT(self, text):
+        self.state.addMT(text)
+        self.verifyTextTranslated(text, 'mt')
+
+    def takeH(self, heading):
+        self.state.addHeading(heading)
+        self.verifyTextTranslated(heading, 'h')
+
+    def takeIDE(self, ide):
+        self.state.addIDE(ide)
+
+    def takeID(self, id):
+        state = self.state
+        code = '' if not id else id.split(' ')[0]
+        if len(code) < 3:
+            self.report_error(state.reference + " - Invalid ID: '" + id + "'\n")
+            return
+        if code in state.getIDs():
+            self.report_error(state.reference + " - Duplicate ID: " + id + '\n')
+            return
+        if code in state.verseCounts:  # look for match in bible names
+            state.addID(code)
+            return
+        self.report_error(state.reference + " - Invalid Code '" + code + "' in ID: '" + id + "'\n")
+
+    def takeC(self, c):
+        state = self.state
+        state.addChapter(c)
+        if len(state.IDs) == 0:
+            self.report_error(state.reference + " - Missing ID before chapter" + '\n')
+        if state.chapter < state.lastChapter:
+            self.report_error(state.reference + " - Chapter out of order" + '\n')
+        elif state.chapter == state.lastChapter:
+            self.report_error(state.reference + " - Duplicate chapter" + '\n')
+        elif state.chapter > state.lastChapter + 2:
+            self.report_error(state.lastRef + " - Missing chapters between this and: " + state.reference + '\n')
+        elif state.chapter > state.lastChapter + 1:
+            self.report_error(state.lastRef + " - Missing chapter between this and: " + state.reference + '\n')
+
+    def takeP(self):
+        self.state.addParagraph()
+
+    def takeM(self):
+        self.state.addMargin()
+
+    def takeV(self, v):
+        state = self.state
+        state.addVerses(v)
+        if state.lastVerse == 0:  # if first verse in chapter
+            if len(state.IDs) == 0 and state.chapter == 0:
+                self.report_error(state.reference + " " + v + " - Missing ID before verse" + '\n')
+            if state.chapter == 0:
+                self.report_error(state.reference + " - Missing chapter tag" + '\n')
+            if (state.nParagraphs == 0) and (state.nQuotes == 0) and (state.nMargin == 0):
+                self.report_error(state.reference +
+                                  " - Missing paragraph marker (\\p), margin (\\m) or quote (\\q) before: " + '\n')
+
+        missing = ""
+        if state.verse < state.lastVerse and state.addError(state.lastRef):
+            self.report_error(state.reference + " - Verse out of order: after " + state.lastRef + '\n')
+            state.addError(state.reference)
+        elif state.verse == state.lastVerse:
+            self.report_error(state.reference + " - Duplicated verse" + '\n')
+        elif state.verse == state.lastVerse + 2 and not isOptional(state.reference):
+            missing = " - Missing verse between this and: "
+        elif state.verse > state.lastVerse + 2:
+            missing = " - Missing verses between this and: "
+
+        if missing:
+            state.addError(state.lastRef)
+            if self.error_log is not None:  # see if already warned for missing verses
+                chapter_ref = state.ID + ' ' + str(state.chapter) + ':'
+                gaps = False
+                for i in range(state.lastVerse+1, state.verse):
+                    if (chapter_ref + str(i)) not in self.reported_verses:
+                        gaps = True
+                        break
+                if not gaps:
+                    return
+
+            self.report_error(state.lastRef + missing + state.reference + '\n')
+
+    def takeText(self, t):
+        state = self.state
+        last_token = self.last_token
+        if not state.textOkay() and not (last_token and isTextCarryingToken(last_token)):
+            if t[0] == '\\':
+                self.report_error(state.reference + " - Nearby uncommon or invalid marker" + '\n')
+            else:
+                # print "Missing verse marker before text: <" + t.encode('utf-8') + "> around " + state.reference
+                # report_error("Missing verse marker or extra text around " + state.reference + ": <" + t[0:10] + '>.\n')
+                self.report_error(state.reference + " - Missing verse marker or extra text nearby " + '\n')
+            if last_token:
+                self.report_error(state.reference + " - Preceding Token.type was " + last_token.getType() + '\n')
+            else:
+                self.report_error(state.reference + " - No preceding Token\n")
+        state.addText()
+
+    def takeUnknown(self, token):
+        state = self.state
+        value = token.getValue()
+        if (value == 'v') or (value == 'c'):
+            return  # skip malformed chapter and verses - will be caught later
+        elif value == 'p':
+            self.report_error(state.reference + " - Orphan paragraph marker follows")
+        else:
+            self.report_error(state.reference + " - Unknown Token: '\\" + value + "'")
+
+    def take(self, token):
+        state = self.state
+        if isFootnote(token):
+            state.addText()     # footnote suffices for verse text
+        if state.needText() and not token.isTEXT() and not isTextCarryingToken(token):
+            self.report_error(state.reference + " - Empty verse" + '\n')
+        if token.isID():
+            self.takeID(token.value)
+        elif token.isIDE():
+            self.takeIDE(token.value)
+        elif token.isH():
+            self.takeH(token.value)
+        elif token.isTOC1():
+            self.takeTOC1(token.value)
+        elif token.isTOC2():
+            self.takeTOC2(token.value)
+        elif token.isTOC3():
+            self.takeTOC3(token.value)
+        elif token.isMT():
+            self.takeMT(token.value)
+        elif token.isCL():
+            self.takeCL(token.value)
+        elif token.isC():
+            self.verifyVerseCount()  # for the preceding chapter
+            self.takeC(token.value)
+        elif token.isP() or token.isPI() or token.isPC() or token.isNB():
+            self.takeP()
+        elif token.isV():
+            self.takeV(token.value)
+        elif token.isTEXT():
+            self.takeText(token.value)
+        elif token.isQ() or token.isQ1() or token.isQ2() or token.isQ3():
+            state.addQuote()
+        elif token.isM() or token.isMI():
+            state.addMargin()
+        elif token.isUnknown():
+            self.takeUnknown(token)
+        self.last_token = token
+
 
 def get_reference(book, chapter, verse=None):
     ref = book + " " + str(chapter)
@@ -300,64 +606,6 @@ def get_reference(book, chapter, verse=None):
           ref += ":" + verse
     return ref
 
-def verifyChapterAndVerseMarkers(text, book):
-    pos = 0
-    last_ch = 1
-    for chapter_current in chapter_marker_re.finditer(text):
-        start = chapter_current.start()
-        end = chapter_current.end()
-        char = text[end]
-        if (char >= 'a') and (char <= 'z'):
-            continue  #  skip non-chapter markers
-        has_space = char in SPACE
-        if has_space:
-            end += 1
-        char = text[start - 1]
-        newline_before = (char == '\n') or (char == '\r')
-        ch_num, has_space_after = get_chapter_number(text, end)
-        if ch_num >= 0:
-            if not has_space:
-                add_error(text, book, "Missing space before chapter number: '{0}'", start, last_ch)
-            elif not has_space_after:
-                add_error(text, book, "Missing new line after chapter number: '{0}'", start, last_ch)
-            elif not newline_before:
-                add_error(text, book, "Missing new line before chapter marker: '{0}'", start-4, last_ch)
-            check_chapter(text, book, last_ch, pos, start)
-            last_ch = ch_num
-            pos = end
-        else:
-            add_error(text, book, "Invalid chapter number: '{0}'", start, last_ch)
-
-    check_chapter(text, book, last_ch, pos, len(text))  # check last chapter
-
-def add_error(text, book, message, pos, chapter, verse=None):
-    length = 8
-    example = text[pos: pos + length]
-    report_error(get_reference(book, chapter, verse) + " - " + message.format(example))
-
-def check_chapter(text, book, chapter_num, start, end):
-    last_vs_range = '1'
-    for verse_current in verse_marker_re.finditer(text, start, end):
-        start = verse_current.start()
-        end = verse_current.end()
-        char = text[end]
-        has_space = char in SPACE
-        if has_space:
-            end += 1
-        char = text[start - 1]
-        space_before = char in WHITE_SPACE
-        vs_range, has_space_after = get_verse_range(text, end)
-        if vs_range != '':
-            if not has_space:
-                add_error(text, book, "Missing space before verse number: '{0}'", start, chapter_num, vs_range)
-            elif not has_space_after:
-                add_error(text, book, "Missing space after verse number: '{0}'", start, chapter_num, vs_range)
-            elif not space_before:
-                add_error(text, book, "Missing space before verse marker: '{0}'", start-1, chapter_num, vs_range)
-            last_vs_range = vs_range
-        else:
-            add_error(text, book, "Invalid verse number: '{0}'", start, chapter_num, last_vs_range)
-
 def get_verse_range(text, start):
     pos = start
     verse, c, end = get_number(text, pos)
@@ -385,26 +633,11 @@ def get_chapter_number(text, start):
     return -1, has_white_space
 
 def get_number(text, start):
-    digits = ''
-    end = start
-    c = ''
-    for pos in range(start, len(text)):
-        c = text[pos]
-        if (c >= '0') and (c <= '9'):
-            digits += c
-            continue
-        end = pos
-        break
-    return digits, c, end
-
-def verifyChapterCount():
-    state = State()
-    if state.ID:
-        expected_chapters = state.nChapters(state.ID)
-        if len(state.chapters) != expected_chapters:
-            for i in range(1, expected_chapters + 1):
-                if i not in state.chapters:
-                    report_error(state.ID + " " + str(i) + " - Missing chapter " + "\n")
+    end = digits_re.match(text, start).end()
+    digits = text[start:end]
+    if end < len(text):
+        return digits, text[end], end
+    return digits, digits[-1:], start  # ran into the end of the text
 
 # def printToken(token):
 #     if token.isV():
@@ -418,23 +651,6 @@ def verifyChapterCount():
 #     else:
 #         print(token)
 
-def verifyTextTranslated(text, token):
-    found, word = needsTranslation(text)
-    if found:
-        report_error("Token '\\{0}' has untranslated word '{1}'".format(token, word))
-
-def needsTranslation(text):
-    state = State()
-    if state.lang_code and (state.lang_code[0:2] != 'en'):  # no need to translate english
-        english = state.getEnglishWords()
-        words = text.split(' ')
-        for word in words:
-            if word:
-                found = binarySearch(english, word.lower())
-                if found:
-                    return True, word
-    return False, None
-
 def binarySearch(alist, item):
     first = 0
     last = len(alist)-1
@@ -460,145 +676,6 @@ def isNumber(s):
             return True
     return False
 
-def takeCL(text):
-    state = State()
-    state.addChapterLabel(text)
-    verifyTextTranslated(text, 'cl')
-
-def takeTOC1(text):
-    state = State()
-    state.addTOC1(text)
-    verifyTextTranslated(text, 'toc1')
-
-def takeTOC2(text):
-    state = State()
-    state.addTOC2(text)
-    verifyTextTranslated(text, 'toc2')
-
-def takeTOC3(text):
-    state = State()
-    state.addTOC3(text)
-    # verifyTextTranslated(text, 'toc3') # toc3 commonly has 3-letter book code, not to be translated
-
-def takeMT(text):
-    state = State()
-    state.addMT(text)
-    verifyTextTranslated(text, 'mt')
-
-def takeH(heading):
-    state = State()
-    state.addHeading(heading)
-    verifyTextTranslated(heading, 'h')
-
-def takeIDE(ide):
-    state = State()
-    state.addIDE(ide)
-
-def takeID(id):
-    state = State()
-    code = '' if not id else id.split(' ')[0]
-    if len(code) < 3:
-        report_error(state.reference + " - Invalid ID: '" + id + "'\n")
-        return
-    if code in state.getIDs():
-        report_error(state.reference + " - Duplicate ID: " + id + '\n')
-        return
-    state.loadVerseCounts()
-    for k in State.verseCounts:  # look for match in bible names
-        if k == code:
-            state.addID(code)
-            return
-    report_error(state.reference + " - Invalid Code '" + code + "' in ID: '" + id + "'\n")
-
-def takeC(c):
-    state = State()
-    state.addChapter(c)
-    if len(state.IDs) == 0:
-        report_error(state.reference + " - Missing ID before chapter" + '\n')
-    if state.chapter < state.lastChapter:
-        report_error(state.reference + " - Chapter out of order" + '\n')
-    elif state.chapter == state.lastChapter:
-        report_error(state.reference + " - Duplicate chapter" + '\n')
-    elif state.chapter > state.lastChapter + 2:
-        report_error(state.lastRef + " - Missing chapters between this and: " + state.reference + '\n')
-    elif state.chapter > state.lastChapter + 1:
-        report_error(state.lastRef + " - Missing chapter between this and: " + state.reference + '\n')
-
-def takeP():
-    state = State()
-    state.addParagraph()
-
-def takeM():
-    state = State()
-    state.addMargin()
-
-def takeV(v):
-    state = State()
-    state.addVerses(v)
-    if state.lastVerse == 0:  # if first verse in chapter
-        if len(state.IDs) == 0 and state.chapter == 0:
-            report_error(state.reference + " " + v + " - Missing ID before verse" + '\n')
-        if state.chapter == 0:
-            report_error(state.reference + " - Missing chapter tag" + '\n')
-        if (state.nParagraphs == 0) and (state.nQuotes == 0) and (state.nMargin == 0):
-            report_error(state.reference + " - Missing paragraph marker (\\p), margin (\\m) or quote (\\q) before: "
-                         + '\n')
-
-    missing = ""
-    if state.verse < state.lastVerse and state.addError(state.lastRef):
-        report_error(state.reference + " - Verse out of order: after " + state.lastRef + '\n')
-        state.addError(state.reference)
-    elif state.verse == state.lastVerse:
-        report_error(state.reference + " - Duplicated verse" + '\n')
-    elif state.verse == state.lastVerse + 2 and not isOptional(state.reference):
-        missing = " - Missing verse between this and: "
-    elif state.verse > state.lastVerse + 2:
-        missing = " - Missing verses between this and: "
-    
-    if missing:
-        state.addError(state.lastRef)
-        if not error_log is None:  # see if already warned for missing verses
-            gaps = False
-            for i in range(state.lastVerse+1, state.verse):
-                ref = state.ID + ' ' + str(state.chapter) + ':' + str(i)
-                ref_len = len(ref)
-                verse_warning_found = False
-                for error in error_log:
-                    if error[:ref_len] == ref:
-                        verse_warning_found = True
-                        break
-                if not verse_warning_found:
-                    gaps = True
-            if not gaps:
-                return
-
-        report_error(state.lastRef + missing + state.reference + '\n')
-
-def takeText(t):
-    state = State()
-    global lastToken
-    if not state.textOkay() and not isTextCarryingToken(lastToken):
-        if t[0] == '\\':
-            report_error(state.reference + " - Nearby uncommon or invalid marker" + '\n')
-        else:
-            # print "Missing verse marker before text: <" + t.encode('utf-8') + "> around " + state.reference
-            # report_error("Missing verse marker or extra text around " + state.reference + ": <" + t[0:10] + '>.\n')
-            report_error(state.reference + " - Missing verse marker or extra text nearby " + '\n')
-        if lastToken:
-            report_error(state.reference + " - Preceding Token.type was " + lastToken.getType() + '\n')
-        else:
-            report_error(state.reference + " - No preceding Token\n")
-    state.addText()
-
-def takeUnknown(state, token):
-    value = token.getValue()
-    if (value == 'v') or (value == 'c'):
-        return  # skip malformed chapter and verses - will be caught later
-    elif value == 'p':
-        report_error( state.reference + " - Orphan paragraph marker follows")
-    else:
-        report_error( state.reference + " - Unknown Token: '\\" + value + "'")
-
 # Returns True if token is part of a footnote
 def isFootnote(token):
     return token.isFS() or token.isFE() or token.isFR() or token.isFRE() or token.isFT() or token.isFP() or token.isFES() or token.isFEE()
@@ -621,46 +698,6 @@ def isIntro(token):
     
 def isTextCarryingToken(token):
     return token.isB() or token.isM() or token.isD() or isFootnote(token) or isCrossRef(token) or isPoetry(token) or isIntro(token)
-    
-def take(token):
-    state = State()
-    if isFootnote(token):
-        state.addText()     # footnote suffices for verse text
-    if state.needText() and not token.isTEXT() and not isTextCarryingToken(token):
-        report_error(state.reference + " - Empty verse" + '\n')
-    if token.isID():
-        takeID(token.value)
-    elif token.isIDE():
-        takeIDE(token.value)
-    elif token.isH():
-        takeH(token.value)
-    elif token.isTOC1():
-        takeTOC1(token.value)
-    elif token.isTOC2():
-        takeTOC2(token.value)
-    elif token.isTOC3():
-        takeTOC3(token.value)
-    elif token.isMT():
-        takeMT(token.value)
-    elif token.isCL():
-        takeCL(token.value)
-    elif token.isC():
-        verifyVerseCount()  # for the preceding chapter
-        takeC(token.value)
-    elif token.isP() or token.isPI() or token.isPC() or token.isNB():
-        takeP()
-    elif token.isV():
-        takeV(token.value)
-    elif token.isTEXT():
-        takeText(token.value)
-    elif token.isQ() or token.isQ1() or token.isQ2() or token.isQ3():
-        state.addQuote()
-    elif token.isM() or token.isMI():
-        state.addMargin()
-    elif token.isUnknown():
-        takeUnknown(state, token)
-    global lastToken
-    lastToken = token
 
 # def verifyFile(filename):
 #     # detect file encoding
@@ -685,22 +722,32 @@ def take(token):
 #     print("FINISHED CHECKING.\n")
 
 def verify_contents_quiet(unicodestring, filename, book_code, lang_code):
-    global error_log
-    error_log = []  # enable error logging
-    state = State()
-    state.reset_all()  # clear out previous values
-    state.set_book_code(book_code)
-    state.setLanguageCode(lang_code)
-    verifyChapterAndVerseMarkers(unicodestring, book_code)
-    for token in parseUsfm.parse_string(unicodestring):
-        take(token)
-    verifyNotEmpty(filename)
-    verifyIdentification(book_code)
-    verifyVerseCount()  # for last chapter
-    verifyChapterCount()
-    errors = error_log
-    error_log = None  # turn error logging back off
-    return errors, state.ID
+    return UsfmVerifier().verify_contents_quiet(unicodestring, filename, book_code, lang_code)
+
+
+def verify_chapters_quiet(chapters, filename, book_code, lang_code):
+    return UsfmVerifier().verify_chapters_quiet(chapters, filename, book_code, lang_code)
+
+
+def split_chapters(lines):
+    """
+    generator that joins the lines of a book into chapters, each chapter after the first starting with the line that
+        has its chapter marker.  White space at the start of the book is dropped.
+    :param iterable lines: e.g. a file opened with io.open()
+    """
+    chapter = None
+    for line in lines:
+        if chapter is None:  # still at the start of the book
+            line = line.lstrip()
+            if line:
+                chapter = [line]
+        elif chapter_line_re.match(line):
+            yield ''.join(chapter)
+            chapter = [line]
+        else:
+            chapter.append(line)
+    if chapter:
+        yield ''.join(chapter)
 
 # def detect_by_bom(path, default):
 #     with open(path, 'rb') as f:
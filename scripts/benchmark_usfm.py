@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Measures how fast USFM books are parsed, verified and converted to HTML.
+
+Books come from synthetic USFM generated from BOOK_CHAPTER_VERSES and from the .usfm files in the zip files and
+folders under tests/.  For each book and stage (parse, verify, convert) the wall time, tokens per second and peak
+memory growth are reported.  Each measurement runs in its own process so the memory of one stage does not hide the
+next one.
+
+Examples:
+    python -m scripts.benchmark_usfm --books psa,isa --words 20 --save baseline.json
+    python -m scripts.benchmark_usfm --books psa,isa --words 20 --compare baseline.json
+    python -m scripts.benchmark_usfm --no-synthetic --fixtures --stages parse,verify
+    python -m scripts.benchmark_usfm --books psa --gap-step 3 --stages verify
+
+When comparing, any stage that is more than --threshold slower (or uses that much more memory) than in the baseline
+is flagged and the exit code is 1.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import zipfile
+
+from libraries.app.app import App
+from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
+from libraries.door43_tools.bible_books import BOOK_CHAPTER_VERSES, BOOK_NAMES, BOOK_NUMBERS
+from libraries.usfm_tools import parseUsfm, verifyUSFM
+
+STAGES = ['parse', 'verify', 'convert']
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'tests')
+WORDS = ['and', 'the', 'people', 'went', 'to', 'city', 'of', 'God', 'he', 'said', 'them', 'in', 'that', 'day',
+         'light', 'water', 'land', 'son', 'king', 'house']
+
+
+def synthetic_book(book, words_per_verse=12, gap_step=1):
+    """
+    Makes valid USFM for a book, with the number of chapters and verses it really has
+    :param string book: book code, e.g. 'psa'
+    :param int words_per_verse:
+    :param int gap_step: keep only every gap_step'th verse, so the verifier reports a gap after each one
+    :return tuple: file name and USFM text
+    """
+    code = book.upper()
+    name = BOOK_NAMES[book]
+    lines = ['\\id {0} Synthetic Benchmark Text'.format(code), '\\ide UTF-8', '\\h {0}'.format(name),
+             '\\toc1 {0}'.format(name), '\\toc2 {0}'.format(name), '\\toc3 {0}'.format(code), '\\mt {0}'.format(name)]
+    chapters = BOOK_CHAPTER_VERSES[book]
+    word_count = 0
+    for chapter in sorted(chapters, key=int):
+        lines += ['\\c {0}'.format(chapter), '\\p']
+        for verse in range(1, int(chapters[chapter]) + 1, gap_step):
+            if verse % 5 == 0:
+                lines += ['\\s5', '\\p']
+            words = []
+            for _ in range(words_per_verse):
+                words.append(WORDS[word_count % len(WORDS)])
+                word_count += 1
+            text = ' '.join(words)
+            if verse % 7 == 0:
+                text += ' \\f + \\ft a footnote for {0}:{1} \\f*'.format(chapter, verse)
+            lines.append('\\v {0} {1}'.format(verse, text))
+    return '{0}-{1}.usfm'.format(BOOK_NUMBERS[book], code), '\n'.join(lines) + '\n'
+
+
+def fixture_books():
+    """
+    Finds the .usfm files in the zip files and folders under tests/
+    :return list: (name, file name, USFM text) for each book
+    """
+    books = []
+    for root, dirs, files in os.walk(TESTS_DIR):
+        dirs.sort()
+        for f in sorted(files):
+            path = os.path.join(root, f)
+            if f.lower().endswith('.usfm'):
+                with io.open(path, encoding='utf-8-sig') as usfm_file:
+                    books.append((os.path.relpath(path, TESTS_DIR), f, usfm_file.read()))
+            elif f.lower().endswith('.zip'):
+                with zipfile.ZipFile(path) as zip_file:
+                    for member in sorted(zip_file.namelist()):
+                        if member.lower().endswith('.usfm'):
+                            text = zip_file.read(member).decode('utf-8-sig')
+                            books.append(('{0}:{1}'.format(os.path.relpath(path, TESTS_DIR), member),
+                                          os.path.basename(member), text))
+    return books
+
+
+def run_stage(stage, file_name, text):
+    """
+    Runs one stage on one book
+    """
+    if stage == 'parse':
+        parseUsfm.parse_string(text)
+    elif stage == 'verify':
+        book_code = os.path.splitext(file_name)[0].split('-')[-1].upper()
+        verifyUSFM.verify_contents_quiet(text.lstrip(), book_code, book_code, 'en')
+    elif stage == 'convert':
+        converter = Usfm2HtmlConverter('', 'ulb')
+        try:
+            with io.open(os.path.join(converter.files_dir, file_name), 'w', encoding='utf-8') as usfm_file:
+                usfm_file.write(text)
+            converter.convert()
+        finally:
+            converter.close()
+
+
+def measure_stage(args):
+    """
+    Measures one stage in a worker process that is only used for this measurement
+    :param tuple args: stage, file name, text, number of repeats
+    :return dict:
+    """
+    stage, file_name, text, repeat = args
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        run_stage(stage, file_name, text)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+    return {'seconds': best, 'peak_kb': peak_kb}
+
+
+def benchmark(books, stages, repeat):
+    """
+    :param list books: (name, file name, text) of each book
+    :param list stages:
+    :param int repeat: times to run each stage, the fastest run is reported
+    :return dict: results by book name and stage
+    """
+    results = {}
+    for name, file_name, text in books:
+        tokens = len(parseUsfm.parse_string(text))
+        results[name] = {}
+        for stage in stages:
+            pool = multiprocessing.Pool(1, maxtasksperchild=1)
+            try:
+                result = pool.apply(measure_stage, ((stage, file_name, text, repeat),))
+            finally:
+                pool.close()
+                pool.join()
+            result['tokens'] = tokens
+            result['tokens_per_second'] = tokens / result['seconds'] if result['seconds'] else 0
+            results[name][stage] = result
+            print_result(name, stage, result)
+    return results
+
+
+def print_result(name, stage, result):
+    print('{0:<50} {1:<8} {2:>9.3f}s {3:>12,.0f} tokens/s {4:>9,} KB'.format(
+        name[-50:], stage, result['seconds'], result['tokens_per_second'], result['peak_kb']))
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results against a saved baseline
+    :return list: descriptions of the regressions found
+    """
+    regressions = []
+    for name in sorted(results):
+        for stage in sorted(results[name]):
+            old = baseline.get(name, {}).get(stage)
+            if not old:
+                continue
+            new = results[name][stage]
+            # ignore differences of less than 10ms, which are mostly timer noise
+            if new['seconds'] > max(old['seconds'] * (1 + threshold), old['seconds'] + 0.01):
+                regressions.append('{0} {1}: {2:.3f}s was {3:.3f}s'.format(name, stage, new['seconds'],
+                                                                           old['seconds']))
+            # small growth is noise from the allocator, so only flag memory over 1MB
+            if new['peak_kb'] > max(old['peak_kb'] * (1 + threshold), old['peak_kb'] + 1024):
+                regressions.append('{0} {1}: {2:,} KB was {3:,} KB'.format(name, stage, new['peak_kb'],
+                                                                           old['peak_kb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', default='rut,psa', help='comma separated codes of synthetic books to generate')
+    parser.add_argument('--words', type=int, default=12, help='words in each verse of the synthetic books')
+    parser.add_argument('--gap-step', type=int, default=1,
+                        help='keep only every nth verse of the synthetic books, to time the missing verse checks')
+    parser.add_argument('--no-synthetic', action='store_true', help='do not generate synthetic books')
+    parser.add_argument('--fixtures', action='store_true', help='also measure the .usfm files under tests/')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to measure')
+    parser.add_argument('--repeat', type=int, default=1, help='times to run each stage, the fastest is reported')
+    parser.add_argument('--save', help='save the results as JSON to this file')
+    parser.add_argument('--compare', help='compare the results against a JSON file saved with --save')
+    parser.add_argument('--threshold', type=float, default=0.2, help='fraction slower that counts as a regression')
+    args = parser.parse_args()
+
+    # the converters log every file
+    App.logger.setLevel(logging.WARNING)
+    logging.getLogger('usfm_tools').setLevel(logging.WARNING)
+    stages = [stage for stage in args.stages.split(',') if stage]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error('Unknown stage: {0}'.format(stage))
+
+    books = []
+    if not args.no_synthetic:
+        for book in args.books.split(','):
+            file_name, text = synthetic_book(book.strip().lower(), args.words, args.gap_step)
+            name = 'synthetic/{0}/{1}w'.format(file_name, args.words)
+            if args.gap_step > 1:
+                name += '/gaps{0}'.format(args.gap_step)
+            books.append((name, file_name, text))
+    if args.fixtures:
+        books += fixture_books()
+
+    results = benchmark(books, stages, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+        print('Saved results to {0}'.format(args.save))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\nRegressions compared to {0}:'.format(args.compare))
+            for regression in regressions:
+                print('  ' + regression)
+            sys.exit(1)
+        print('\nNo regressions compared to {0}'.format(args.compare))
+
+
+if __name__ == '__main__':
+    main()
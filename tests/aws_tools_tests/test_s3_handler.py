@@ -2,9 +2,10 @@ from __future__ import absolute_import, unicode_literals, print_function
 import os
 import shutil
 import tempfile
+import zipfile
 from botocore.exceptions import ClientError
 from unittest import TestCase
-from libraries.aws_tools.s3_handler import S3Handler
+from libraries.aws_tools.s3_handler import S3Handler, map_in_threads
 from moto import mock_s3
 
 
@@ -39,6 +40,78 @@ class S3HandlerTests(TestCase):
     def test_upload_file(self):
         self.handler.upload_file(os.path.join(self.resources_dir, 'test_file.zip'), 'test/me/out.zip')
 
+    def test_upload_file_in_parts(self):
+        handler = S3Handler(bucket_name=self.MOCK_BUCKET_NAME, part_size=1)
+        path = os.path.join(self.temp_dir, 'big.html')
+        block = b'<p>0123456789abcdef</p>' * 65536
+        with open(path, 'wb') as f:
+            for i in range(5):
+                f.write(block)
+        with open(path, 'rb') as f:
+            contents = f.read()
+        handler.upload_file(path, 'test/big.html', cache_time=0)
+        self.assertEqual(self.handler.get_file_contents('test/big.html'), contents)
+        self.assertEqual(self.handler.get_object('test/big.html').content_type, 'text/html')
+        download = os.path.join(self.temp_dir, 'download.html')
+        self.handler.download_file('test/big.html', download)
+        with open(download, 'rb') as f:
+            self.assertEqual(f.read(), contents)
+
+    def test_upload_and_download_dir_in_parallel(self):
+        local = os.path.join(self.temp_dir, 'local')
+        os.makedirs(os.path.join(local, 'sub'))
+        names = ['{0:02d}.html'.format(i) for i in range(20)] + ['sub/a.css']
+        for name in names:
+            with open(os.path.join(local, name), 'w') as f:
+                f.write(name)
+        keys = self.handler.upload_dir(local, 'u/user/repo/', parallel=4, cache_time=0)
+        self.assertEqual(sorted(keys), sorted('u/user/repo/' + name for name in names))
+        self.assertEqual(self.handler.get_object('u/user/repo/sub/a.css').cache_control, 'max-age=0')
+
+        download_dir = os.path.join(self.temp_dir, 'download')
+        self.handler.download_dir('u/user/', download_dir, parallel=4)
+        for name in names:
+            with open(os.path.join(download_dir, 'u', 'user', 'repo', name)) as f:
+                self.assertEqual(f.read(), name)
+
+    def test_map_in_threads(self):
+        self.assertEqual(map_in_threads(lambda x: x * 2, range(10), 3), [x * 2 for x in range(10)])
+        self.assertEqual(map_in_threads(lambda x: x * 2, [1, 2]), [2, 4])
+
+        def fail_on_five(x):
+            if x == 5:
+                raise ValueError('five')
+            return x
+        self.assertRaises(ValueError, map_in_threads, fail_on_five, range(10), 3)
+
+    def test_upload_stream(self):
+        with self.handler.open_upload_stream('test/small.txt', cache_time=0) as stream:
+            stream.write(b'small ')
+            stream.write(b'file')
+            self.assertEqual(stream.tell(), 10)
+        self.assertIsNone(stream.upload_id)
+        self.assertEqual(self.handler.get_file_contents('test/small.txt'), b'small file')
+        s3_object = self.handler.get_object('test/small.txt')
+        self.assertEqual(s3_object.content_type, 'text/plain')
+        self.assertEqual(s3_object.cache_control, 'max-age=0')
+
+    def test_upload_stream_multipart(self):
+        block = b'0123456789abcdef' * 65536  # 1MB
+        with self.handler.open_upload_stream('test/big.zip', part_size=1) as stream:
+            for i in range(11):
+                stream.write(block)
+            self.assertEqual(len(stream.parts), 2)  # each part is at least 5MB
+        self.assertEqual(len(stream.parts), 3)
+        self.assertEqual(self.handler.get_file_contents('test/big.zip'), block * 11)
+
+    def test_upload_stream_aborted(self):
+        with self.assertRaises(IOError):
+            with self.handler.open_upload_stream('test/failed.zip') as stream:
+                stream.write(b'0' * (9 * 1024 * 1024))
+                raise IOError('failed to read the next file')
+        self.assertTrue(stream.closed)
+        self.assertFalse(self.handler.key_exists('test/failed.zip'))
+
     def test_key_exists(self):
         self.handler.put_contents('exists.json', 'this exists')
         self.assertTrue(self.handler.key_exists('exists.json'))
@@ -98,3 +171,153 @@ class S3HandlerTests(TestCase):
         handler.put_contents(key, contents)
         file_contents = handler.get_file_contents(key)
         self.assertEqual(file_contents, contents)
+
+    def test_get_objects(self):
+        for key in ['listed/user/repo/01.html', 'listed/user/repo/build_log.json', 'listed/user/other/build_log.json',
+                    'listed/x.json']:
+            self.handler.put_contents(key, key)
+        objects = self.handler.get_objects(prefix='listed/user/', suffix='build_log.json')
+        self.assertFalse(isinstance(objects, list))  # listed lazily
+        self.assertEqual(sorted(obj.key for obj in objects),
+                         ['listed/user/other/build_log.json', 'listed/user/repo/build_log.json'])
+        self.assertEqual(len(list(self.handler.get_objects(prefix='listed/'))), 4)
+
+    def test_delete_keys(self):
+        keys = ['many/{0:04d}.html'.format(i) for i in range(1001)]
+        map_in_threads(lambda key: self.handler.put_contents(key, ''), keys, threads=8)
+        self.handler.put_contents('many_kept.html', '')
+        failed = self.handler.delete_keys(iter(keys))
+        self.assertEqual(failed, [])
+        self.assertEqual([obj.key for obj in self.handler.get_objects(prefix='many')], ['many_kept.html'])
+
+    def test_delete_prefix(self):
+        for key in ['deleted/user/repo/commit/index.html', 'deleted/user/repo/commit/css/style.css',
+                    'deleted/user/repo/other/a.html']:
+            self.handler.put_contents(key, key)
+        self.assertEqual(self.handler.delete_prefix('deleted/user/repo/commit/'), [])
+        self.assertEqual([obj.key for obj in self.handler.get_objects(prefix='deleted/')],
+                         ['deleted/user/repo/other/a.html'])
+        self.assertEqual(self.handler.delete_prefix('nothing/here/'), [])
+
+    def test_sync_dir(self):
+        local = os.path.join(self.temp_dir, 'local')
+        os.makedirs(os.path.join(local, 'css'))
+        for name in ['01.html', '02.html', 'css/style.css']:
+            with open(os.path.join(local, name), 'w') as f:
+                f.write(name)
+        uploaded, deleted = self.handler.sync_dir(local, 'synced/commit', cache_time=0)
+        self.assertEqual(sorted(uploaded), ['synced/commit/01.html', 'synced/commit/02.html',
+                                            'synced/commit/css/style.css'])
+        self.assertEqual(deleted, [])
+
+        # nothing has changed
+        self.assertEqual(self.handler.sync_dir(local, 'synced/commit', cache_time=0), ([], []))
+
+        with open(os.path.join(local, '02.html'), 'w') as f:
+            f.write('changed')
+        os.remove(os.path.join(local, 'css/style.css'))
+        self.handler.put_contents('synced/commitment/01.html', 'not under the prefix')
+        uploaded, deleted = self.handler.sync_dir(local, 'synced/commit/', parallel=2, delete=True)
+        self.assertEqual(uploaded, ['synced/commit/02.html'])
+        self.assertEqual(deleted, ['synced/commit/css/style.css'])
+        self.assertEqual(self.handler.get_file_contents('synced/commit/02.html'), 'changed')
+        self.assertFalse(self.handler.key_exists('synced/commit/css/style.css'))
+        self.assertTrue(self.handler.key_exists('synced/commitment/01.html'))
+
+    def test_sync_zip(self):
+        zip_file = os.path.join(self.temp_dir, 'converted.zip')
+        big = b'<p>0123456789abcdef</p>' * 65536
+        with zipfile.ZipFile(zip_file, 'w') as zf:
+            zf.writestr('01.html', '01.html')
+            zf.writestr('css/', '')
+            zf.writestr('css/style.css', 'css/style.css')
+            zf.writestr('big.html', big)
+        handler = S3Handler(bucket_name=self.MOCK_BUCKET_NAME, part_size=1)
+        handler.put_contents('zipped/commit/01.html', '01.html')
+        uploaded = handler.sync_zip(zip_file, 'zipped/commit', parallel=2, cache_time=0)
+        self.assertEqual(uploaded, ['zipped/commit/css/style.css', 'zipped/commit/big.html'])
+        self.assertEqual(handler.get_file_contents('zipped/commit/css/style.css'), b'css/style.css')
+        self.assertEqual(handler.get_file_contents('zipped/commit/big.html'), big)
+        self.assertEqual(handler.get_object('zipped/commit/big.html').content_type, 'text/html')
+
+        # nothing has changed
+        self.assertEqual(handler.sync_zip(zip_file, 'zipped/commit/'), [])
+
+    def test_sync_prefix(self):
+        for name in ['01.html', 'css/style.css']:
+            self.handler.put_contents('staged/files/' + name, name)
+        self.handler.put_contents('copied/commit/01.html', '01.html')
+        self.assertEqual(self.handler.sync_prefix('staged/files', 'copied/commit/', parallel=2),
+                         ['copied/commit/css/style.css'])
+        self.assertEqual(self.handler.get_file_contents('copied/commit/css/style.css'), b'css/style.css')
+        self.assertEqual(self.handler.sync_prefix('staged/files/', 'copied/commit'), [])
+
+    def test_put_json(self):
+        data = {'status': 'success', 'log': ['Converted 01.md to 01.html.'], 'title': '\u00e9'}
+        self.handler.put_json('json/build_log.json', data, cache_time=0)
+        self.assertEqual(self.handler.get_json('json/build_log.json'), data)
+        s3_object = self.handler.get_object('json/build_log.json')
+        self.assertEqual(s3_object.content_type, 'application/json')
+        self.assertEqual(s3_object.cache_control, 'max-age=0')
+
+    def test_put_bytes(self):
+        self.handler.put_bytes('bytes/deployed', ' ')
+        self.assertEqual(self.handler.get_file_contents('bytes/deployed'), b' ')
+        self.handler.put_bytes('bytes/index.html', '<p>\u00e9</p>', content_type='text/html')
+        self.assertEqual(self.handler.get_file_contents('bytes/index.html'), '<p>\u00e9</p>'.encode('utf-8'))
+        self.assertEqual(self.handler.get_object('bytes/index.html').content_type, 'text/html')
+
+    def test_cache(self):
+        other_handler = S3Handler(bucket_name=self.MOCK_BUCKET_NAME)  # e.g. another lambda writing to the bucket
+        other_handler.put_json('cached/convert_log.json', {'success': True})
+        self.handler.start_cache()
+
+        # objects read from S3 are read again, since something else may have written them since
+        self.assertEqual(self.handler.get_json('cached/convert_log.json'), {'success': True})
+        other_handler.put_json('cached/convert_log.json', {'success': False})
+        self.assertEqual(self.handler.get_json('cached/convert_log.json'), {'success': False})
+        self.assertEqual(self.handler.get_json('cached/lint_log.json'), {})
+        self.assertFalse(self.handler.key_exists('cached/lint_log.json'))
+        other_handler.put_json('cached/lint_log.json', {'warnings': []})
+        self.assertTrue(self.handler.key_exists('cached/lint_log.json'))
+        self.assertEqual(self.handler.get_json('cached/lint_log.json'), {'warnings': []})
+        self.assertEqual((self.handler.cache.hits, self.handler.cache.misses), (0, 6))
+
+        # objects written through the handler are read back from the cache
+        self.handler.put_json('cached/merged.json', {'status': 'success'})
+        self.assertTrue(self.handler.key_exists('cached/merged.json'))
+        self.assertEqual(self.handler.get_json('cached/merged.json'), {'status': 'success'})
+        self.assertEqual(self.handler.get_file_contents('cached/merged.json', catch_exception=False),
+                         b'{"status": "success"}')
+        self.assertEqual((self.handler.cache.hits, self.handler.cache.misses), (3, 6))
+        self.handler.delete_file('cached/merged.json')
+        self.assertFalse(self.handler.key_exists('cached/merged.json'))
+
+        cache = self.handler.stop_cache()
+        self.assertEqual((cache.hits, cache.misses), (3, 7))
+        self.assertIsNone(self.handler.cache)
+
+    def test_cache_uploads(self):
+        path = os.path.join(self.temp_dir, 'index.html')
+        with open(path, 'w') as f:
+            f.write('<p>uploaded</p>')
+        self.handler.start_cache()
+        self.handler.put_bytes('cached/index.html', '<p>written</p>')
+        self.handler.upload_file(path, 'cached/index.html')
+        self.assertEqual(self.handler.get_file_contents('cached/index.html'), b'<p>uploaded</p>')
+        self.assertEqual((self.handler.cache.hits, self.handler.cache.misses), (0, 1))
+        with self.assertRaises(ClientError):
+            self.handler.get_file_contents('cached/missing.json', catch_exception=False)
+
+    def test_keys_exist(self):
+        for key in ['parts/commit/0/finished', 'parts/commit/0/01-GEN.html', 'parts/commit/2/finished']:
+            self.handler.put_contents(key, '')
+        self.assertEqual(self.handler.list_keys_under('parts/commit/0/'),
+                         {'parts/commit/0/finished', 'parts/commit/0/01-GEN.html'})
+        keys = ['parts/commit/{0}/finished'.format(i) for i in range(3)]
+        self.assertEqual(self.handler.keys_exist(keys), {
+            'parts/commit/0/finished': True,
+            'parts/commit/1/finished': False,
+            'parts/commit/2/finished': True
+        })
+        self.assertEqual(self.handler.keys_exist([]), {})
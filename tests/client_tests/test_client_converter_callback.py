@@ -29,6 +29,7 @@ class TestClientConverterCallback(TestCase):
         App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
         App.cdn_s3_handler().create_bucket()
         App.cdn_s3_handler().upload_file = self.mock_cdn_upload_file
+        App.cdn_s3_handler().put_json = self.mock_cdn_put_json
         App.cdn_s3_handler().get_json = self.mock_cdn_get_json
         App.cdn_s3_handler().key_exists = self.mock_cdn_key_exists
         self.init_items()
@@ -167,6 +168,36 @@ class TestClientConverterCallback(TestCase):
         # then
         self.validate_results(expect_error, results)
 
+    @patch('libraries.client.client_converter_callback.download_file')
+    def test_client_converter_callback_published_files(self, mock_download_file):
+        # given
+        job = TxJob.get('job2')
+        job.cdn_file = 'tx/job/job2.zip'
+        job.update()
+        App.cdn_s3_handler().put_bytes('tx/job/job2/files/01-GEN.html', '<p>Genesis</p>')
+        self.mock_cdn_put_json('tx/job/job2/source_hashes.json', {'conversion': 'abc', 'files': {'01-GEN.usfm': 'def'}})
+        self.save_data_to_s3('tx/job/job2/finished', {})
+        identifier = 'job2'
+        mock_cccb = self.mock_client_converter_callback(identifier, mock_download_file)
+        self.generate_single_job_completed()
+        expect_error = False
+
+        # when
+        results = mock_cccb.process_callback()
+
+        # then
+        self.validate_results(expect_error, results)
+        self.assertFalse(mock_download_file.called)
+        converted_key = 'u/tx-manager-test-data/en-ulb-jud/22f3d09f7a/01-GEN.html'
+        self.assertEqual(App.cdn_s3_handler().get_file_contents(converted_key), b'<p>Genesis</p>')
+        self.assertEqual(App.cdn_s3_handler().get_etags('tx/job/job2/'), {})
+        # the source hashes are kept with the build, but not with the converted files
+        self.assertEqual(self.mock_cdn_get_json('u/tx-manager-test-data/en-ulb-jud/22f3d09f7a/source_hashes.json'), {
+            'conversion': 'abc',
+            'files': {'01-GEN.usfm': 'def'},
+            'output_key': 'u/tx-manager-test-data/en-ulb-jud/22f3d09f7a'
+        })
+
     @patch('libraries.client.client_converter_callback.download_file')
     def test_client_callback_multiple_job_partial(self, mock_download_file):
         # given
@@ -319,6 +350,9 @@ class TestClientConverterCallback(TestCase):
         shutil.copy(project_file, destination_path)
         return
 
+    def mock_cdn_put_json(self, s3_key, data, cache_time=600):
+        file_utils.write_file(os.path.join(self.source_folder, s3_key), data)
+
     def mock_cdn_get_json(self, s3_key):
         source_path = os.path.join(self.source_folder, s3_key)
         json_data = file_utils.load_json_object(source_path)
@@ -2,12 +2,15 @@ from __future__ import absolute_import, unicode_literals, print_function
 import os
 import shutil
 import tempfile
+from datetime import datetime, timedelta
 from unittest import TestCase
 from moto import mock_s3
 from libraries.app.app import App
+from libraries.aws_tools.s3_handler import S3Handler
 from libraries.client.client_linter_callback import ClientLinterCallback
 from libraries.general_tools import file_utils
 from libraries.general_tools.file_utils import unzip
+from libraries.models.completion import TxCompletion
 
 
 @mock_s3
@@ -24,8 +27,10 @@ class TestClientLinterCallback(TestCase):
         App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
         App.cdn_s3_handler().create_bucket()
         App.cdn_s3_handler().upload_file = self.mock_cdn_upload_file
+        App.cdn_s3_handler().put_json = self.mock_cdn_put_json
         App.cdn_s3_handler().get_json = self.mock_cdn_get_json
         App.cdn_s3_handler().key_exists = self.mock_cdn_key_exists
+        App.cdn_s3_handler().keys_exist = self.mock_cdn_keys_exist
 
         try:
             os.makedirs(self.base_temp_dir)
@@ -73,6 +78,22 @@ class TestClientLinterCallback(TestCase):
         # then
         self.validate_results_and_log(results, linter_cb, expected_success, expected_status)
 
+    def test_callbackSimpleJob_merge_wait(self):
+        # given
+        self.unzip_resource_files("id_mat_ulb.zip", convert_finished=True)
+        convert_log_path = self.get_source_path('convert_log.json')
+        convert_log = file_utils.load_json_object(convert_log_path)
+        convert_log['ended_at'] = (datetime.utcnow() - timedelta(seconds=90)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        file_utils.write_file(convert_log_path, convert_log)
+        linter_cb = self.mock_client_linter_callback()
+
+        # when
+        linter_cb.process_callback()
+
+        # then
+        build_log = file_utils.load_json_object(self.get_source_path('build_log.json'))
+        self.assertTrue(90 <= build_log['merge_wait_seconds'] <= 100)
+
     def test_callbackSimpleJob_missing_id(self):
         # given
         self.expected_log_count = 9
@@ -236,6 +257,49 @@ class TestClientLinterCallback(TestCase):
         # then
         self.validate_results_and_log(results, linter_cb, expected_success, expected_status, final=False)
 
+    def test_callbackMultpleJob_tracked_convert_not_finished(self):
+        # given
+        self.results_key = 'u/tx-manager-test-data/en-ulb/22f3d09f7a'
+        self.unzip_resource_files("en_ulb.zip", convert_finished=True)
+        self.lint_callback_data['s3_results_key'] = self.results_key + '/0'
+        self.lint_callback_data['identifier'] = '1234567890/4/0/01-GEN.usfm'
+        TxCompletion.start(self.results_key, 4)
+        self.expected_log_count = 1
+        self.expected_status = None
+        self.expected_all_parts_completed = False
+        self.expected_multipart = True
+        linter_cb = self.mock_client_linter_callback()
+
+        # when
+        results = linter_cb.process_callback()
+
+        # then
+        self.validate_results(results, linter_cb)
+        self.assertFalse(os.path.exists(self.get_source_path('merged.json')))
+
+    def test_callbackMultpleJob_tracked_last_part(self):
+        # given
+        self.results_key = 'u/tx-manager-test-data/en-ulb/22f3d09f7a'
+        self.unzip_resource_files("en_ulb.zip", convert_finished=True)
+        self.lint_callback_data['s3_results_key'] = self.results_key + '/0'
+        self.lint_callback_data['identifier'] = '1234567890/4/0/01-GEN.usfm'
+        TxCompletion.start(self.results_key, 4)
+        for part in ['1', '2', '3']:
+            TxCompletion.finish_stage(self.results_key, part, 'converted')
+            TxCompletion.finish_stage(self.results_key, part, 'linted')
+            TxCompletion.count_merged_part(self.results_key)
+        TxCompletion.finish_stage(self.results_key, '0', 'converted')
+        self.expected_log_count = 36
+        self.expected_multipart = True
+        linter_cb = self.mock_client_linter_callback()
+
+        # when
+        results = linter_cb.process_callback()
+
+        # then
+        self.validate_results_and_log(results, linter_cb, True, 'success', final=False)
+        self.assertTrue(os.path.exists(self.get_source_path('merged.json')))
+
     def test_callbackMultpleJob_first_merged(self):
         # given
         self.results_key = 'u/tx-manager-test-data/en-ulb/22f3d09f7a'
@@ -459,6 +523,9 @@ class TestClientLinterCallback(TestCase):
         shutil.copy(project_file, destination_path)
         return
 
+    def mock_cdn_put_json(self, s3_key, data, cache_time=600):
+        file_utils.write_file(os.path.join(self.source_folder, s3_key), data)
+
     def mock_cdn_get_json(self, s3_key):
         source_path = os.path.join(self.source_folder, s3_key)
         json_data = file_utils.load_json_object(source_path)
@@ -473,3 +540,57 @@ class TestClientLinterCallback(TestCase):
         source_path = os.path.join(self.source_folder, key)
         exists = os.path.exists(source_path)
         return exists
+
+    def mock_cdn_keys_exist(self, keys):
+        return dict((key, self.mock_cdn_key_exists(key)) for key in keys)
+
+
+@mock_s3
+class TestClientLinterCallbackCache(TestCase):
+
+    def setUp(self):
+        """Runs before each test."""
+        App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
+        App.cdn_s3_handler().create_bucket()
+        App.cdn_s3_handler().start_cache()
+        self.other_handler = S3Handler(bucket_name=App.cdn_bucket)  # e.g. the converter or another linter
+
+    def tearDown(self):
+        """Runs after each test."""
+        App.cdn_s3_handler().stop_cache()
+        App.db_close()
+
+    def test_get_results_written_after_first_read(self):
+        key = 'u/cache_results/0'
+        self.assertEqual(ClientLinterCallback.get_results(key, 'lint_log.json'), {})
+        self.other_handler.put_json(key + '/lint_log.json', {'success': True})
+        self.assertEqual(ClientLinterCallback.get_results(key, 'lint_log.json'), {'success': True})
+        self.other_handler.put_json(key + '/lint_log.json', {'success': False})
+        self.assertEqual(ClientLinterCallback.get_results(key, 'lint_log.json'), {'success': False})
+
+    def test_is_convert_finished_written_after_first_read(self):
+        key = 'u/cache_finished/0'
+        self.assertEqual(App.cdn_s3_handler().keys_exist([key + '/finished']), {key + '/finished': False})
+        self.assertFalse(ClientLinterCallback.is_convert_finished(key))
+        self.other_handler.put_contents(key + '/finished', 'finished')
+        self.assertTrue(ClientLinterCallback.is_convert_finished(key))
+
+    def test_get_results_written_by_this_callback(self):
+        key = 'u/cache_own/0'
+        ClientLinterCallback.upload_build_log({'success': True}, 'lint_log.json', None, key)
+        self.assertEqual(ClientLinterCallback.get_results(key, 'lint_log.json'), {'success': True})
+        self.assertEqual(ClientLinterCallback.get_results(key, 'lint_log.json'), {'success': True})
+        self.assertEqual(ClientLinterCallback.get_results(key, 'convert_log.json'), {})
+        cache = App.cdn_s3_handler().cache
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_get_parts_results(self):
+        key = 'u/cache_parts'
+        part_keys = ['{0}/{1}'.format(key, i) for i in range(0, 10)]
+        for i, part_key in enumerate(part_keys[:-1]):
+            self.other_handler.put_json(part_key + '/merged.json', {'part': i})
+        results = ClientLinterCallback.get_parts_results(part_keys, 'merged.json')
+        self.assertEqual(sorted(results), sorted(part_keys))
+        for i, part_key in enumerate(part_keys[:-1]):
+            self.assertEqual(results[part_key], {'part': i})
+        self.assertEqual(results[part_keys[-1]], {})
@@ -7,13 +7,14 @@ import unittest
 import mock
 from datetime import datetime
 from libraries.client.client_webhook import ClientWebhook
-from libraries.general_tools.file_utils import read_file, load_json_object
+from libraries.general_tools.file_utils import read_file, load_json_object, write_file
 from libraries.models.manifest import TxManifest
 from moto import mock_s3
 from glob import glob
 from libraries.app.app import App
 from libraries.general_tools.file_utils import json_serial
 from libraries.manager.manager import TxManager
+from libraries.models.completion import TxCompletion
 from libraries.models.job import TxJob
 from tests.client_tests import mock_utils
 
@@ -43,6 +44,7 @@ class ClientWebhookTest(unittest.TestCase):
         App.cdn_s3_handler().create_bucket()
         App.pre_convert_s3_handler().create_bucket()
         App.cdn_s3_handler().upload_file = self.mock_cdn_upload_file
+        App.cdn_s3_handler().put_json = self.mock_cdn_put_json
         App.cdn_s3_handler().get_json = self.mock_cdn_get_json
         App.pre_convert_s3_handler().upload_file = self.mock_s3_upload_file
 
@@ -53,6 +55,7 @@ class ClientWebhookTest(unittest.TestCase):
 
         self.temp_dir = tempfile.mkdtemp(dir=self.base_temp_dir, prefix='webhookTest_')
         self.job_converter_count = 0
+        self.converter_payloads = []
         self.job_linter_count = 0
         self.uploaded_files = []
 
@@ -186,6 +189,36 @@ class ClientWebhookTest(unittest.TestCase):
         # then
         self.validateResults2(results, expected_job_count, expected_error_count, expected_warnings_count)
 
+    @mock.patch('libraries.client.client_webhook.download_file')
+    def test_process_webhook_multiple_books_previous_build(self, mock_download_file):
+        # given
+        client_web_hook = self.setup_client_webhook_mock('en-ulb', mock_download_file)
+        previous_key = 'u/tx-manager-test-data/en-ulb/aaaaaaaaaa'
+        previous_files = {
+            'u/tx-manager-test-data/en-ulb/project.json': {
+                'commits': [{'id': 'aaaaaaaaaa', 'status': 'success', 'success': True}]
+            },
+            # the previous build didn't have Leviticus, so Deuteronomy was part 2
+            previous_key + '/build_log.json': {
+                'build_logs': [{'book': '01-GEN.usfm', 'part': '0'}, {'book': '02-EXO.usfm', 'part': '1'},
+                               {'book': '05-DEU.usfm', 'part': '2'}]
+            }
+        }
+        App.cdn_s3_handler().get_json = lambda key: previous_files.get(key, {})
+
+        # when
+        client_web_hook.process_webhook()
+
+        # then
+        previous_build_keys = dict((payload['identifier'].split('/')[3], payload.get('previous_build_key'))
+                                   for payload in self.converter_payloads)
+        self.assertEqual(previous_build_keys, {
+            '01-GEN.usfm': previous_key + '/0',
+            '02-EXO.usfm': previous_key + '/1',
+            '03-LEV.usfm': None,
+            '05-DEU.usfm': previous_key + '/2'
+        })
+
     @mock.patch('libraries.client.client_webhook.download_file')
     def test_process_webhook_multiple_books_warnings(self, mock_download_file):
         # given
@@ -214,6 +247,19 @@ class ClientWebhookTest(unittest.TestCase):
         self.assertIsNotNone(linter)
         self.assertEqual(linter.name, 'obs')
 
+    def test_get_previous_build_key(self):
+        commits = [
+            {'id': 'aaaaaaaaaa', 'status': 'success', 'success': True},
+            {'id': 'bbbbbbbbbb', 'status': 'warnings', 'success': True},
+            {'id': 'cccccccccc', 'status': 'failed', 'success': False},
+            {'id': 'dddddddddd', 'status': 'started', 'success': False},
+        ]
+        App.cdn_s3_handler().get_json = lambda key: {'commits': commits} if key == 'u/user/repo/project.json' else {}
+        cw = ClientWebhook()
+        self.assertEqual(cw.get_previous_build_key('dddddddddd', 'repo', 'user'), 'u/user/repo/bbbbbbbbbb')
+        self.assertEqual(cw.get_previous_build_key('bbbbbbbbbb', 'repo', 'user'), 'u/user/repo/aaaaaaaaaa')
+        self.assertIsNone(cw.get_previous_build_key('aaaaaaaaaa', 'other', 'user'))
+
     #
     # helpers
     #
@@ -235,6 +281,9 @@ class ClientWebhookTest(unittest.TestCase):
         self.assertEqual(len(results['errors']), expected_error_count)
         self.assertEqual(multiple_job, 'multiple' in results)
         self.assertTrue(len(self.get_project_json()) >= 4)
+        # each part that is converted and linted is tracked until both are finished
+        tracked_parts = TxCompletion.query().count()
+        self.assertEqual(tracked_parts, expected_job_count if self.job_linter_count else 0)
 
     def get_build_log_json(self):
         return self.read_last_uploaded_json_file('build_log.json')
@@ -279,6 +328,7 @@ class ClientWebhookTest(unittest.TestCase):
 
     def mock_send_payload_to_converter(self, payload, converter):
         self.job_converter_count += 1
+        self.converter_payloads.append(payload)
         return True
 
     def mock_send_payload_to_linter(self, payload, linter):
@@ -293,6 +343,12 @@ class ClientWebhookTest(unittest.TestCase):
         bucket_name = App.cdn_s3_handler().bucket.name
         return self.upload_file(bucket_name, project_file, s3_key)
 
+    def mock_cdn_put_json(self, s3_key, data, cache_time=600):
+        bucket_name = App.cdn_s3_handler().bucket.name
+        with tempfile.NamedTemporaryFile(dir=ClientWebhookTest.base_temp_dir, delete=False) as tmp:
+            write_file(tmp.name, data)
+            self.uploaded_files.append({'file': tmp.name, 'key': bucket_name + '/' + s3_key})
+
     def upload_file(self, bucket_name, project_file, s3_key):
         with tempfile.NamedTemporaryFile(dir=ClientWebhookTest.base_temp_dir, delete=False) as tmp:
             shutil.copyfile(project_file, tmp.name)
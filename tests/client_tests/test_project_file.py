@@ -0,0 +1,74 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from unittest import TestCase
+from moto import mock_s3
+from libraries.app.app import App
+from libraries.client.project_file import save_project_commit
+from libraries.models.project_commit import TxProjectCommit
+
+
+@mock_s3
+class ProjectFileTests(TestCase):
+    project_json_key = 'u/user1/repo1/project.json'
+    repo_url = 'https://git.door43.org/user1/repo1'
+
+    def setUp(self):
+        """Runs before each test."""
+        App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
+        App.cdn_s3_handler().create_bucket()
+
+    def tearDown(self):
+        App.db_close()
+
+    def make_commit(self, commit_id):
+        return {'id': commit_id, 'created_at': '2017-10-20T17:03:55Z', 'status': 'success', 'success': True,
+                'started_at': None, 'ended_at': None}
+
+    def test_save_project_commit(self):
+        # given
+        old_project_json = {'user': 'user1', 'repo': 'repo1', 'repo_url': self.repo_url,
+                            'commits': [self.make_commit('commit1'), self.make_commit('commit2')]}
+        App.cdn_s3_handler().put_json(self.project_json_key, old_project_json)
+
+        # when
+        save_project_commit('user1', 'repo1', self.repo_url, self.make_commit('commit1'))
+        save_project_commit('user1', 'repo1', self.repo_url, self.make_commit('commit3'))
+
+        # then
+        project_json = App.cdn_s3_handler().get_json(self.project_json_key)
+        self.assertEqual(project_json['repo_url'], self.repo_url)
+        self.assertEqual([c['id'] for c in project_json['commits']], ['commit2', 'commit1', 'commit3'])
+
+    def test_save_project_commit_keeps_other_keys(self):
+        # given
+        old_project_json = {'user': 'old_user', 'repo': 'repo1', 'repo_url': 'https://old.org/user1/repo1',
+                            'commits': [self.make_commit('commit1')], 'title': 'Repo 1'}
+        App.cdn_s3_handler().put_json(self.project_json_key, old_project_json)
+
+        # when
+        save_project_commit('user1', 'repo1', self.repo_url, self.make_commit('commit2'))
+
+        # then
+        project_json = App.cdn_s3_handler().get_json(self.project_json_key)
+        self.assertEqual(project_json['title'], 'Repo 1')
+        self.assertEqual(project_json['user'], 'user1')
+        self.assertEqual(project_json['repo_url'], self.repo_url)
+        self.assertEqual([c['id'] for c in project_json['commits']], ['commit1', 'commit2'])
+
+    def test_save_project_commit_saved_meanwhile(self):
+        # given
+        put_json = App.cdn_s3_handler().put_json
+        other_commits = [self.make_commit('commit2')]
+
+        def put_json_while_another_build_saves(key, obj, cache_time=600):
+            put_json(key, obj, cache_time)
+            if other_commits:
+                TxProjectCommit.save('u/user1/repo1', other_commits.pop())
+
+        App.cdn_s3_handler().put_json = put_json_while_another_build_saves
+
+        # when
+        save_project_commit('user1', 'repo1', self.repo_url, self.make_commit('commit1'))
+
+        # then
+        project_json = App.cdn_s3_handler().get_json(self.project_json_key)
+        self.assertEqual([c['id'] for c in project_json['commits']], ['commit1', 'commit2'])
@@ -1,12 +1,18 @@
 from __future__ import absolute_import, unicode_literals, print_function
+import io
 import os
+import string
 import tempfile
 import unittest
 import shutil
+import zipfile
 from contextlib import closing
 from mock import mock
+from moto import mock_s3
 from requests import Response
-from libraries.converters.converter import Converter
+from libraries.app.app import App
+from libraries.converters import converter
+from libraries.converters.converter import Converter, get_template
 from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
 from libraries.general_tools.file_utils import remove_tree
 
@@ -28,6 +34,9 @@ class MyConverter(Converter):
     def upload_archive(self):
         return self.upload_return
 
+    def upload_output_files(self):
+        return self.upload_return
+
 
 class TestConverter(unittest.TestCase):
 
@@ -35,6 +44,7 @@ class TestConverter(unittest.TestCase):
 
     def setUp(self):
         """Runs before each test."""
+        App(prefix='{0}-'.format(self._testMethodName))
         self.temp_dir = tempfile.mkdtemp(prefix='TestConverter')
         self.zip_file = os.path.join(self.resources_dir, '51-PHP.zip')
         self.zip_file = self.make_duplicate_zip_that_can_be_deleted(self.zip_file)
@@ -52,6 +62,50 @@ class TestConverter(unittest.TestCase):
         # delete temp files
         remove_tree(self.temp_dir)
 
+    def test_get_template(self):
+        compiled = []
+
+        def compile_template(template, title):
+            compiled.append(title)
+            return template.replace('$title', title)
+
+        self.assertIn('<title>$title</title>', get_template())
+        self.assertIn('<title>ULB</title>', get_template(compile_template, key='ULB'))
+        self.assertIn('<title>ULB</title>', get_template(compile_template, key='ULB'))
+        self.assertIn('<title>UDB</title>', get_template(compile_template, key='UDB'))
+        self.assertEqual(compiled, ['ULB', 'UDB'])
+
+    def test_template_read_once(self):
+        get_template()
+        with mock.patch('libraries.converters.converter.open', create=True) as mock_open:
+            html_template = get_template(string.Template)
+            self.assertIs(get_template(string.Template), html_template)
+        self.assertFalse(mock_open.called)
+        self.assertIn(('template.html', None, None), converter.template_cache)
+
+    @mock_s3
+    def test_upload_archive_to_cdn(self):
+        App.cdn_s3_handler().create_bucket()
+        with closing(Usfm2HtmlConverter('', 'udb', 'tx/job/1234567890.zip', compression=zipfile.ZIP_DEFLATED)) as tx:
+            tx.input_zip_file = self.zip_file
+            results = tx.run()
+        self.assertTrue(results['success'])
+        s3_object = App.cdn_s3_handler().get_object('tx/job/1234567890.zip')
+        self.assertEqual(s3_object.content_type, 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(s3_object.get()['Body'].read())) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertIn('51-PHP.html', zf.namelist())
+            self.assertEqual(zf.getinfo('51-PHP.html').compress_type, zipfile.ZIP_DEFLATED)
+            # the files are published next to the zip as well
+            self.assertEqual(App.cdn_s3_handler().get_file_contents('tx/job/1234567890/files/51-PHP.html'),
+                             zf.read('51-PHP.html'))
+        self.assertTrue(App.cdn_s3_handler().key_exists('tx/job/1234567890/finished'))
+        # and the source hashes, which aren't part of the output
+        self.assertNotIn(Converter.SOURCE_HASHES_FILE, zf.namelist())
+        source_hashes = App.cdn_s3_handler().get_json('tx/job/1234567890/' + Converter.SOURCE_HASHES_FILE)
+        self.assertEqual(source_hashes, tx.source_hashes)
+        self.assertTrue(source_hashes['files'])
+
     @mock.patch('requests.post')
     def test_convert_callback_success(self, mock_request_post):
         # given
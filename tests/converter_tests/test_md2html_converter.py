@@ -7,11 +7,17 @@ import shutil
 from contextlib import closing
 from libraries.client.preprocessors import TqPreprocessor
 from libraries.client.preprocessors import TnPreprocessor
-from libraries.converters.md2html_converter import Md2HtmlConverter
-from libraries.general_tools.file_utils import remove_tree, unzip, remove
+from libraries.converters.md2html_converter import Md2HtmlConverter, move_header_anchors, render_markdown
+from libraries.general_tools.file_utils import remove_tree, unzip, remove, write_file, add_contents_to_zip
 from libraries.door43_tools.bible_books import BOOK_NUMBERS
 from bs4 import BeautifulSoup
 from libraries.app.app import App
+from libraries.converters import md2html_converter
+from libraries.converters.converter import Converter
+from mock import patch
+from moto import mock_s3
+import markdown
+import markdown2
 
 
 class TestMd2HtmlConverter(unittest.TestCase):
@@ -229,10 +235,94 @@ class TestMd2HtmlConverter(unittest.TestCase):
             self.assertTrue(os.path.isfile(file_path), 'file not found: {0}'
                             .format(file_to_verify))
 
+    def test_move_header_anchors(self):
+        self.assertEqual(move_header_anchors('<h1><a id="verbs"/>Verbs</h1>'),
+                         '<h1 id="verbs" class="section-header">Verbs</h1>')
+        self.assertEqual(move_header_anchors('<h2 class="x"><a id="a">in</a> out</h2>\n<p><a id="p"/>x</p>'),
+                         '<h2 class="x section-header" id="a"> out</h2>\n<p><a id="p"/>x</p>')
+        self.assertEqual(move_header_anchors('<h3 id="old"><a href="#x">link</a><a id="q"/>z</h3>'),
+                         '<h3 id="q" class="section-header"><a href="#x">link</a>z</h3>')
+
+    def test_move_header_anchors_only_directly_in_header(self):
+        html = '<h1><strong><a id="n"/>x</strong></h1><h5>no anchor <br/> &amp; text</h5>'
+        self.assertEqual(move_header_anchors(html), html)
+
+    def test_obs_in_pool(self):
+        self.doTransformObs('en-obs.zip')
+        self.out_dir = tempfile.mkdtemp(prefix='obs_')
+        unzip(self.out_zip_file, self.out_dir)
+        remove(self.out_zip_file)
+        expected_info = self.return_val['info']
+        pool_zip_file = tempfile.mktemp(prefix="en-obs-", suffix=".zip")
+        pool_dir = tempfile.mkdtemp(prefix='obs_pool_')
+        try:
+            zip_file_path = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir, 'en-obs.zip'))
+            with closing(Md2HtmlConverter('', 'obs', pool_zip_file, processes=2)) as tx:
+                tx.input_zip_file = zip_file_path
+                results = tx.run()
+            unzip(pool_zip_file, pool_dir)
+            self.assertEqual(results['info'], expected_info)
+            self.assertEqual(sorted(os.listdir(pool_dir)), sorted(os.listdir(self.out_dir)))
+            for file_name in os.listdir(self.out_dir):
+                self.assertEqual(self.readBytes(os.path.join(pool_dir, file_name)),
+                                 self.readBytes(os.path.join(self.out_dir, file_name)), file_name)
+        finally:
+            remove(pool_zip_file)
+            remove_tree(pool_dir)
+
+    def test_render_markdown_same_as_new_instance(self):
+        md = '# Title\n\nSome *text* with a [link][ref].\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n[ref]: http://a.org\n'
+        for _ in range(2):
+            self.assertEqual(render_markdown(md), markdown.markdown(md))
+            self.assertEqual(render_markdown(md, 'markdown2'),
+                             markdown2.markdown(md, extras=['markdown-in-html', 'tables']))
+
+    def test_render_markdown_resets_between_files(self):
+        render_markdown('[ref]: http://a.org\n')
+        render_markdown('[ref]: http://a.org\n', 'markdown2')
+        self.assertNotIn('http://a.org', render_markdown('a [link][ref]'))
+        self.assertNotIn('http://a.org', render_markdown('a [link][ref]', 'markdown2'))
+
+    @mock_s3
+    def test_reuse_previous_build(self):
+        App.cdn_s3_handler().create_bucket()
+        self.out_dir = tempfile.mkdtemp(prefix='tw_')
+        md_dir = os.path.join(self.out_dir, 'md')
+        for name in ['god', 'love', 'faith']:
+            write_file(os.path.join(md_dir, name + '.md'), '# {0}\n\nAbout *{0}*.\n'.format(name))
+        zip_file_path = os.path.join(self.out_dir, 'previous.zip')
+        add_contents_to_zip(zip_file_path, md_dir)
+        results, outputs = self.convertZip(zip_file_path)
+        for file_name, contents in outputs.items():
+            App.cdn_s3_handler().put_contents('u/user/repo/prev/{0}'.format(file_name), contents)
+        App.cdn_s3_handler().put_json('u/user/repo/prev/' + Converter.SOURCE_HASHES_FILE, self.source_hashes)
+
+        write_file(os.path.join(md_dir, 'love.md'), '# love\n\nChanged.\n')
+        zip_file_path = os.path.join(self.out_dir, 'changed.zip')
+        add_contents_to_zip(zip_file_path, md_dir)
+        expected_results, expected_outputs = self.convertZip(zip_file_path)
+        with patch('libraries.converters.md2html_converter.render_markdown',
+                   wraps=md2html_converter.render_markdown) as mock_render:
+            results, outputs = self.convertZip(zip_file_path, 'u/user/repo/prev')
+        self.assertEqual(mock_render.call_count, 1)
+        self.assertEqual(outputs, expected_outputs)
+        self.assertEqual(results['info'], expected_results['info'])
+        self.assertIn('Changed.', outputs['love.html'])
+
     #
     # helpers
     #
 
+    def convertZip(self, zip_file_path, previous_build_key=None):
+        out_zip_file = tempfile.mktemp(prefix="tw_", suffix=".zip", dir=self.out_dir)
+        with closing(Md2HtmlConverter('', 'tw', out_zip_file)) as tx:
+            tx.input_zip_file = zip_file_path
+            results = tx.run(previous_build_key=previous_build_key)
+            self.source_hashes = tx.source_hashes
+        out_dir = tempfile.mkdtemp(prefix='tw_', dir=self.out_dir)
+        unzip(out_zip_file, out_dir)
+        return results, dict((f, self.readBytes(os.path.join(out_dir, f))) for f in os.listdir(out_dir))
+
     def doTransformObs(self, file_name):
         zip_file_path = os.path.join(self.resources_dir, file_name)
         zip_file_path = self.make_duplicate_zip_that_can_be_deleted(zip_file_path)
@@ -349,6 +439,10 @@ class TestMd2HtmlConverter(unittest.TestCase):
 
         return content
 
+    def readBytes(self, file_path):
+        with open(file_path, 'rb') as f:
+            return f.read()
+
     def make_duplicate_zip_that_can_be_deleted(self, zip_file):
         in_zip_file = tempfile.mktemp(prefix="test_data", suffix=".zip")
         shutil.copy(zip_file, in_zip_file)
@@ -5,8 +5,13 @@ import tempfile
 import unittest
 import shutil
 from contextlib import closing
-from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
-from libraries.general_tools.file_utils import remove_tree, unzip, remove
+from mock import patch
+from moto import mock_s3
+from libraries.converters import usfm2html_converter
+from libraries.converters.converter import Converter
+from libraries.converters.usfm2html_converter import Usfm2HtmlConverter, render_usfm_file
+from libraries.general_tools.file_utils import remove_tree, unzip, remove, write_file, read_file, add_contents_to_zip
+from usfm_tools.transform import UsfmTransform
 from libraries.app.app import App
 
 
@@ -180,6 +185,117 @@ class TestUsfmHtmlConverter(unittest.TestCase):
         files_to_verify = ['41-MAT.html']
         self.verify_files(files_to_verify)
 
+    def test_run_in_pool(self):
+        """Runs the converter in worker processes and verifies the output is the same as when run in one process"""
+        outputs = []
+        logs = []
+        for processes in [1, 3]:
+            zip_file = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir,
+                                                                                'eight_bible_books.zip'))
+            out_zip_file = tempfile.mktemp('.zip', dir=self.temp_dir)
+            with closing(Usfm2HtmlConverter('', 'udb', out_zip_file, processes=processes)) as tx:
+                tx.input_zip_file = zip_file
+                results = tx.run()
+            self.assertTrue(results['success'])
+            out_dir = tempfile.mkdtemp(prefix='udb_', dir=self.temp_dir)
+            unzip(out_zip_file, out_dir)
+            outputs.append(dict((f, read_file(os.path.join(out_dir, f))) for f in os.listdir(out_dir)))
+            logs.append(results['info'])
+        self.assertEqual(len(outputs[0]), 8)
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(logs[1], logs[0])
+        self.assertEqual(len(logs[0]), 8 * 2 + 1)
+
+    @mock_s3
+    def test_reuse_previous_build(self):
+        """Converts only the changed book and verifies the output is the same as when converting all the books"""
+        App.cdn_s3_handler().create_bucket()
+        previous_build_key = 'u/user/repo/prev'
+        zip_file = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir,
+                                                                            'eight_bible_books.zip'))
+        results, outputs = self.convert_zip(zip_file)
+        self.assertTrue(results['success'])
+        self.assertNotIn(Converter.SOURCE_HASHES_FILE, outputs)
+        for file_name, html in outputs.items():
+            App.cdn_s3_handler().put_contents('{0}/{1}'.format(previous_build_key, file_name), html)
+        App.cdn_s3_handler().put_json('{0}/{1}'.format(previous_build_key, Converter.SOURCE_HASHES_FILE),
+                                      self.source_hashes)
+
+        usfm_dir = os.path.join(self.temp_dir, 'changed')
+        unzip(zip_file, usfm_dir)
+        jude = os.path.join(usfm_dir, '66-JUD.usfm')
+        write_file(jude, read_file(jude).replace('\\v 25 ', '\\v 25 Amen. '))
+        changed_zip_file = os.path.join(self.temp_dir, 'changed.zip')
+        add_contents_to_zip(changed_zip_file, usfm_dir)
+
+        expected_results, expected_outputs = self.convert_zip(changed_zip_file)
+        with patch('libraries.converters.usfm2html_converter.render_usfm_file',
+                   wraps=usfm2html_converter.render_usfm_file) as mock_render:
+            results, outputs = self.convert_zip(changed_zip_file, previous_build_key)
+        self.assertEqual([os.path.basename(args[0]) for args, kwargs in mock_render.call_args_list], ['66-JUD.usfm'])
+        self.assertEqual(outputs, expected_outputs)
+        self.assertEqual(results['info'], expected_results['info'])
+        self.assertIn('Amen. ', outputs['66-JUD.html'])
+
+    @mock_s3
+    def test_reuse_previous_build_part(self):
+        """The hashes of a book of a build in parts are under the key of its part, and its output next to the others"""
+        App.cdn_s3_handler().create_bucket()
+        zip_file = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir, '51-PHP.zip'))
+        expected_results, expected_outputs = self.convert_zip(zip_file)
+        for file_name, html in expected_outputs.items():
+            App.cdn_s3_handler().put_contents('u/user/repo/prev/{0}'.format(file_name), html)
+        self.source_hashes['output_key'] = 'u/user/repo/prev'
+        App.cdn_s3_handler().put_json('u/user/repo/prev/2/' + Converter.SOURCE_HASHES_FILE, self.source_hashes)
+        with patch('libraries.converters.usfm2html_converter.render_usfm_file',
+                   wraps=usfm2html_converter.render_usfm_file) as mock_render:
+            results, outputs = self.convert_zip(zip_file, 'u/user/repo/prev/2')
+            self.assertFalse(mock_render.called)
+            self.convert_zip(zip_file, 'u/user/repo/prev')  # nothing was built for the whole commit
+            self.assertTrue(mock_render.called)
+        self.assertEqual(outputs, expected_outputs)
+
+    @mock_s3
+    def test_reuse_previous_build_converted_differently(self):
+        App.cdn_s3_handler().create_bucket()
+        zip_file = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir, '51-PHP.zip'))
+        results, outputs = self.convert_zip(zip_file)
+        for file_name, html in outputs.items():
+            App.cdn_s3_handler().put_contents('u/user/repo/prev/{0}'.format(file_name), html)
+        App.cdn_s3_handler().put_json('u/user/repo/prev/' + Converter.SOURCE_HASHES_FILE, self.source_hashes)
+        with patch('libraries.converters.usfm2html_converter.render_usfm_file',
+                   wraps=usfm2html_converter.render_usfm_file) as mock_render:
+            self.convert_zip(zip_file, 'u/user/repo/prev', resource='ulb')  # a different title
+        self.assertEqual(mock_render.call_count, 1)
+
+    def test_render_usfm_file_same_as_transform(self):
+        usfm_dir = os.path.join(self.temp_dir, 'usfm')
+        unzip(os.path.join(self.resources_dir, '51-PHP.zip'), usfm_dir)
+        file_name = [f for f in os.listdir(usfm_dir) if f.endswith('.usfm')][0]
+        UsfmTransform.buildSingleHtml(usfm_dir, self.temp_dir, 'expected')
+        expected = read_file(os.path.join(self.temp_dir, 'expected.html'))
+        self.assertEqual(render_usfm_file(os.path.join(usfm_dir, file_name)), expected)
+
+    def test_render_usfm_file_non_ascii_name(self):
+        file_name = os.path.join(self.temp_dir, '01-GEN.usfm')
+        write_file(file_name, '\\id GEN\n\\h G\u00e9nesis\n\\c 1\n\\p\n\\v 1 En el principio\n')
+        html = render_usfm_file(file_name)
+        self.assertIn('<title>G\u00e9nesis</title>', html)
+        self.assertIn('En el principio', html)
+
+    def test_not_usfm_book(self):
+        out_zip_file = tempfile.mktemp('.zip', dir=self.temp_dir)
+        with closing(Usfm2HtmlConverter('', 'udb', out_zip_file)) as tx:
+            write_file(os.path.join(tx.files_dir, '01-GEN.usfm'), 'not a book\n')
+            write_file(os.path.join(tx.files_dir, '02-EXO.usfm'), '\\id EXO\n\\h Exodus\n\\c 1\n\\p\n\\v 1 a\n')
+            tx.convert()
+            gen_html = read_file(os.path.join(tx.output_dir, '01-GEN.html'))
+            exo_html = read_file(os.path.join(tx.output_dir, '02-EXO.html'))
+        self.assertIn('ERROR! NOT CONVERTED!', gen_html)
+        self.assertNotIn('ERROR! NOT CONVERTED!', exo_html)
+        self.assertIn('<title>UDB</title>', exo_html)
+        self.assertIn('id="002-ch-001-v-001"', exo_html)
+
     def test_bad_source(self):
         """This tests giving a bad source to the converter"""
         with closing(Usfm2HtmlConverter('bad_source', 'bad_resource')) as tx:
@@ -191,6 +307,16 @@ class TestUsfmHtmlConverter(unittest.TestCase):
     # helpers
     #
 
+    def convert_zip(self, zip_file, previous_build_key=None, resource='udb'):
+        out_zip_file = tempfile.mktemp('.zip', dir=self.temp_dir)
+        with closing(Usfm2HtmlConverter('', resource, out_zip_file)) as tx:
+            tx.input_zip_file = zip_file
+            results = tx.run(previous_build_key=previous_build_key)
+            self.source_hashes = tx.source_hashes
+        out_dir = tempfile.mkdtemp(prefix='udb_', dir=self.temp_dir)
+        unzip(out_zip_file, out_dir)
+        return results, dict((f, read_file(os.path.join(out_dir, f))) for f in os.listdir(out_dir))
+
     def verify_files(self, files_to_verify):
         for file_to_verify in files_to_verify:
             file_name = os.path.join(self.out_dir, file_to_verify)
@@ -127,6 +127,8 @@ class ProjectDeployerTests(unittest.TestCase):
         build_log_key = '{0}/{1}/build_log.json'.format(self.project_key, part)
         output_file = '02-EXO.html'
         output_key = '{0}/{1}'.format(self.project_key, output_file)
+        source_hashes_key = '{0}/{1}/source_hashes.json'.format(self.project_key, part)
+        App.cdn_s3_handler().put_json(source_hashes_key, {'conversion': 'abc', 'files': {}})
         expect_success = True
 
         # when
@@ -134,6 +136,10 @@ class ProjectDeployerTests(unittest.TestCase):
 
         # then
         self.validate_bible_results(ret, build_log_key, expect_success, output_key)
+        # the source hashes stay with the part, and aren't deployed
+        self.assertTrue(App.cdn_s3_handler().key_exists(source_hashes_key))
+        self.assertFalse(App.cdn_s3_handler().key_exists('{0}/source_hashes.json'.format(self.project_key)))
+        self.assertEqual(App.door43_s3_handler().get_etags('{0}/source_hashes.json'.format(self.project_key)), {})
 
     def test_bible_deploy_part_revision_to_door43_exception(self):
         # given
@@ -1,4 +1,5 @@
 from __future__ import absolute_import, unicode_literals, print_function
+import hashlib
 import json
 import os.path
 import shutil
@@ -59,6 +60,40 @@ class FileUtilsTests(unittest.TestCase):
             with zf.open(os.path.relpath(tmp_file, self.tmp_dir2), "r") as f:
                 self.assertEqual(f.read().decode("ascii"), "hello world")
 
+    def test_add_contents_to_zip_stream(self):
+        self.tmp_dir1 = tempfile.mkdtemp()
+        zip_file = os.path.join(self.tmp_dir1, 'foo.zip')
+
+        self.tmp_dir2 = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp_dir2, 'sub'))
+        contents = {'foo.txt': 'hello world', os.path.join('sub', 'bar.html'): '<p>hello</p>' * 100}
+        for name, text in contents.items():
+            with open(os.path.join(self.tmp_dir2, name), "w") as tmpf:
+                tmpf.write(text)
+
+        class UnseekableStream(object):
+            def __init__(self, f):
+                self.f = f
+
+            def write(self, data):
+                self.f.write(data)
+
+            def tell(self):
+                return self.f.tell()
+
+            def flush(self):
+                pass
+
+        with open(zip_file, 'wb') as f:
+            file_utils.add_contents_to_zip_stream(UnseekableStream(f), self.tmp_dir2, zipfile.ZIP_DEFLATED)
+
+        with zipfile.ZipFile(zip_file, "r") as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(sorted(zf.namelist()), ['foo.txt', 'sub/bar.html'])
+            self.assertEqual(zf.getinfo('sub/bar.html').compress_type, zipfile.ZIP_DEFLATED)
+            for name, text in contents.items():
+                self.assertEqual(zf.read(name.replace(os.path.sep, '/')).decode("ascii"), text)
+
     def test_add_file_to_zip(self):
         self.tmp_dir1 = tempfile.mkdtemp()
         zip_file = os.path.join(self.tmp_dir1, 'foo.zip')
@@ -124,6 +159,12 @@ class FileUtilsTests(unittest.TestCase):
             f.write("hello world")
         self.assertEqual(file_utils.get_mime_type(tmp_file), "text/plain")
 
+    def test_hash_file(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        tmp_file = os.path.join(self.tmp_dir, 'book.usfm')
+        file_utils.write_file(tmp_file, '\\id PHP\n')
+        self.assertEqual(file_utils.hash_file(tmp_file, block_size=3), hashlib.sha256(b'\\id PHP\n').hexdigest())
+
     def test_get_files(self):
         self.tmp_dir = tempfile.mkdtemp()
         _, tmp_file1 = tempfile.mkstemp(dir=self.tmp_dir)
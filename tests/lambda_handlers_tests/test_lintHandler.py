@@ -2,6 +2,7 @@ from __future__ import absolute_import, unicode_literals, print_function
 import mock
 from unittest import TestCase
 from libraries.lambda_handlers.lint_handler import LintHandler
+from libraries.linters.lint_cache import S3LintCache
 from libraries.linters.markdown_linter import MarkdownLinter
 
 
@@ -22,3 +23,28 @@ class TestLintHandler(TestCase):
             }
         }
         self.assertIsNone(LintHandler(MarkdownLinter).handle(event, None))
+
+    @mock.patch('libraries.linters.linter.Linter.run')
+    def test_handle_lint_cache(self, mock_lint_run):
+        mock_lint_run.return_value = None
+        linters = []
+
+        def make_linter(**kwargs):
+            linters.append(kwargs)
+            return MarkdownLinter(**kwargs)
+
+        event = {
+            'data': {
+                'source_url': 'https://cdn.example.com/preconvert/705948ab00.zip',
+                'identifier': 'richmahn/en-obs/705948ab00'
+            }
+        }
+        LintHandler(make_linter).handle(event, None)
+        self.assertIsNone(linters[0]['cache'])
+        event['data']['lint_cache_prefix'] = S3LintCache.PREFIX
+        LintHandler(make_linter).handle(event, None)
+        self.assertIsInstance(linters[1]['cache'], S3LintCache)
+        self.assertEqual(linters[1]['cache'].prefix, 'lint_cache/')
+        event['data']['lint_cache_prefix'] = ''
+        LintHandler(make_linter).handle(event, None)
+        self.assertIsNone(linters[2]['cache'])
@@ -0,0 +1,53 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import shutil
+import tempfile
+import unittest
+from moto import mock_s3
+from libraries.app.app import App
+from libraries.general_tools.file_utils import write_file
+from libraries.linters.lint_cache import LintCache, LocalLintCache, S3LintCache
+
+
+class TestLintCache(unittest.TestCase):
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp(prefix='tmp_lint_cache_')
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_make_key(self):
+        key = LintCache.make_key('abc', 'en', 1)
+        self.assertEqual(key, LintCache.make_key('abc', 'en', 1))
+        self.assertNotEqual(key, LintCache.make_key('abc', 'es', 1))
+        self.assertNotEqual(key, LintCache.make_key('abc', 'en', 2))
+        self.assertNotEqual(LintCache.make_key('ab', 'c'), LintCache.make_key('a', 'bc'))
+
+    def test_local(self):
+        cache = LocalLintCache(os.path.join(self.temp_dir, 'cache'))
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', {'errors': ['PHP 1:3 - Missing verse'], 'book_code': 'PHP'})
+        self.assertEqual(cache.get('key'), {'errors': ['PHP 1:3 - Missing verse'], 'book_code': 'PHP'})
+        self.assertIsNone(cache.get('other'))
+
+    def test_local_unreadable(self):
+        cache = LocalLintCache(self.temp_dir)
+        write_file(os.path.join(self.temp_dir, 'key.json'), '{not json')
+        self.assertIsNone(cache.get('key'))
+
+    @mock_s3
+    def test_s3(self):
+        App(prefix='{0}-'.format(self._testMethodName))
+        App.cdn_s3_handler().create_bucket()
+        cache = S3LintCache(App.cdn_s3_handler(), 'cache/')
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', {'errors': [], 'book_code': 'PHP'})
+        self.assertEqual(cache.get('key'), {'errors': [], 'book_code': 'PHP'})
+        self.assertTrue(App.cdn_s3_handler().key_exists('cache/key.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -72,6 +72,7 @@ class TestMarkdownLinter(LinterTestCase):
         expected = {
             'identifier': identifier,
             'success': True,
+            'info': [],
             'warnings': [
                 '<a href="https://git.door43.org/Door43/en_ta/src/master/intro\\finding-answers\\01.md" target="_blank">intro\\finding-answers\\01.md</a> - Line 1: First line in file should be a top level header. See "Text on first line"',
                 '<a href="https://git.door43.org/Door43/en_ta/src/master/intro\\uw-intro\\01.md" target="_blank">intro\\uw-intro\\01.md</a> - Line 1: First line in file should be a top level header. See "Text on first line"',
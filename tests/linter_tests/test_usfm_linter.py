@@ -7,6 +7,7 @@ import unittest
 from tests.linter_tests.linter_unittest import LinterTestCase
 from libraries.general_tools import file_utils
 from libraries.linters.usfm_linter import UsfmLinter
+from libraries.linters.lint_cache import LocalLintCache
 from libraries.general_tools.file_utils import write_file, read_file, unzip
 from libraries.resource_container.ResourceContainer import RC
 from libraries.app.app import App
@@ -476,6 +477,86 @@ class TestUsfmLinter(LinterTestCase):
         linter.parse_usfm_text(sub_path, file_name, book_text, book_full_name, book_code)
         self.verify_results_counts(expected_warnings, linter)
 
+    def test_PhpDuplicateUsfmFileNameInPool(self):
+        out_dir = self.copy_resource(self.php_repo_path)
+        shutil.copy(os.path.join(out_dir, self.php_file_name), os.path.join(out_dir, 'PHP.usfm'))
+        linter = UsfmLinter(source_dir=out_dir, processes=2)
+        linter.run()
+        self.assertEqual(linter.log.warnings, ["File '."+os.path.sep+"PHP.usfm' has same code 'PHP' as previous file"])
+        self.assertEqual(linter.found_books, ['PHP', 'PHP'])
+
+    def test_EnUlbSubsetInPoolMatchesSequential(self):
+        check_files = ['08-RUT.usfm', '31-OBA.usfm', '57-TIT.usfm', '65-3JN.usfm', '66-JUD.usfm']
+        out_dir = self.unzip_resource_only('en_ulb.zip', check_files)
+        book_path = os.path.join(out_dir, '57-TIT.usfm')
+        write_file(book_path, read_file(book_path).replace('\\v 4 ', ''))
+        write_file(os.path.join(out_dir, '99-BAD.usfm'), '')
+        rc = RC(out_dir)
+        sequential = UsfmLinter(source_dir=out_dir, rc=rc)
+        sequential.run()
+        pooled = UsfmLinter(source_dir=out_dir, rc=rc, processes=3)
+        pooled.run()
+        self.assertGreater(len(sequential.log.warnings), 1)
+        self.assertEqual(pooled.log.warnings, sequential.log.warnings)
+        self.assertEqual(pooled.found_books, sequential.found_books)
+
+    def test_EnUlbSubsetStreamingMatchesWholeBook(self):
+        check_files = ['08-RUT.usfm', '57-TIT.usfm', '66-JUD.usfm']
+        out_dir = self.unzip_resource_only('en_ulb.zip', check_files)
+        book_path = os.path.join(out_dir, '57-TIT.usfm')
+        write_file(book_path, read_file(book_path).replace('\\v 4 ', '').replace('\\c 2', '\\c2'))
+        write_file(os.path.join(out_dir, '99-BAD.usfm'), '')
+        rc = RC(out_dir)
+        whole = UsfmLinter(source_dir=out_dir, rc=rc)
+        whole.run()
+        streaming = UsfmLinter(source_dir=out_dir, rc=rc, streaming=True)
+        streaming.run()
+        pooled = UsfmLinter(source_dir=out_dir, rc=rc, streaming=True, processes=2)
+        pooled.run()
+        self.assertGreater(len(whole.log.warnings), 2)
+        self.assertEqual(sorted(streaming.log.warnings), sorted(whole.log.warnings))
+        self.assertEqual(pooled.log.warnings, streaming.log.warnings)
+        self.assertEqual(streaming.found_books, whole.found_books)
+
+    def test_EnUlbSubsetCached(self):
+        check_files = ['08-RUT.usfm', '57-TIT.usfm', '66-JUD.usfm']
+        out_dir = self.unzip_resource_only('en_ulb.zip', check_files)
+        book_path = os.path.join(out_dir, '57-TIT.usfm')
+        write_file(book_path, read_file(book_path).replace('\\v 4 ', ''))
+        rc = RC(out_dir)
+        cache = LocalLintCache(os.path.join(self.temp_dir, 'cache'))
+        first = UsfmLinter(source_dir=out_dir, rc=rc, cache=cache)
+        first.run()
+        self.assertEqual(first.log.infos, ['USFM lint cache: 0 hits, 3 misses'])
+        self.assertGreater(len(first.log.warnings), 0)
+
+        second = UsfmLinter(source_dir=out_dir, rc=rc, cache=cache, processes=2)
+        results = second.run()
+        self.assertEqual(second.log.infos, ['USFM lint cache: 3 hits, 0 misses'])
+        self.assertEqual(results['info'], ['USFM lint cache: 3 hits, 0 misses'])
+        self.assertEqual(second.log.warnings, first.log.warnings)
+        self.assertEqual(second.found_books, first.found_books)
+
+        # only the changed book is checked again
+        book_path = os.path.join(out_dir, '08-RUT.usfm')
+        write_file(book_path, read_file(book_path).replace('\\v 2 ', ''))
+        third = UsfmLinter(source_dir=out_dir, rc=rc, cache=cache, processes=2)
+        third.run()
+        expected = UsfmLinter(source_dir=out_dir, rc=rc)
+        expected.run()
+        self.assertEqual(third.log.infos, ['USFM lint cache: 2 hits, 1 misses'])
+        self.assertEqual(third.log.warnings, expected.log.warnings)
+
+    def test_CacheKey(self):
+        linter = UsfmLinter(source_dir=self.php_repo_path)
+        key = linter.get_cache_key(self.php_file_path, self.php_file_name, 'es')
+        self.assertEqual(key, linter.get_cache_key(self.php_file_path, self.php_file_name, 'es'))
+        self.assertNotEqual(key, linter.get_cache_key(self.php_file_path, self.php_file_name, 'en'))
+        self.assertNotEqual(key, linter.get_cache_key(self.php_file_path, 'PHP.usfm', 'es'))
+        self.assertNotEqual(key, UsfmLinter(source_dir=self.php_repo_path, streaming=True).get_cache_key(
+            self.php_file_path, self.php_file_name, 'es'))
+        self.assertIsNone(linter.get_cache_key(self.php_file_path + '.missing', self.php_file_name, 'es'))
+
     @unittest.skip("Skip test_EnUlbValid test for time reasons - leave for standalone testing")
     def test_EnUlbValid(self):
         out_dir = self.unzip_resource('en_ulb.zip')
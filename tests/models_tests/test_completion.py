@@ -0,0 +1,51 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from unittest import TestCase
+from libraries.models.completion import TxCompletion
+from libraries.app.app import App
+
+
+class TxCompletionTests(TestCase):
+    build_key = 'u/user1/repo1/commit1'
+
+    def setUp(self):
+        """Runs before each test."""
+        App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
+
+    def tearDown(self):
+        App.db_close()
+
+    def test_start(self):
+        TxCompletion.start(self.build_key, 3)
+        parts = TxCompletion.query(build_key=self.build_key).order_by(TxCompletion.part).all()
+        self.assertEqual([part.part for part in parts], ['0', '1', '2'])
+        self.assertTrue(all(part.part_count == 3 and not part.converted and not part.linted for part in parts))
+
+    def test_start_again(self):
+        TxCompletion.start(self.build_key, 3)
+        TxCompletion.finish_stage(self.build_key, '0', 'converted')
+        TxCompletion.start(self.build_key, 2)
+        parts = TxCompletion.query(build_key=self.build_key).all()
+        self.assertEqual(len(parts), 2)
+        self.assertFalse(any(part.converted for part in parts))
+
+    def test_finish_stage(self):
+        TxCompletion.start(self.build_key, 2)
+        self.assertFalse(TxCompletion.finish_stage(self.build_key, '1', 'linted'))
+        self.assertFalse(TxCompletion.finish_stage(self.build_key, '0', 'converted'))
+        self.assertTrue(TxCompletion.finish_stage(self.build_key, '1', 'converted'))
+        self.assertFalse(TxCompletion.finish_stage(self.build_key, '1', 'converted'))  # only finishes once
+        self.assertTrue(TxCompletion.finish_stage(self.build_key, '0', 'linted'))
+
+    def test_finish_stage_not_tracked(self):
+        TxCompletion.start(self.build_key, 1)
+        self.assertIsNone(TxCompletion.finish_stage('u/user1/repo1/commit2', '0', 'converted'))
+        self.assertIsNone(TxCompletion.finish_stage(self.build_key, '1', 'converted'))
+        with self.assertRaises(ValueError):
+            TxCompletion.finish_stage(self.build_key, '0', 'deployed')
+
+    def test_count_merged_part(self):
+        TxCompletion.start(self.build_key, 3)
+        self.assertFalse(TxCompletion.count_merged_part(self.build_key))
+        self.assertFalse(TxCompletion.count_merged_part(self.build_key))
+        self.assertTrue(TxCompletion.count_merged_part(self.build_key))
+        self.assertFalse(TxCompletion.count_merged_part('u/user1/repo1/commit2'))
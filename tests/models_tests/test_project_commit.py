@@ -0,0 +1,52 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from datetime import datetime
+from unittest import TestCase
+from libraries.models.project_commit import TxProjectCommit
+from libraries.app.app import App
+
+
+class TxProjectCommitTests(TestCase):
+    project_key = 'u/user1/repo1'
+
+    def setUp(self):
+        """Runs before each test."""
+        App(prefix='{0}-'.format(self._testMethodName), db_connection_string='sqlite:///:memory:')
+
+    def tearDown(self):
+        App.db_close()
+
+    @staticmethod
+    def make_commit(commit_id, status='success'):
+        return {
+            'id': commit_id,
+            'created_at': '2017-10-20T17:03:55Z',
+            'status': status,
+            'success': True,
+            'started_at': None,
+            'ended_at': None
+        }
+
+    def test_start(self):
+        self.assertFalse(TxProjectCommit.is_tracked(self.project_key))
+        commits = [self.make_commit('commit1'), self.make_commit('commit2')]
+        TxProjectCommit.start(self.project_key, commits)
+        TxProjectCommit.start(self.project_key, commits)  # started by another build already
+        self.assertTrue(TxProjectCommit.is_tracked(self.project_key))
+        self.assertEqual(TxProjectCommit.get_commits(self.project_key), commits)
+
+    def test_save(self):
+        TxProjectCommit.save(self.project_key, self.make_commit('commit1'))
+        TxProjectCommit.save(self.project_key, self.make_commit('commit2'))
+        revision = TxProjectCommit.get_revision(self.project_key)
+        TxProjectCommit.save(self.project_key, self.make_commit('commit1', 'errors'))
+        TxProjectCommit.save('u/user1/repo2', self.make_commit('commit3'))
+        commits = TxProjectCommit.get_commits(self.project_key)
+        self.assertEqual([c['id'] for c in commits], ['commit2', 'commit1'])  # a saved commit moves to the end
+        self.assertEqual(commits[1]['status'], 'errors')
+        self.assertNotEqual(TxProjectCommit.get_revision(self.project_key), revision)
+
+    def test_save_date(self):
+        commit = self.make_commit('commit1')
+        commit['created_at'] = datetime(2017, 10, 20, 17, 3, 55)
+        TxProjectCommit.save(self.project_key, commit)
+        self.assertEqual(TxProjectCommit.get_commits(self.project_key)[0]['created_at'], '2017-10-20T17:03:55')
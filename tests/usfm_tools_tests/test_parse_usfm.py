@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import unittest
+from libraries.general_tools.file_utils import read_file
+from libraries.usfm_tools import parseUsfm
+
+
+class TestParseUsfm(unittest.TestCase):
+
+    resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'linter_tests',
+                                 'resources')
+    php_file_path = os.path.join(resources_dir, 'es_php_text_ulb', '51-PHP.usfm')
+
+    def test_tokenizer_matches_pyparsing_php(self):
+        book_text = read_file(self.php_file_path)
+        self.verify_engines_match(book_text)
+
+    def test_tokenizer_matches_pyparsing_formatting(self):
+        for file_name in ['footnote_n_refs_example.txt', 'formatting_example.txt']:
+            book_text = read_file(os.path.join(self.resources_dir, file_name))
+            self.verify_engines_match(book_text)
+
+    def test_tokenizer_matches_pyparsing_edge_cases(self):
+        samples = [
+            '\\id PHP\n\\s5\nfollowing line',
+            '\\c 1text \\v 1-2text \\v (3) ok',
+            '\\p\\v 1 \\q\r\n\\q1\ttab',
+            '\\f + \\ft note\\f* \\f - \\fqa* \\fqa*x',
+            '\\zz unknown \\p* \\i* \\\\ \\\\v \\\\\\v 2 end\\',
+            '\\toc1 Name \\toc3 \\toc2\n\\is intro \\io1 \\io',
+            '\xa0\\v\xa01 text',
+        ]
+        for sample in samples:
+            self.verify_engines_match(sample)
+
+    def test_tokenize_values(self):
+        tokens = parseUsfm.parse_string('\\c 1\n\\p\n\\v 1 In the beginning\\f + \\ft note\\f*')
+        types = [t.getType() for t in tokens]
+        self.assertEqual(types, ['c', 'p', 'v', 'text', 'f', 'ft', 'f*'])
+        self.assertEqual(tokens[0].getValue(), '1')
+        self.assertEqual(tokens[3].getValue(), 'In the beginning')
+        self.assertEqual(tokens[4].getValue(), '+')
+        self.assertTrue(isinstance(tokens[6], parseUsfm.FEToken))
+
+    def test_create_token(self):
+        token = parseUsfm.createToken(['v', '12'])
+        self.assertTrue(token.isV())
+        self.assertEqual(token.getType(), 'v')
+        self.assertEqual(token.getValue(), '12')
+        self.assertFalse(hasattr(token, '__dict__'))
+        token = parseUsfm.createToken(['is'])
+        self.assertTrue(token.is_is1())
+        self.assertEqual(token.getValue(), '')
+
+    def test_create_token_unknown_marker(self):
+        with self.assertRaises(Exception):
+            parseUsfm.createToken(['not-a-marker'])
+
+    def test_empty_raises(self):
+        for engine in [parseUsfm.ENGINE_TOKENIZER, parseUsfm.ENGINE_PYPARSING]:
+            with self.assertRaises(Exception):
+                parseUsfm.parse_string(' \n', engine)
+
+    #
+    # helpers
+    #
+
+    def verify_engines_match(self, book_text):
+        expected = self.get_tokens(book_text, parseUsfm.ENGINE_PYPARSING)
+        tokens = self.get_tokens(book_text, parseUsfm.ENGINE_TOKENIZER)
+        self.assertEqual(tokens, expected)
+
+    @staticmethod
+    def get_tokens(book_text, engine):
+        return [(t.__class__, t.getType(), t.getValue()) for t in parseUsfm.parse_string(book_text, engine)]
+
+
+if __name__ == '__main__':
+    unittest.main()
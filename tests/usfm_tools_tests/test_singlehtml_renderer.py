@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, print_function
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from libraries.general_tools.file_utils import read_file
+from libraries.usfm_tools.singlehtmlRenderer import SingleHTMLRenderer
+
+
+class TestSingleHTMLRenderer(unittest.TestCase):
+
+    resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'linter_tests',
+                                 'resources')
+    php_dir = os.path.join(resources_dir, 'es_php_text_ulb')
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='test_singlehtml_renderer_')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_render_to_stream_same_as_file(self):
+        output_file = os.path.join(self.temp_dir, 'php.html')
+        SingleHTMLRenderer(self.php_dir, output_file).render()
+        html = io.StringIO()
+        SingleHTMLRenderer(None, None, usfm=read_file(os.path.join(self.php_dir, '51-PHP.usfm')).lstrip()).render(html)
+        self.assertEqual(html.getvalue(), read_file(output_file))
+        self.assertIn('<title>Filipenses</title>', html.getvalue())
+
+    def test_render_not_usfm_book(self):
+        html = io.StringIO()
+        SingleHTMLRenderer(None, None, usfm='not a book\n').render(html)
+        self.assertNotIn('<body>', html.getvalue())
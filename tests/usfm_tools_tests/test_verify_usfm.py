@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, print_function
+import io
+import os
+import threading
+import unittest
+from libraries.general_tools.file_utils import read_file
+from libraries.usfm_tools import verifyUSFM, usfm_verses
+from libraries.usfm_tools.verifyUSFM import UsfmVerifier
+
+
+class TestVerifyUsfm(unittest.TestCase):
+
+    resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'linter_tests',
+                                 'resources')
+    php_file_path = os.path.join(resources_dir, 'es_php_text_ulb', '51-PHP.usfm')
+
+    def setUp(self):
+        """Runs before each test."""
+        self.php_text = read_file(self.php_file_path).lstrip()
+
+    def test_valid(self):
+        errors, book_code = verifyUSFM.verify_contents_quiet(self.php_text, '51-PHP', 'PHP', 'es')
+        self.assertEqual(errors, [])
+        self.assertEqual(book_code, 'PHP')
+
+    def test_verifier_reuse(self):
+        broken = self.php_text.replace('\\v 3 ', '')
+        verifier = UsfmVerifier()
+        errors, book_code = verifier.verify_contents_quiet(broken, '51-PHP', 'PHP', 'es')
+        self.assertGreater(len(errors), 0)
+        errors, book_code = verifier.verify_contents_quiet(self.php_text, '51-PHP', 'PHP', 'es')
+        self.assertEqual(errors, [])
+
+    def test_verifiers_are_independent(self):
+        texts = [self.php_text.replace('\\v {0} '.format(i), '') for i in range(2, 8)] + [self.php_text]
+        expected = [verifyUSFM.verify_contents_quiet(text, '51-PHP', 'PHP', 'es') for text in texts]
+        results = [None] * len(texts)
+
+        def verify(index):
+            results[index] = UsfmVerifier().verify_contents_quiet(texts[index], '51-PHP', 'PHP', 'es')
+
+        threads = [threading.Thread(target=verify, args=(i,)) for i in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, expected)
+
+    def test_text_before_any_marker(self):
+        errors, book_code = UsfmVerifier().verify_contents_quiet('stray text\n' + self.php_text, '51-PHP', 'PHP',
+                                                                 'es')
+        self.assertIn('PHP - No preceding Token', errors)
+
+    def test_many_gaps(self):
+        # every gap is reported once, however many there are (scripts/benchmark_usfm.py --gap-step times this)
+        book_text = self.make_gap_book('PSA', step=3)
+        errors, book_code = verifyUSFM.verify_contents_quiet(book_text, '19-PSA', 'PSA', 'en')
+        missing = [error for error in errors if ' - Missing verse' in error]
+        expected_gaps = sum(len(range(1, verses + 1, 3)) - 1 for verses in usfm_verses.verses['PSA']['verses'])
+        self.assertEqual(len(missing), expected_gaps)
+        self.assertEqual(len(set(missing)), expected_gaps)
+        self.assertEqual(missing[:3], ['PSA 1:1 - Missing verses between this and: PSA 1:4',
+                                       'PSA 2:1 - Missing verses between this and: PSA 2:4',
+                                       'PSA 2:4 - Missing verses between this and: PSA 2:7'])
+        self.assertIn('PSA 150:1 - Missing verses between this and: PSA 150:4', missing)
+        self.assertIn('PSA 1:4 - Should have 6 verses', errors)
+
+    def test_gap_already_reported(self):
+        # a verse reported with its own warning is not reported again as missing
+        book_text = self.make_gap_book('JUD', step=1).replace('\\v 5 text \\p\n\\v 6 text \\p',
+                                                              '\\v 5 \\v 6 \\v 4 text \\p')
+        errors, book_code = verifyUSFM.verify_contents_quiet(book_text, '65-JUD', 'JUD', 'en')
+        self.assertIn('JUD 1:5 - Empty verse', errors)
+        self.assertIn('JUD 1:6 - Empty verse', errors)
+        self.assertIn('JUD 1:4 - Verse out of order: after JUD 1:6', errors)
+        self.assertNotIn('JUD 1:4 - Missing verses between this and: JUD 1:7', errors)
+
+    def test_split_chapters(self):
+        lines = io.StringIO('\n  \n \\id PHP\n\\c 1\n\\v 1 a\n\\cl x\n\\c 2\n\\v 1 \\c 9 b\n\\c\u00a03\n\\v 1 c')
+        chapters = list(verifyUSFM.split_chapters(lines))
+        self.assertEqual(chapters, ['\\id PHP\n', '\\c 1\n\\v 1 a\n\\cl x\n', '\\c 2\n\\v 1 \\c 9 b\n',
+                                    '\\c\u00a03\n\\v 1 c'])
+
+    def test_chapters_valid(self):
+        chapters = verifyUSFM.split_chapters(io.StringIO(self.php_text))
+        errors, book_code = verifyUSFM.verify_chapters_quiet(chapters, '51-PHP', 'PHP', 'es')
+        self.assertEqual(errors, [])
+        self.assertEqual(book_code, 'PHP')
+
+    def test_chapters_same_errors(self):
+        broken = self.php_text.replace('\\v 3 ', '').replace('\\c 3', '\\c3').replace('\\v 8 ', '\\v 8\\v 9 ')
+        expected, expected_code = verifyUSFM.verify_contents_quiet(broken, '51-PHP', 'PHP', 'es')
+        chapters = verifyUSFM.split_chapters(io.StringIO(broken))
+        errors, book_code = verifyUSFM.verify_chapters_quiet(chapters, '51-PHP', 'PHP', 'es')
+        self.assertGreater(len(errors), 2)
+        self.assertEqual(sorted(errors), sorted(expected))
+        self.assertEqual(book_code, expected_code)
+
+    def test_chapters_empty_book(self):
+        with self.assertRaises(Exception):
+            verifyUSFM.verify_chapters_quiet(verifyUSFM.split_chapters(io.StringIO(' \n')), '51-PHP', 'PHP', 'es')
+
+    #
+    # helpers
+    #
+
+    @staticmethod
+    def make_gap_book(book_code, step):
+        """
+        make a book that has only every step'th verse, each followed by a paragraph
+        """
+        lines = ['\\id {0} synthetic'.format(book_code), '\\ide UTF-8', '\\h Book', '\\toc1 Book', '\\toc2 Book',
+                 '\\toc3 {0}'.format(book_code), '\\mt Book']
+        for chapter, verses in enumerate(usfm_verses.verses[book_code]['verses'], 1):
+            lines += ['\\c {0}'.format(chapter), '\\p']
+            for verse in range(1, verses + 1, step):
+                lines.append('\\v {0} text \\p'.format(verse))
+        return '\n'.join(lines) + '\n'
+
+
+if __name__ == '__main__':
+    unittest.main()